@@ -0,0 +1,1119 @@
+"""
+Бенчмарки Pinterest парсера на локальном HTTP сервере
+
+Запуск:
+    python benchmark.py extraction --pins 300
+    python benchmark.py feed --pins 2000
+    python benchmark.py stream --pins 300
+    python benchmark.py sync --pins 2000 --new 10
+    python benchmark.py engine --images 500
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import struct
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from selenium.webdriver.common.by import By
+
+import pinterest_parser
+from pinterest_parser import (PinterestParser, PIN_SELECTORS, SIMILAR_SEPARATOR_TEXTS, BOARD_STATE_FILENAME,
+                               format_connection_stats)
+
+
+# Минимальный валидный GIF 1x1 для ответов на запросы изображений
+TINY_GIF = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+            b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+
+
+def build_board_html(pin_count, similar_after=None, board_path=None):
+    """
+    Генерирует синтетическую страницу доски в разметке Pinterest
+
+    Args:
+        pin_count: Количество пинов на странице
+        similar_after: После какого пина вставить раздел "More like this" (None = без раздела)
+        board_path: Путь доски для встроенного состояния страницы с pin_count (None = без состояния)
+    """
+    parts = ["<html><body><div style='width:1200px'>"]
+    for i in range(pin_count):
+        if similar_after is not None and i == similar_after:
+            parts.append("<h2 style='height:1200px'>More like this</h2>")
+        parts.append(
+            f"<div data-test-id='pin' style='display:inline-block;width:236px;height:300px'>"
+            f"<a href='/pin/{100000 + i}/'>"
+            f"<img src='/i.pinimg.com/236x/{i % 256:02x}/{i // 256:02x}/aa/pin{i:06d}.jpg' width='236' height='300'>"
+            f"</a></div>"
+        )
+    parts.append("</div>")
+    if board_path:
+        board = {"type": "board", "url": board_path, "pin_count": similar_after or pin_count}
+        parts.append(f"<script id='__PWS_DATA__' type='application/json'>{json.dumps({'board': board})}</script>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+class LocalServer:
+    """Локальный HTTP сервер в отдельном потоке (или процессе)"""
+
+    def __init__(self, routes, separate_process=False):
+        """
+        Args:
+            routes: Функция (handler) -> (status, headers, body) или None для 404
+                (Content-Length из headers отправляется как есть - для обрыва ответа;
+                body - байты или итератор частей с Content-Length в headers)
+            separate_process: Запустить сервер в отдельном процессе, чтобы он не делил GIL
+                с измеряемым кодом (только там, где доступен fork; счетчики маршрутов
+                в этом режиме не обновляются в основном процессе)
+        """
+        routes_func = routes
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive, как у настоящих серверов (ответы всегда с Content-Length)
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело пишутся отдельно - без этого keep-alive ждет задержанный ACK
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                result = routes_func(self)
+                if result is None:
+                    self.send_error(404)
+                    return
+                status, headers, body = result
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if "Content-Length" not in headers:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if isinstance(body, bytes):
+                    self.wfile.write(body)
+                    return
+                # Тело по частям: клиент может закрыть соединение, не дочитав ответ
+                try:
+                    for chunk in body:
+                        self.wfile.write(chunk)
+                except ConnectionError:
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # Очередь подключений по умолчанию (5) ограничивает одновременные запросы
+            request_queue_size = 256
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # Клиент закрыл соединение после ответа с ошибкой - не считается ошибкой сервера
+                if not isinstance(sys.exc_info()[1], ConnectionError):
+                    super().handle_error(request, client_address)
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        if separate_process and "fork" in multiprocessing.get_all_start_methods():
+            self.thread = multiprocessing.get_context("fork").Process(target=self.httpd.serve_forever, daemon=True)
+        else:
+            self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if isinstance(self.thread, threading.Thread):
+            self.httpd.shutdown()
+        else:
+            self.thread.terminate()
+            self.thread.join()
+        self.httpd.server_close()
+
+
+def board_routes(pages):
+    """Маршруты: HTML страницы досок по пути и заглушки изображений"""
+    def route(handler):
+        path = handler.path.split("?")[0]
+        if path in pages:
+            return 200, {"Content-Type": "text/html; charset=utf-8"}, pages[path]
+        if "pinimg.com" in path:
+            return 200, {"Content-Type": "image/gif"}, TINY_GIF
+        return None
+    return route
+
+
+def build_feed_recordings(pin_count, page_size=25, image_base="https://i.pinimg.com", new_pins=0):
+    """
+    Генерирует синтетические записи ответов BoardResource и BoardFeedResource
+
+    Args:
+        pin_count: Количество пинов на доске
+        page_size: Пинов на странице ленты
+        image_base: Адрес сервера изображений (локальный сервер для бенчмарков скачивания)
+        new_pins: Количество новых пинов, добавленных в начало доски
+
+    Returns:
+        Кортеж (board_response, feed_pages)
+    """
+    total = pin_count + new_pins
+    # Новые пины получают номера после старых, но стоят в начале доски
+    numbers = list(range(pin_count, total)) + list(range(pin_count))
+    board_response = {"resource_response": {"data": {"id": "900000001", "pin_count": total}}}
+    feed_pages = []
+    for start in range(0, total, page_size):
+        pins = []
+        for i in numbers[start:start + page_size]:
+            pins.append({
+                "type": "pin",
+                "id": str(100000 + i),
+                "images": {
+                    "236x": {"url": f"{image_base}/236x/{i % 256:02x}/{i // 256:02x}/aa/pin{i:06d}.jpg"},
+                    "orig": {"url": f"{image_base}/originals/{i % 256:02x}/{i // 256:02x}/aa/pin{i:06d}.jpg"},
+                },
+            })
+        is_last = start + page_size >= total
+        feed_pages.append({"resource_response": {"data": pins, "bookmark": "-end-" if is_last else f"page-{len(feed_pages) + 1}"}})
+    return board_response, feed_pages
+
+
+def build_state_html(pin_count, page_size=25, padding=1500000):
+    """
+    Страница доски со встроенным состоянием: объект доски и первая страница ленты
+
+    Разметка состояния повторяет Redux-ресурсы Pinterest (BoardResource,
+    BoardFeedResource с nextBookmark); padding байт скриптов и разметки
+    приближают размер к настоящей странице.
+    """
+    board_response, feed_pages = build_feed_recordings(pin_count, page_size=page_size)
+    board = dict(board_response["resource_response"]["data"], type="board", url="/user/board/")
+    first_page = feed_pages[0]["resource_response"]
+    state = {"props": {"initialReduxState": {"resources": {
+        "BoardResource": {"board-key": {"data": board}},
+        "BoardFeedResource": {"feed-key": {"data": first_page["data"], "nextBookmark": first_page["bookmark"]}},
+    }}}}
+    filler = "<script>var bundle = '" + "x" * (padding // 2) + "';</script>" + "<div class='grid'></div>" * (padding // 50)
+    return (f"<html><head>{filler}</head><body><div id='root'></div>"
+            f"<script id='__PWS_DATA__' type='application/json'>{json.dumps(state)}</script></body></html>")
+
+
+def bench_state(args):
+    """Первая порция пинов из встроенного состояния страницы: html.parser против lxml"""
+    html = build_state_html(args.pins, padding=args.padding)
+    parser = PinterestParser(download_folder=args.folder)
+    has_lxml = pinterest_parser.HAS_LXML
+    try:
+        for name, use_lxml in [("html.parser", False), ("lxml", True)]:
+            if use_lxml and not has_lxml:
+                print(f"{name:>12}: не установлен")
+                continue
+            pinterest_parser.HAS_LXML = use_lxml
+            start = time.time()
+            for _ in range(args.repeat):
+                state = parser.parse_initial_state(html, "https://www.pinterest.com/user/board/")
+            elapsed = (time.time() - start) / args.repeat
+            urls = []
+            parser.add_feed_pin_urls(state["pins"], urls, set())
+            print(f"{name:>12}: {elapsed * 1000:7.1f} мс на страницу {len(html) / 2 ** 20:.1f} МБ | пинов = {len(urls)} | "
+                  f"bookmark = {state['bookmark']} | pin_count = {state['pin_count']} | прокруток = 0")
+    finally:
+        pinterest_parser.HAS_LXML = has_lxml
+        parser.close()
+
+
+def load_feed_recordings(folder):
+    """
+    Загружает записанные ответы: board.json и feed_000.json, feed_001.json, ...
+
+    Returns:
+        Кортеж (board_response, feed_pages)
+    """
+    with open(os.path.join(folder, "board.json"), encoding="utf-8") as f:
+        board_response = json.load(f)
+    feed_pages = []
+    for path in sorted(glob.glob(os.path.join(folder, "feed_*.json"))):
+        with open(path, encoding="utf-8") as f:
+            feed_pages.append(json.load(f))
+    return board_response, feed_pages
+
+
+def feed_routes(board_response, feed_pages, page_delay=0.0, image_delay=0.0):
+    """
+    Маршруты, имитирующие JSON-ресурсы Pinterest по записанным страницам
+
+    Следующая страница выбирается по bookmark, полученному в предыдущем ответе.
+    Задержки имитируют время прокрутки страницы и скачивания изображения.
+    """
+    page_by_bookmark = {None: 0}
+    for index, page in enumerate(feed_pages[:-1]):
+        page_by_bookmark[page["resource_response"].get("bookmark")] = index + 1
+    counter = {"requests": 0}
+
+    def route(handler):
+        parsed = urlparse(handler.path)
+        if "pinimg.com" in parsed.path:
+            time.sleep(image_delay)
+            return 200, {"Content-Type": "image/gif"}, TINY_GIF
+        counter["requests"] += 1
+        if parsed.path == "/resource/BoardResource/get/":
+            body = board_response
+        elif parsed.path == "/resource/BoardFeedResource/get/":
+            options = json.loads(parse_qs(parsed.query)["data"][0])["options"]
+            bookmark = (options.get("bookmarks") or [None])[0]
+            if bookmark not in page_by_bookmark:
+                return None
+            body = feed_pages[page_by_bookmark[bookmark]]
+            time.sleep(page_delay)
+        else:
+            return None
+        return 200, {"Content-Type": "application/json"}, json.dumps(body).encode("utf-8")
+
+    route.counter = counter
+    return route
+
+
+def count_commands(driver):
+    """Оборачивает driver.execute и возвращает словарь со счетчиком команд WebDriver"""
+    counter = {"commands": 0}
+    original_execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter["commands"] += 1
+        return original_execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def legacy_extract_with_positions(parser):
+    """Прежняя поэлементная реализация extract_image_urls_with_positions (для сравнения)"""
+    driver = parser.driver
+
+    def in_similar(element):
+        try:
+            element_y = element.location['y']
+        except Exception:
+            return False
+        for text in SIMILAR_SEPARATOR_TEXTS:
+            for separator in driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]"):
+                if separator.is_displayed() and element_y > separator.location['y'] + 1000:
+                    try:
+                        element.find_element(By.XPATH, "./ancestor::*[contains(@class, 'similar') or contains(@class, 'related')]")
+                    except Exception:
+                        pass
+                    return True
+        return False
+
+    def valid(img, src):
+        size = img.size
+        if size.get('width', 0) < 50 or size.get('height', 0) < 50:
+            return False
+        try:
+            img.find_element(By.XPATH, "./ancestor::*[contains(@class, 'pin') or contains(@data-test-id, 'pin')]")
+        except Exception:
+            pass
+        return parser.is_valid_pin_image(src)
+
+    def img_src(img):
+        return (img.get_attribute('src') or img.get_attribute('data-src') or
+                img.get_attribute('data-lazy-src') or img.get_attribute('data-pin-media'))
+
+    image_data = []
+    for selector in PIN_SELECTORS:
+        for pin in driver.find_elements(By.CSS_SELECTOR, selector):
+            if in_similar(pin):
+                continue
+            location = pin.location
+            for img in pin.find_elements(By.TAG_NAME, "img"):
+                if in_similar(img):
+                    continue
+                src = img_src(img)
+                if src and 'pinimg.com' in src and valid(img, src):
+                    full_url = parser.get_full_image_url(src, parser.image_quality)
+                    if full_url:
+                        image_data.append((location['y'], location['x'], full_url))
+    for img in driver.find_elements(By.TAG_NAME, "img"):
+        if in_similar(img):
+            continue
+        src = img_src(img)
+        if src and 'pinimg.com' in src and valid(img, src):
+            full_url = parser.get_full_image_url(src, parser.image_quality)
+            if full_url:
+                location = img.location
+                image_data.append((location['y'], location['x'], full_url))
+    return image_data
+
+
+def bench_extraction(args):
+    """Количество команд WebDriver и время одного прохода извлечения: до и после"""
+    pages = {"/board/": build_board_html(args.pins, similar_after=args.similar_after)}
+    with LocalServer(board_routes(pages)) as server:
+        parser = PinterestParser(download_folder=args.folder)
+        parser.init_driver()
+        try:
+            parser.driver.get(server.base_url + "/board/")
+            time.sleep(2)
+            counter = count_commands(parser.driver)
+
+            for name, extract in [("legacy", lambda: legacy_extract_with_positions(parser)),
+                                  ("single-script", parser.extract_image_urls_with_positions)]:
+                counter["commands"] = 0
+                start = time.time()
+                data = extract()
+                elapsed = time.time() - start
+                unique = len({url for _, _, url in data})
+                print(f"{name:>14}: команд WebDriver = {counter['commands']:6d} | "
+                      f"время = {elapsed:7.2f} сек | записей = {len(data)} | уникальных URL = {unique}")
+        finally:
+            parser.close()
+
+
+def bench_scroll(args):
+    """
+    Команды WebDriver и время прокрутки доски: шаги из Python против одного асинхронного скрипта
+
+    Каждый способ запускается без количества пинов доски и с количеством из
+    встроенного состояния страницы (прокрутка заканчивается, когда собраны все пины).
+    """
+    pages = {"/board/": build_board_html(args.pins, similar_after=args.similar_after, board_path="/board/")}
+    with LocalServer(board_routes(pages)) as server:
+        parser = PinterestParser(download_folder=args.folder)
+        parser.init_driver()
+        try:
+            counter = count_commands(parser.driver)
+            for mode in ["python", "async"]:
+                for probe in [False, True]:
+                    parser.driver.get(server.base_url + "/board/")
+                    parser.scroll_mode = mode
+                    parser._similar_cutoff_cache = None
+                    counter["commands"] = 0
+                    start = time.time()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        if probe:
+                            parser.probe_pin_count()
+                        else:
+                            parser.expected_pin_count = None
+                        urls = list(parser.iter_scroll_images(max_images=args.max_images or None))
+                    elapsed = time.time() - start
+                    name = mode + (" + pin_count" if probe else "")
+                    print(f"{name:>18}: команд WebDriver = {counter['commands']:5d} | время = {elapsed:6.2f} сек | "
+                          f"найдено = {len(urls)}")
+        finally:
+            parser.close()
+
+
+# Добавляет на страницу следующие n пинов в разметке build_board_html (как подгрузка при прокрутке)
+ADD_PINS_SCRIPT = """
+var n = arguments[0], container = document.body.firstChild, start = container.children.length, html = [];
+for (var i = start; i < start + n; i++) {
+    var hex = ('0' + (i % 256).toString(16)).slice(-2), hi = ('0' + Math.floor(i / 256).toString(16)).slice(-2);
+    html.push("<div data-test-id='pin' style='display:inline-block;width:236px;height:300px'>" +
+              "<a href='/pin/" + (100000 + i) + "/'><img src='/i.pinimg.com/236x/" + hex + "/" + hi +
+              "/aa/pin" + ('00000' + i).slice(-6) + ".jpg' width='236' height='300'></a></div>");
+}
+container.insertAdjacentHTML('beforeend', html.join(''));
+"""
+
+
+def bench_harvest(args):
+    """Время прохода извлечения по мере роста доски: полный проход против инкрементального"""
+    pages = {"/board/": build_board_html(0)}
+    with LocalServer(board_routes(pages)) as server:
+        parser = PinterestParser(download_folder=args.folder)
+        parser.init_driver()
+        try:
+            for incremental in [False, True]:
+                parser.driver.get(server.base_url + "/board/")
+                parser.incremental_harvest = incremental
+                seen_urls = set()
+                checkpoint, segment, total = args.pins // 5, 0.0, 0.0
+                print("инкрементальный" if incremental else "полный проход")
+                for pins in range(args.batch, args.pins + 1, args.batch):
+                    parser.driver.execute_script(ADD_PINS_SCRIPT, args.batch)
+                    start = time.time()
+                    parser.collect_new_image_urls(seen_urls)
+                    elapsed = time.time() - start
+                    segment += elapsed
+                    total += elapsed
+                    if pins % checkpoint == 0:
+                        print(f"  пинов на странице = {pins:5d} | собрано = {len(seen_urls):5d} | "
+                              f"время последних {checkpoint} = {segment:6.2f} сек | всего = {total:6.2f} сек")
+                        segment = 0.0
+        finally:
+            parser.close()
+
+
+def bench_feed(args):
+    """Поиск изображений доски через ленту без браузера на локальном сервере-заглушке"""
+    if args.recordings:
+        board_response, feed_pages = load_feed_recordings(args.recordings)
+    else:
+        board_response, feed_pages = build_feed_recordings(args.pins)
+
+    routes = feed_routes(board_response, feed_pages)
+    with LocalServer(routes) as server:
+        parser = PinterestParser(download_folder=args.folder)
+        parser.api_base_url = server.base_url
+        try:
+            start = time.time()
+            image_urls = parser.fetch_board_feed_urls("https://www.pinterest.com/user/board/",
+                                                      max_images=args.max_images)
+            elapsed = time.time() - start
+        finally:
+            parser.close()
+
+    expected = []
+    for page in feed_pages:
+        for pin in page["resource_response"].get("data") or []:
+            url = parser.get_pin_image_url(pin)
+            if url and url not in expected:
+                expected.append(url)
+    if args.max_images:
+        expected = expected[:args.max_images]
+
+    print(f"Найдено URL: {len(image_urls or [])} | запросов: {routes.counter['requests']} | "
+          f"время = {elapsed:.2f} сек | порядок совпадает: {image_urls == expected}")
+
+
+def bench_stream(args):
+    """Время от начала поиска до последнего скачанного файла: сначала поиск, затем скачивание - и потоково"""
+    for name, streaming in [("collect-then-download", False), ("streaming", True)]:
+        folder = os.path.join(args.folder, name)
+        if os.path.isdir(folder):
+            for path in glob.glob(os.path.join(folder, "*")):
+                os.remove(path)
+
+        # Адрес сервера известен только после запуска, поэтому маршруты подставляются позже
+        current = {}
+        with LocalServer(lambda handler: current["routes"](handler)) as server:
+            board_response, feed_pages = build_feed_recordings(args.pins, image_base=server.base_url + "/i.pinimg.com")
+            current["routes"] = feed_routes(board_response, feed_pages, page_delay=args.page_delay,
+                                            image_delay=args.image_delay)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.api_base_url = server.base_url
+            parser.discovery_mode = "api"
+            try:
+                start = time.time()
+                image_urls = parser.iter_image_urls("https://www.pinterest.com/user/board/")
+                if not streaming:
+                    image_urls = iter(list(image_urls))
+                stats = parser.download_stream(image_urls)
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+        print(f"{name:>22}: время = {elapsed:6.2f} сек | скачано = {stats['downloaded']} | ошибок = {stats['failed']}")
+
+
+def bench_sync(args):
+    """Полная синхронизация доски, затем инкрементальная после добавления новых пинов в начало"""
+    folder = os.path.join(args.folder, "sync")
+    if os.path.isdir(folder):
+        for path in glob.glob(os.path.join(folder, "*")) + glob.glob(os.path.join(folder, BOARD_STATE_FILENAME)):
+            os.remove(path)
+
+    for name, new_pins in [("full", 0), ("incremental", args.new)]:
+        current = {}
+        with LocalServer(lambda handler: current["routes"](handler)) as server:
+            board_response, feed_pages = build_feed_recordings(args.pins, image_base=server.base_url + "/i.pinimg.com",
+                                                               new_pins=new_pins)
+            routes = current["routes"] = feed_routes(board_response, feed_pages, page_delay=args.page_delay)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.api_base_url = server.base_url
+            parser.discovery_mode = "api"
+            parser.incremental_sync = True
+            try:
+                start = time.time()
+                parser.parse_pinterest_url("https://www.pinterest.com/user/board/", auto_subfolder=False)
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+        files = len([path for path in os.listdir(folder) if not path.startswith(".")])
+        print(f"{name:>12}: время = {elapsed:6.2f} сек | запросов ленты = {routes.counter['requests']} | файлов = {files}")
+
+
+def image_routes(image_size, image_delay):
+    """Маршруты: изображения заданного размера с задержкой ответа"""
+    body = os.urandom(image_size)
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        time.sleep(image_delay)
+        return 200, {"Content-Type": "image/jpeg"}, body
+    return route
+
+
+def bench_engine(args):
+    """Изображений в секунду: пул потоков (max_workers) против asyncio + httpx (async_max_in_flight)"""
+    with LocalServer(image_routes(args.size, args.image_delay), separate_process=True) as server:
+        urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i:06d}.jpg"
+                for i in range(args.images)]
+        for backend in ["threads", "async"]:
+            folder = os.path.join(args.folder, "engine_" + backend)
+            if os.path.isdir(folder):
+                for path in glob.glob(os.path.join(folder, "*")):
+                    os.remove(path)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.download_backend = backend
+            parser.async_max_in_flight = args.in_flight
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+            print(f"{backend:>8}: {stats['downloaded'] / elapsed:7.1f} изобр/сек | время = {elapsed:6.2f} сек | "
+                  f"скачано = {stats['downloaded']} | ошибок = {stats['failed']}")
+        # Пул соединений requests используется потоками (async - собственный пул httpx)
+        print(f"Соединения (threads): {format_connection_stats()}")
+
+
+def bench_rate(args):
+    """Пауза потока после каждого изображения (прежний GUI) против общей корзины запросов"""
+    times = []
+    image_route = image_routes(args.size, args.image_delay)
+
+    def route(handler):
+        times.append(time.time())
+        return image_route(handler)
+
+    def run_sleeping(parser, urls):
+        def task(url, index):
+            parser.download_image(url, f"{index:05d}.jpg")
+            time.sleep(args.delay)
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(task, urls, range(len(urls))))
+
+    with LocalServer(route) as server:
+        urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i:06d}.jpg"
+                for i in range(args.images)]
+        for name in ["sleep", "token_bucket"]:
+            folder = os.path.join(args.folder, "rate_" + name)
+            if os.path.isdir(folder):
+                for path in glob.glob(os.path.join(folder, "*")):
+                    os.remove(path)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.adaptive_concurrency = False
+            parser.max_workers = args.workers
+            # В режиме sleep пауза делается в потоках, общая корзина не ограничивает
+            parser.download_rate = None if name == "sleep" else parser.rate_from_delay(args.delay)
+            del times[:]
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if name == "sleep":
+                        parser.apply_download_rate()
+                        run_sleeping(parser, urls)
+                    else:
+                        parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+            # Наибольшее количество запросов за любую секунду
+            peak = max(sum(1 for t in times if first <= t < first + 1) for first in times) if times else 0
+            print(f"{name:>12}: {len(times) / elapsed:6.2f} запросов/сек | пик за секунду = {peak} | "
+                  f"время = {elapsed:6.2f} сек")
+    print(f"Номинальная скорость: {args.workers} потоков / {args.delay} сек = {args.workers / args.delay:g} запросов/сек")
+
+
+def flaky_routes(image_size, image_delay, error_rate, outage_start, outage_length, seed=1):
+    """
+    Маршруты: изображения с временными ошибками
+
+    Доля error_rate запросов получает 503, а с outage_start по
+    outage_start + outage_length секунд от первого запроса сервер отвечает
+    503 с Retry-After на все запросы. route.counter - количество запросов.
+    """
+    body = os.urandom(image_size)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    state = {"first": None}
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        with lock:
+            route.counter += 1
+            now = time.time()
+            if state["first"] is None:
+                state["first"] = now
+            elapsed = now - state["first"]
+            failed = rng.random() < error_rate
+        time.sleep(image_delay)
+        if outage_start <= elapsed < outage_start + outage_length:
+            return 503, {"Content-Type": "text/plain", "Retry-After": "1"}, b"Service Unavailable"
+        if failed:
+            return 503, {"Content-Type": "text/plain"}, b"Service Unavailable"
+        return 200, {"Content-Type": "image/jpeg"}, body
+    route.counter = 0
+    return route
+
+
+def bench_retry(args):
+    """Временные ошибки сервера: перебор методов (без повторов) против повторов, автомата хоста и повторного прохода"""
+    for name in ["no_retry", "retry"]:
+        folder = os.path.join(args.folder, "retry_" + name)
+        if os.path.isdir(folder):
+            for path in glob.glob(os.path.join(folder, "*")):
+                os.remove(path)
+        route = flaky_routes(args.size, args.image_delay, args.error_rate, args.outage_start, args.outage_length)
+        with LocalServer(route) as server:
+            urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i:06d}.jpg"
+                    for i in range(args.images)]
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            if name == "no_retry":
+                parser.retry_attempts = 0
+                parser.deferred_retry = False
+                parser.circuit_breaker.failure_threshold = 10 ** 9
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+        print(f"{name:>9}: время = {elapsed:6.2f} сек | скачано = {stats['downloaded']} | ошибок = {stats['failed']} | "
+              f"запросов = {route.counter} | приостановка = {parser.circuit_breaker.paused_seconds:.0f} сек")
+
+
+def interrupting_routes(image_size, cut_fraction, change=False):
+    """
+    Маршруты: первый ответ на каждое изображение обрывается после cut_fraction тела
+
+    Поддерживается Range (206) и If-Range по ETag. При change после обрыва файл
+    на сервере заменяется другим (новый ETag). route.bytes_sent - отправлено
+    байт тела, route.body - итоговое содержимое изображения.
+    """
+    first_body = os.urandom(image_size)
+    body = os.urandom(image_size) if change else first_body
+    lock = threading.Lock()
+    interrupted = set()
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        with lock:
+            first = handler.path not in interrupted
+            interrupted.add(handler.path)
+        content, etag = (first_body, '"v1"') if first else (body, '"v2"' if change else '"v1"')
+        match = re.match(r"bytes=(\d+)-", handler.headers.get("Range", ""))
+        start = int(match.group(1)) if match else 0
+        if handler.headers.get("If-Range") not in (None, etag):
+            start = 0  # Файл изменился - полный ответ
+        if start:
+            status, headers = 206, {"Content-Range": f"bytes {start}-{image_size - 1}/{image_size}"}
+        else:
+            status, headers = 200, {}
+        headers["Content-Type"] = "image/jpeg"
+        headers["ETag"] = etag
+        part = content[start:]
+        if first:
+            # Заявлен полный размер, но соединение закрывается раньше
+            headers["Content-Length"] = str(len(part))
+            part = part[:int(len(part) * cut_fraction)]
+            handler.close_connection = True
+        with lock:
+            route.bytes_sent += len(part)
+        return status, headers, part
+    route.bytes_sent = 0
+    route.body = body
+    return route
+
+
+def bench_resume(args):
+    """Обрыв скачивания на cut доле: докачка через Range против скачивания заново"""
+    for name, resume in [("restart", False), ("range", True)]:
+        folder = os.path.join(args.folder, "resume_" + name)
+        if os.path.isdir(folder):
+            for path in glob.glob(os.path.join(folder, "*")):
+                os.remove(path)
+        route = interrupting_routes(args.size, args.cut, args.change)
+        with LocalServer(route) as server:
+            urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i:06d}.jpg"
+                    for i in range(args.images)]
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.retry_backoff = 0.05
+            parser.resume_partial = resume
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+        # Целый файл совпадает с изображением на сервере побайтно (а не только по размеру)
+        complete = 0
+        for path in glob.glob(os.path.join(folder, "*.jpg")):
+            with open(path, "rb") as f:
+                complete += f.read() == route.body
+        print(f"{name:>8}: время = {elapsed:6.2f} сек | скачано = {stats['downloaded']} | целых файлов = {complete} | "
+              f"передано = {route.bytes_sent / 2 ** 20:7.1f} МБ")
+
+
+def bench_size(args):
+    """Фильтр размера: скачать и удалить (прежний GUI) против решения по заголовкам ответа"""
+    rng = random.Random(1)
+    sizes = [int(rng.uniform(args.min_image_mb, args.max_image_mb) * 2 ** 20) for _ in range(args.images)]
+    data = os.urandom(max(sizes))
+    counter = {"bytes": 0}
+    lock = threading.Lock()
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        body = data[:sizes[int(handler.path.rsplit("pin", 1)[1].split(".")[0])]]
+
+        # Тело по частям, чтобы учесть отправленные байты, если клиент закрыл соединение
+        def chunks():
+            for position in range(0, len(body), 65536):
+                chunk = body[position:position + 65536]
+                yield chunk
+                with lock:
+                    counter["bytes"] += len(chunk)
+        return 200, {"Content-Type": "image/jpeg", "Content-Length": str(len(body))}, chunks()
+
+    with LocalServer(route) as server:
+        urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i}.jpg" for i in range(args.images)]
+        for name in ["download_then_delete", "headers"]:
+            folder = os.path.join(args.folder, "size_" + name)
+            if os.path.isdir(folder):
+                for path in glob.glob(os.path.join(folder, "*")):
+                    os.remove(path)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            if name == "headers":
+                parser.min_size_mb, parser.max_size_mb = args.min_mb, args.max_mb
+            counter["bytes"] = 0
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+            if name == "download_then_delete":
+                for path in glob.glob(os.path.join(folder, "*.jpg")):
+                    if not args.min_mb <= os.path.getsize(path) / 2 ** 20 <= args.max_mb:
+                        os.remove(path)
+            kept = len(glob.glob(os.path.join(folder, "*.jpg")))
+            print(f"{name:>20}: время = {elapsed:6.2f} сек | сохранено = {kept} | "
+                  f"передано = {counter['bytes'] / 2 ** 20:7.1f} МБ | пропущено = {stats['skipped']}")
+            if name == "headers":
+                print(f"{'':>20}  {parser.format_size_filter_stats()}")
+
+
+def fake_jpeg(width, height, size):
+    """Байты в формате JPEG с маркером SOF0 (width x height) и заданным размером"""
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    payload = os.urandom(max(0, size - len(sof) - 4))
+    return b"\xff\xd8" + sof + payload.replace(b"\xff", b"\x00") + b"\xff\xd9"
+
+
+def bench_resolution(args):
+    """Фильтр разрешения: скачать все против запроса начала файла; повторный запуск - по состоянию доски"""
+    rng = random.Random(1)
+    images = [fake_jpeg(rng.choice([236, 564, 736, 1200, 2000]), rng.choice([300, 800, 1500]), args.size)
+              for _ in range(args.images)]
+    counter = {"bytes": 0, "requests": 0}
+    lock = threading.Lock()
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        body = images[int(handler.path.rsplit("pin", 1)[1].split(".")[0])]
+        match = re.match(r"bytes=(\d+)-(\d*)", handler.headers.get("Range", ""))
+        status, headers = 200, {"Content-Type": "image/jpeg"}
+        if match:
+            start, end = int(match.group(1)), int(match.group(2) or len(body) - 1)
+            headers["Content-Range"] = f"bytes {start}-{min(end, len(body) - 1)}/{len(body)}"
+            status, body = 206, body[start:end + 1]
+        with lock:
+            counter["bytes"] += len(body)
+            counter["requests"] += 1
+        return status, headers, body
+
+    with LocalServer(route) as server:
+        urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i}.jpg" for i in range(args.images)]
+        folder = os.path.join(args.folder, "resolution")
+        for name in ["download_all", "probe", "probe_again"]:
+            if os.path.isdir(folder) and name != "probe_again":
+                for path in glob.glob(os.path.join(folder, "*")) + glob.glob(os.path.join(folder, ".*")):
+                    os.remove(path)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            if name != "download_all":
+                parser.min_width, parser.min_height = args.min_width, args.min_height
+            parser.load_board_state("https://www.pinterest.com/user/board/")
+            counter["bytes"] = counter["requests"] = 0
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+                parser.save_board_state()
+            finally:
+                parser.close()
+            print(f"{name:>12}: время = {elapsed:6.2f} сек | скачано = {stats['downloaded']} | "
+                  f"пропущено = {stats['skipped']} | запросов = {counter['requests']} | "
+                  f"передано = {counter['bytes'] / 2 ** 20:6.1f} МБ | проб = {parser.probe_stats['probed']}, "
+                  f"из состояния = {parser.probe_stats['cached']}")
+
+
+def disk_usage(folder):
+    """Место на диске под файлами папки: каждый inode учитывается один раз, символические ссылки - нет"""
+    inodes = {}
+    for root, dirs, files in os.walk(folder):
+        for name in files:
+            stat = os.lstat(os.path.join(root, name))
+            if not os.path.islink(os.path.join(root, name)):
+                inodes[(stat.st_dev, stat.st_ino)] = stat.st_size
+    return sum(inodes.values())
+
+
+def bench_dedup(args):
+    """Одни и те же пины на нескольких досках: скачивание в папку доски против общего хранилища"""
+    rng = random.Random(1)
+    images = [fake_jpeg(736, 1000, args.size) for _ in range(args.pool)]
+    # Часть пинов - повторные загрузки: другой ключ изображения, то же содержимое
+    reuploads = {args.pool + i: rng.randrange(args.pool) for i in range(args.reuploads)}
+    boards = [rng.sample(range(args.pool + args.reuploads), args.pins) for _ in range(args.boards)]
+    counter = {"bytes": 0, "requests": 0}
+    lock = threading.Lock()
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        index = int(handler.path.rsplit("pin", 1)[1].split(".")[0])
+        body = images[reuploads.get(index, index)]
+        with lock:
+            counter["bytes"] += len(body)
+            counter["requests"] += 1
+        return 200, {"Content-Type": "image/jpeg"}, body
+
+    with LocalServer(route) as server:
+        for name, store_key in [("per_board", None), ("store_image", "image"), ("store_sha256", "sha256")]:
+            folder = os.path.join(args.folder, "dedup_" + name)
+            shutil.rmtree(folder, ignore_errors=True)
+            counter["bytes"] = counter["requests"] = 0
+            start = time.time()
+            for board, pins in enumerate(boards):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    parser = PinterestParser(download_folder=os.path.join(folder, f"board{board}"))
+                parser.strategy_file = None
+                if store_key:
+                    parser.store_folder = os.path.join(folder, ".store")
+                    parser.store_key = store_key
+                urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i}.jpg" for i in pins]
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        parser.download_stream(iter(urls))
+                finally:
+                    parser.close()
+            elapsed = time.time() - start
+            saved = parser.get_store_report()["bytes_saved"] if store_key else 0
+            print(f"{name:>12}: время = {elapsed:6.2f} сек | запросов = {counter['requests']} | "
+                  f"передано = {counter['bytes'] / 2 ** 20:6.1f} МБ | на диске = {disk_usage(folder) / 2 ** 20:6.1f} МБ | "
+                  f"экономия ссылок по отчету = {saved / 2 ** 20:6.1f} МБ")
+
+
+def throttling_routes(image_size, image_delay, capacity):
+    """
+    Маршруты: изображения с ограничением сервера
+
+    Одновременно обслуживается не больше capacity запросов, лишние получают 429;
+    задержка ответа растет с количеством одновременных запросов.
+    """
+    body = os.urandom(image_size)
+    lock = threading.Lock()
+    state = {"in_flight": 0}
+
+    def route(handler):
+        if "pinimg.com" not in handler.path:
+            return None
+        with lock:
+            if state["in_flight"] >= capacity:
+                return 429, {"Content-Type": "text/plain", "Retry-After": "1"}, b"Too Many Requests"
+            state["in_flight"] += 1
+            in_flight = state["in_flight"]
+        try:
+            time.sleep(image_delay * (1 + 2 * in_flight / capacity))
+        finally:
+            with lock:
+                state["in_flight"] -= 1
+        return 200, {"Content-Type": "image/jpeg"}, body
+    return route
+
+
+def bench_aimd(args):
+    """Фиксированное количество потоков против адаптивного предела на сервере с ограничением (429)"""
+    runs = [
+        (f"fixed {args.workers}", False, args.workers),
+        (f"fixed {args.max}", False, args.max),
+        ("adaptive", True, args.workers),
+    ]
+    with LocalServer(throttling_routes(args.size, args.image_delay, args.capacity), separate_process=True) as server:
+        urls = [f"{server.base_url}/i.pinimg.com/originals/{i % 256:02x}/aa/bb/pin{i:06d}.jpg"
+                for i in range(args.images)]
+        for label, adaptive, workers in runs:
+            folder = os.path.join(args.folder, "aimd_" + label.replace(" ", "_"))
+            if os.path.isdir(folder):
+                for path in glob.glob(os.path.join(folder, "*")):
+                    os.remove(path)
+            parser = PinterestParser(download_folder=folder)
+            parser.strategy_file = None
+            parser.adaptive_concurrency = adaptive
+            parser.max_workers = workers
+            parser.max_concurrency = args.max
+            try:
+                start = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    stats = parser.download_stream(iter(urls))
+                elapsed = time.time() - start
+            finally:
+                parser.close()
+            print(f"{label:>9}: {stats['downloaded'] / elapsed:7.1f} изобр/сек | время = {elapsed:6.2f} сек | "
+                  f"скачано = {stats['downloaded']} | ошибок = {stats['failed']}")
+            if adaptive:
+                print(f"           {parser.concurrency.format_stats()}")
+                for at, old, new, reason in parser.concurrency.decisions[:args.show_decisions]:
+                    print(f"           {at:6.2f} сек: {old} → {new} ({reason})")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Бенчмарки Pinterest парсера")
+    arg_parser.add_argument("--folder", default="benchmark_output", help="Папка для файлов бенчмарка")
+    subparsers = arg_parser.add_subparsers(dest="benchmark", required=True)
+
+    extraction = subparsers.add_parser("extraction", help="Команды WebDriver на проход извлечения")
+    extraction.add_argument("--pins", type=int, default=300)
+    extraction.add_argument("--similar-after", type=int, default=None)
+    extraction.set_defaults(func=bench_extraction)
+
+    scroll = subparsers.add_parser("scroll", help="Прокрутка доски: команды из Python против одного скрипта в браузере")
+    scroll.add_argument("--pins", type=int, default=300)
+    scroll.add_argument("--similar-after", type=int, default=None)
+    scroll.add_argument("--max-images", type=int, default=0, help="Нужное количество (0 = все)")
+    scroll.set_defaults(func=bench_scroll)
+
+    harvest = subparsers.add_parser("harvest", help="Проходы извлечения при росте доски: полный против инкрементального")
+    harvest.add_argument("--pins", type=int, default=5000)
+    harvest.add_argument("--batch", type=int, default=25, help="Пинов, добавляемых перед каждым проходом")
+    harvest.set_defaults(func=bench_harvest)
+
+    state = subparsers.add_parser("state", help="Первая порция пинов из встроенного состояния страницы без браузера")
+    state.add_argument("--pins", type=int, default=500, help="Пинов на доске")
+    state.add_argument("--padding", type=int, default=1500000, help="Размер остальной страницы (байт)")
+    state.add_argument("--repeat", type=int, default=5)
+    state.set_defaults(func=bench_state)
+
+    feed = subparsers.add_parser("feed", help="Лента доски без браузера по записанным JSON страницам")
+    feed.add_argument("--pins", type=int, default=2000, help="Размер синтетической доски")
+    feed.add_argument("--recordings", default=None, help="Папка с board.json и feed_*.json")
+    feed.add_argument("--max-images", type=int, default=None)
+    feed.set_defaults(func=bench_feed)
+
+    stream = subparsers.add_parser("stream", help="Сквозное время поиска и скачивания: потоково и последовательно")
+    stream.add_argument("--pins", type=int, default=300)
+    stream.add_argument("--page-delay", type=float, default=0.5, help="Задержка страницы ленты (сек)")
+    stream.add_argument("--image-delay", type=float, default=0.05, help="Задержка ответа изображения (сек)")
+    stream.set_defaults(func=bench_stream)
+
+    sync = subparsers.add_parser("sync", help="Инкрементальная синхронизация доски после добавления новых пинов")
+    sync.add_argument("--pins", type=int, default=2000)
+    sync.add_argument("--new", type=int, default=10, help="Новых пинов в начале доски")
+    sync.add_argument("--page-delay", type=float, default=0.3, help="Задержка страницы ленты (сек)")
+    sync.set_defaults(func=bench_sync)
+
+    engine = subparsers.add_parser("engine", help="Скорость скачивания: пул потоков против asyncio + httpx")
+    engine.add_argument("--images", type=int, default=500)
+    engine.add_argument("--size", type=int, default=50000, help="Размер изображения (байт)")
+    engine.add_argument("--image-delay", type=float, default=0.05, help="Задержка ответа изображения (сек)")
+    engine.add_argument("--in-flight", type=int, default=16, help="Одновременных запросов в режиме async")
+    engine.set_defaults(func=bench_engine)
+
+    rate = subparsers.add_parser("rate", help="Пауза после каждого изображения против общего ограничения скорости")
+    rate.add_argument("--images", type=int, default=100)
+    rate.add_argument("--size", type=int, default=20000, help="Размер изображения (байт)")
+    rate.add_argument("--image-delay", type=float, default=0.2, help="Задержка ответа изображения (сек)")
+    rate.add_argument("--workers", type=int, default=5)
+    rate.add_argument("--delay", type=float, default=0.5, help="Задержка скачивания (сек)")
+    rate.set_defaults(func=bench_rate)
+
+    retry = subparsers.add_parser("retry", help="Временные ошибки (503) и отказ сервера: без повторов и с повторами")
+    retry.add_argument("--images", type=int, default=300)
+    retry.add_argument("--size", type=int, default=20000, help="Размер изображения (байт)")
+    retry.add_argument("--image-delay", type=float, default=0.02, help="Задержка ответа изображения (сек)")
+    retry.add_argument("--error-rate", type=float, default=0.1, help="Доля случайных ответов 503")
+    retry.add_argument("--outage-start", type=float, default=0.5, help="Начало полного отказа (сек от первого запроса)")
+    retry.add_argument("--outage-length", type=float, default=2.0, help="Длительность полного отказа (сек)")
+    retry.set_defaults(func=bench_retry)
+
+    resume = subparsers.add_parser("resume", help="Оборванные скачивания: докачка через Range против скачивания заново")
+    resume.add_argument("--images", type=int, default=20)
+    resume.add_argument("--size", type=int, default=5 * 2 ** 20, help="Размер изображения (байт)")
+    resume.add_argument("--cut", type=float, default=0.9, help="Доля тела до обрыва первого ответа")
+    resume.add_argument("--change", action="store_true",
+                        help="Файл на сервере меняется после обрыва (докачка должна начаться сначала)")
+    resume.set_defaults(func=bench_resume)
+
+    size = subparsers.add_parser("size", help="Фильтр размера: скачать и удалить против решения по Content-Length")
+    size.add_argument("--images", type=int, default=60)
+    size.add_argument("--min-image-mb", type=float, default=0.1)
+    size.add_argument("--max-image-mb", type=float, default=8.0)
+    size.add_argument("--min-mb", type=float, default=1.0, help="Минимальный размер фильтра (МБ)")
+    size.add_argument("--max-mb", type=float, default=3.0, help="Максимальный размер фильтра (МБ)")
+    size.set_defaults(func=bench_size)
+
+    resolution = subparsers.add_parser("resolution", help="Фильтр разрешения по началу файла (Range)")
+    resolution.add_argument("--images", type=int, default=60)
+    resolution.add_argument("--size", type=int, default=2 * 2 ** 20, help="Размер изображения (байт)")
+    resolution.add_argument("--min-width", type=int, default=1000)
+    resolution.add_argument("--min-height", type=int, default=700)
+    resolution.set_defaults(func=bench_resolution)
+
+    dedup = subparsers.add_parser("dedup", help="Повторы пинов на разных досках: папки досок против общего хранилища")
+    dedup.add_argument("--boards", type=int, default=4)
+    dedup.add_argument("--pins", type=int, default=60, help="Пинов на доске")
+    dedup.add_argument("--pool", type=int, default=100, help="Разных изображений на всех досках")
+    dedup.add_argument("--reuploads", type=int, default=20, help="Повторных загрузок (другой ключ, то же содержимое)")
+    dedup.add_argument("--size", type=int, default=300000, help="Размер изображения (байт)")
+    dedup.set_defaults(func=bench_dedup)
+
+    aimd = subparsers.add_parser("aimd", help="Адаптивная параллельность на сервере, отвечающем 429 при перегрузке")
+    aimd.add_argument("--images", type=int, default=400)
+    aimd.add_argument("--size", type=int, default=20000, help="Размер изображения (байт)")
+    aimd.add_argument("--image-delay", type=float, default=0.05, help="Задержка ответа без нагрузки (сек)")
+    aimd.add_argument("--capacity", type=int, default=12, help="Одновременных запросов, обслуживаемых сервером")
+    aimd.add_argument("--workers", type=int, default=5, help="Фиксированное количество потоков (начальный предел)")
+    aimd.add_argument("--max", type=int, default=32, help="Верхняя граница адаптивного предела")
+    aimd.add_argument("--show-decisions", type=int, default=15, help="Сколько решений регулятора показать")
+    aimd.set_defaults(func=bench_aimd)
+
+    args = arg_parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
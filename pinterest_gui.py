@@ -14,15 +14,15 @@ import subprocess
 from datetime import datetime
 from pathlib import Path
 from PIL import Image, ImageTk
-import requests
 from io import BytesIO
 from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
 try:
     from win10toast import ToastNotifier
     HAS_TOAST = True
 except ImportError:
     HAS_TOAST = False
-from pinterest_parser import PinterestParser
+from pinterest_parser import PinterestParser, create_http_session, format_connection_stats, format_rate_limit_stats
 
 
 class PinterestDownloaderGUI:
@@ -40,6 +40,7 @@ class PinterestDownloaderGUI:
         self.is_downloading = False
         self.is_paused = False
         self.download_thread = None
+        self.stats_lock = threading.Lock()  # Счетчики stats изменяются из потоков скачивания
         self.total_images_to_download = 0  # Общее количество изображений для прогресс-бара
         self.current_downloaded_count = 0  # Текущее количество скачанных
         self.max_images = tk.IntVar(value=0)  # 0 = все изображения
@@ -47,9 +48,14 @@ class PinterestDownloaderGUI:
         self.image_quality = tk.StringVar(value="full")  # full, medium, small
         self.min_size_mb = tk.DoubleVar(value=0.0)
         self.max_size_mb = tk.DoubleVar(value=1000.0)
+        self.min_width_px = tk.IntVar(value=0)
+        self.min_height_px = tk.IntVar(value=0)
         self.auto_rename = tk.BooleanVar(value=True)
         self.auto_subfolder = tk.BooleanVar(value=True)  # Автоподпапки
         self.resume_download = tk.BooleanVar(value=True)  # Продолжение скачивания
+        self.incremental_sync = tk.BooleanVar(value=False)  # Скачивать только новые пины доски
+        self.link_sequential = tk.BooleanVar(value=False)  # Порядковые имена в подпапке ordered
+        self.use_store = tk.BooleanVar(value=False)  # Общее хранилище изображений (повторы - ссылками)
         self.windows_notifications = tk.BooleanVar(value=True)  # Уведомления Windows
         self.export_metadata = tk.BooleanVar(value=False)  # Экспорт метаданных
         self.filename_template = tk.StringVar(value="{index04}_{hash}.jpg")  # Шаблон имени файла
@@ -709,6 +715,15 @@ class PinterestDownloaderGUI:
                    textvariable=self.max_size_mb, width=10, style="Mac.TSpinbox").grid(row=0, column=3, padx=(0, 8))
         ttk.Label(size_frame, text="МБ", style="Mac.TLabel").grid(row=0, column=4)
 
+        # Минимальное разрешение (проверяется по началу файла до скачивания)
+        ttk.Label(size_frame, text="Ширина от", style="Mac.TLabel").grid(row=1, column=0, padx=(0, 8), pady=(6, 0))
+        ttk.Spinbox(size_frame, from_=0, to=10000, increment=100,
+                   textvariable=self.min_width_px, width=10, style="Mac.TSpinbox").grid(row=1, column=1, padx=(0, 8), pady=(6, 0))
+        ttk.Label(size_frame, text="высота от", style="Mac.TLabel").grid(row=1, column=2, padx=(0, 8), pady=(6, 0))
+        ttk.Spinbox(size_frame, from_=0, to=10000, increment=100,
+                   textvariable=self.min_height_px, width=10, style="Mac.TSpinbox").grid(row=1, column=3, padx=(0, 8), pady=(6, 0))
+        ttk.Label(size_frame, text="px", style="Mac.TLabel").grid(row=1, column=4, pady=(6, 0))
+
         # Upscale настройки - перемещаем сразу после качества для лучшей видимости
         ttk.Label(advanced_frame, text="Upscale:", style="Mac.TLabel",
                  font=(self.font_family, 12, "bold")).grid(row=5, column=0, sticky=tk.W, pady=(12, 5))
@@ -762,37 +777,49 @@ class PinterestDownloaderGUI:
         ttk.Checkbutton(advanced_frame, text="Продолжать прерванное скачивание (resume)",
                        variable=self.resume_download, style="Mac.TCheckbutton").grid(row=9, column=0, sticky=tk.W, pady=(0, 8))
 
+        # Инкрементальная синхронизация
+        ttk.Checkbutton(advanced_frame, text="Только новые пины (инкрементальная синхронизация)",
+                       variable=self.incremental_sync, style="Mac.TCheckbutton").grid(row=10, column=0, sticky=tk.W, pady=(0, 8))
+
+        # Порядковые имена отдельно от имен файлов и общее хранилище изображений
+        links_frame = tk.Frame(advanced_frame, bg=self.frame_bg)
+        links_frame.grid(row=11, column=0, sticky=tk.W, pady=(0, 8))
+        ttk.Checkbutton(links_frame, text="Порядковые имена в подпапке ordered (ссылки)",
+                       variable=self.link_sequential, style="Mac.TCheckbutton").grid(row=0, column=0, sticky=tk.W)
+        ttk.Checkbutton(links_frame, text="Общее хранилище .store (повторы без скачивания)",
+                       variable=self.use_store, style="Mac.TCheckbutton").grid(row=1, column=0, sticky=tk.W, pady=(8, 0))
+
         # Уведомления Windows
         ttk.Checkbutton(advanced_frame, text="Уведомления Windows о завершении",
-                       variable=self.windows_notifications, style="Mac.TCheckbutton").grid(row=10, column=0, sticky=tk.W, pady=(0, 8))
+                       variable=self.windows_notifications, style="Mac.TCheckbutton").grid(row=12, column=0, sticky=tk.W, pady=(0, 8))
 
         # Экспорт метаданных
         ttk.Checkbutton(advanced_frame, text="Экспорт метаданных в JSON",
-                       variable=self.export_metadata, style="Mac.TCheckbutton").grid(row=11, column=0, sticky=tk.W, pady=(0, 8))
+                       variable=self.export_metadata, style="Mac.TCheckbutton").grid(row=13, column=0, sticky=tk.W, pady=(0, 8))
 
         # Шаблон имени файла
-        ttk.Label(advanced_frame, text="Шаблон имени файла:", style="Mac.TLabel").grid(row=12, column=0, sticky=tk.W, pady=(12, 5))
+        ttk.Label(advanced_frame, text="Шаблон имени файла:", style="Mac.TLabel").grid(row=14, column=0, sticky=tk.W, pady=(12, 5))
         template_frame = tk.Frame(advanced_frame, bg=self.frame_bg)
-        template_frame.grid(row=13, column=0, sticky=(tk.W, tk.E), pady=(0, 6))
+        template_frame.grid(row=15, column=0, sticky=(tk.W, tk.E), pady=(0, 6))
         template_frame.columnconfigure(0, weight=1)
 
         template_entry = ttk.Entry(template_frame, textvariable=self.filename_template, width=20, style="Mac.TEntry")
         template_entry.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 0))
 
         template_help = tk.Label(template_frame,
-                                 text="Доступно: {index}, {index04}, {date}, {time}, {datetime}, {board}, {hash}",
+                                 text="Доступно: {index}, {index04}, {date}, {time}, {datetime}, {board}, {hash}, {pin_id}, {img_key}",
                                  bg=self.frame_bg, fg="#6E6E73",
                                  font=(self.font_family, 9))
         template_help.grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
 
         # Задержки
-        ttk.Label(advanced_frame, text="Задержка прокрутки (сек):", style="Mac.TLabel").grid(row=14, column=0, sticky=tk.W, pady=(0, 5))
+        ttk.Label(advanced_frame, text="Задержка прокрутки (сек):", style="Mac.TLabel").grid(row=16, column=0, sticky=tk.W, pady=(0, 5))
         ttk.Spinbox(advanced_frame, from_=0.5, to=10.0, increment=0.5,
-                   textvariable=self.scroll_delay, width=12, style="Mac.TSpinbox").grid(row=15, column=0, sticky=tk.W, pady=(0, 6))
+                   textvariable=self.scroll_delay, width=12, style="Mac.TSpinbox").grid(row=17, column=0, sticky=tk.W, pady=(0, 6))
 
-        ttk.Label(advanced_frame, text="Задержка скачивания (сек):", style="Mac.TLabel").grid(row=16, column=0, sticky=tk.W, pady=(0, 5))
+        ttk.Label(advanced_frame, text="Задержка скачивания (сек):", style="Mac.TLabel").grid(row=18, column=0, sticky=tk.W, pady=(0, 5))
         ttk.Spinbox(advanced_frame, from_=0.1, to=5.0, increment=0.1,
-                   textvariable=self.download_delay, width=12, style="Mac.TSpinbox").grid(row=17, column=0, sticky=tk.W, pady=(0, 6))
+                   textvariable=self.download_delay, width=12, style="Mac.TSpinbox").grid(row=19, column=0, sticky=tk.W, pady=(0, 6))
 
         # Обновляем размер контейнера после создания всех элементов
         def update_advanced_container_size():
@@ -1833,7 +1860,6 @@ class PinterestDownloaderGUI:
             base_parser.scroll_delay = self.scroll_delay.get()
             base_parser.download_delay = self.download_delay.get()
             base_parser.image_quality = self.image_quality.get()
-            base_parser.max_workers = 5
 
             # Инициализируем браузер один раз
             self.safe_update_ui(lambda: self.progress_var.set("Инициализация браузера...") or 0)
@@ -1955,7 +1981,6 @@ class PinterestDownloaderGUI:
                 parser.scroll_delay = self.scroll_delay.get()
                 parser.download_delay = self.download_delay.get()
                 parser.image_quality = self.image_quality.get()
-                parser.max_workers = 5
 
                 # Инициализация браузера только если не переиспользуем
                 self.safe_update_ui(lambda: self.progress_var.set("Инициализация браузера...") or 0)
@@ -1976,7 +2001,26 @@ class PinterestDownloaderGUI:
             # Открытие страницы (браузер уже открыт если переиспользуем)
             self.safe_update_ui(lambda: self.progress_var.set("Открытие страницы...") or 0)
             parser.driver.get(expanded_url)
-            time.sleep(5)
+            parser.wait_stats = {}
+            parser.expected_pin_count = None
+
+            # Первая порция пинов и количество пинов - из встроенного состояния страницы
+            initial_urls, initial_complete = parser.read_initial_state(expanded_url)
+            limit = max_images or self.max_images.get()
+            initial_enough = initial_complete or (limit > 0 and len(initial_urls) >= limit)
+            if not initial_enough:
+                # Ждем первых пинов и затихания сети (не дольше прежних 5 секунд)
+                parser.wait_until_ready("загрузка страницы", 5, min_pins=1)
+
+            # Количество пинов доски: бюджет прокруток, остановка и размер прогресс-бара до прокрутки
+            pin_count = parser.expected_pin_count
+            if pin_count is None and not initial_enough:
+                pin_count = parser.probe_pin_count()
+            if pin_count:
+                expected = min(pin_count, max_images or self.max_images.get() or pin_count)
+                self.safe_update_ui(lambda n=pin_count: self.log(f"На доске {n} пинов") or 0)
+                self.safe_update_ui(lambda t=self.total_images_to_download + expected:
+                                  self.progress_bar.config(maximum=max(1, t)) or 0)
 
             # Получаем название доски из страницы если еще не получили
             if not board_name and self.auto_subfolder.get():
@@ -2010,10 +2054,27 @@ class PinterestDownloaderGUI:
             else:
                 self.safe_update_ui(lambda: self.progress_var.set("Поиск изображений...") or 0)
 
-            # Прокручиваем и собираем изображения с ограничением
-            # Если указано ограничение, собираем только первые N (самые новые)
-            parser.scroll_and_load_images(max_images=max_count if max_count > 0 else None)
-            image_urls = parser.extract_image_urls(max_images=max_count if max_count > 0 else None)
+            # Известные пины доски (для инкрементальной синхронизации)
+            parser.load_board_state(expanded_url)
+
+            if self.incremental_sync.get() and parser.known_pin_keys:
+                # Прокручиваем только до уже скачанной части доски
+                self.safe_update_ui(lambda n=len(parser.known_pin_keys):
+                                  self.log(f"Инкрементальная синхронизация: известно {n} пинов доски") or 0)
+                source = iter(initial_urls) if initial_complete else parser.iter_scroll_images()
+                image_urls = list(parser.filter_known_pins(source, max_images=max_count if max_count > 0 else None))
+            elif initial_enough:
+                # Первой порции из состояния страницы достаточно - прокрутка не нужна
+                image_urls = initial_urls[:max_count] if max_count > 0 else initial_urls
+                self.safe_update_ui(lambda n=len(image_urls): self.log(f"Пины из состояния страницы без прокрутки: {n}") or 0)
+            else:
+                # Прокручиваем и собираем изображения с ограничением
+                # Если указано ограничение, собираем только первые N (самые новые)
+                parser.scroll_and_load_images(max_images=max_count if max_count > 0 else None)
+                image_urls = parser.extract_image_urls(max_images=max_count if max_count > 0 else None)
+
+            if parser.wait_stats:
+                self.safe_update_ui(lambda w=parser.format_wait_stats(): self.log(f"Ожидание страницы: {w}") or 0)
 
             # Логирование уже выполняется в extract_image_urls(), но можно добавить дополнительное сообщение
             if max_count > 0 and len(image_urls) > 0:
@@ -2048,156 +2109,134 @@ class PinterestDownloaderGUI:
             # Запускаем обновление таймера через главный поток
             self.safe_after(1000, lambda: self.update_download_timer())
 
-            # Скачивание изображений
-            downloaded = 0
-            failed = 0
-            skipped = 0
-
-            for index, img_url in enumerate(image_urls):
-                if not self.is_downloading:
-                    break
+            # Скачивание изображений параллельно: количество одновременных скачиваний
+            # подбирается по ответам сервера (ConcurrencyController парсера)
+            board_stats = {"downloaded": 0, "failed": 0, "skipped": 0}
+            total = len(image_urls)
+            resume = self.resume_download.get()
+            filename_template = self.filename_template.get() if self.auto_rename.get() else None
+            # Фильтр размера применяется парсером по заголовкам ответа, до скачивания тела
+            parser.min_size_mb = self.min_size_mb.get()
+            parser.max_size_mb = self.max_size_mb.get()
+            parser.min_width = self.min_width_px.get()
+            parser.min_height = self.min_height_px.get()
+            parser.size_filter_stats = {"skipped": 0, "bytes_saved": 0}
+            parser.probe_stats = {"probed": 0, "cached": 0}
+            # Общее хранилище - в корневой папке скачивания, общее для всех досок
+            parser.store_folder = os.path.join(self.download_folder.get(), ".store") if self.use_store.get() else None
+            parser.store_stats = {"linked": 0, "stored": 0, "duplicates": 0, "bytes_saved": 0, "links": {}}
+            parser.deferred_downloads = {}  # Отложенные изображения предыдущей доски не повторяются
+            # Задержка скачивания задает общую скорость запросов (см. PinterestParser.rate_from_delay)
+            parser.download_delay = self.download_delay.get()
+            parser.download_rate = parser.rate_from_delay(parser.download_delay)
+            parser.apply_download_rate()
+            workers = parser.get_download_workers()
+            gui_log = lambda m: self.safe_update_ui(lambda m=m: self.log(m) or 0)
+            controller = parser.start_concurrency_controller(log=gui_log)
+            parser.circuit_breaker.log = gui_log
+            # Ограничивает количество ожидающих и выполняющихся задач
+            slots = threading.BoundedSemaphore(workers * 2)
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for index, img_url in enumerate(image_urls):
+                    if not self.is_downloading:
+                        break
 
-                # Ожидание при паузе
-                while self.is_paused and self.is_downloading:
-                    time.sleep(0.5)
+                    # Ожидание при паузе
+                    while self.is_paused and self.is_downloading:
+                        time.sleep(0.5)
 
-                if not self.is_downloading:
-                    break
+                    if not self.is_downloading:
+                        break
 
-                # Получение URL с нужным качеством
-                full_url = None
-                try:
-                    full_url = parser.get_full_image_url(img_url, parser.image_quality)
-                except Exception as e:
-                    self.safe_update_ui(lambda e=e, u=img_url:
-                                      self.log(f"❌ Ошибка получения полного URL для {u[:50]}...: {e}") or 0)
-                    failed += 1
-                    self.current_downloaded_count += 1
-                    # Обновляем прогресс даже при ошибке
-                    self.safe_update_ui(lambda c=self.current_downloaded_count, t=self.total_images_to_download:
-                                      self.progress_bar.config(value=c) or 0)
-                    self.safe_update_ui(lambda i=index+1, t=len(image_urls), c=self.current_downloaded_count, tot=self.total_images_to_download:
-                                      self.progress_var.set(f"Скачивание: {i}/{t} (всего: {c}/{tot})") or 0)
-                    self.stats["failed"] = failed
-                    self.safe_after(0, lambda: self.update_stats() or 0)
-                    continue
-
-                if not full_url:
-                    failed += 1
-                    self.current_downloaded_count += 1
-                    self.safe_update_ui(lambda u=img_url:
-                                      self.log(f"❌ Не удалось получить полный URL для изображения: {u[:50]}...") or 0)
-                    # Обновляем прогресс даже при ошибке
-                    self.safe_update_ui(lambda c=self.current_downloaded_count, t=self.total_images_to_download:
-                                      self.progress_bar.config(value=c) or 0)
-                    self.safe_update_ui(lambda i=index+1, t=len(image_urls), c=self.current_downloaded_count, tot=self.total_images_to_download:
-                                      self.progress_var.set(f"Скачивание: {i}/{t} (всего: {c}/{tot})") or 0)
-                    self.stats["failed"] = failed
-                    self.safe_after(0, lambda: self.update_stats() or 0)
-                    continue
-
-                # Генерация имени файла с шаблоном
-                if self.auto_rename.get() and self.filename_template.get():
-                    filename = parser.get_filename_from_url(full_url, index + 1,
-                                                          self.filename_template.get())
-                else:
-                    filename = parser.get_filename_from_url(full_url, index + 1)
-                    if self.auto_rename.get():
-                        filename = f"pin_{index+1:04d}_{filename}"
-
-                filepath = os.path.join(parser.download_folder, filename)
-
-                # Пропуск существующих (resume функционал)
-                if os.path.exists(filepath) and self.resume_download.get():
-                    skipped += 1
-                    self.current_downloaded_count += 1
-                    # Обновляем прогресс даже для пропущенных файлов
-                    self.safe_update_ui(lambda c=self.current_downloaded_count, t=self.total_images_to_download:
-                                      self.progress_bar.config(value=c) or 0)
-                    self.safe_update_ui(lambda i=index+1, t=len(image_urls), c=self.current_downloaded_count, tot=self.total_images_to_download:
-                                      self.progress_var.set(f"Скачивание: {i}/{t} (всего: {c}/{tot})") or 0)
-                    self.safe_update_ui(lambda f=filename: self.log(f"⏭ Пропущено (уже существует): {f}") or 0)
-                    continue
-                elif os.path.exists(filepath) and not self.resume_download.get():
-                    # Если resume отключен, перезаписываем
+                    # Получение URL с нужным качеством
+                    full_url = None
                     try:
-                        os.remove(filepath)
+                        full_url = parser.get_full_image_url(img_url, parser.image_quality)
                     except Exception as e:
-                        self.safe_update_ui(lambda e=e: self.log(f"⚠️ Не удалось удалить существующий файл: {e}") or 0)
+                        self.safe_update_ui(lambda e=e, u=img_url:
+                                          self.log(f"❌ Ошибка получения полного URL для {u[:50]}...: {e}") or 0)
 
-                # Скачивание
-                self.safe_update_ui(lambda f=filename: self.log(f"⬇ Скачиваю: {f}") or 0)
+                    if not full_url:
+                        self.safe_update_ui(lambda u=img_url:
+                                          self.log(f"❌ Не удалось получить полный URL для изображения: {u[:50]}...") or 0)
+                        self.record_image_result(board_stats, "failed", total)
+                        continue
 
-                download_success = False
-                try:
-                    download_success = parser.download_image(full_url, filename)
-                except Exception as e:
-                    import traceback
-                    error_details = traceback.format_exc()
-                    self.safe_update_ui(lambda e=e, f=filename, d=error_details:
-                                      self.log(f"❌ Исключение при скачивании {f}: {e}\nДетали: {d}") or 0)
-                    download_success = False
+                    # Генерация имени файла с шаблоном
+                    if filename_template:
+                        filename = parser.get_filename_from_url(full_url, index + 1, filename_template)
+                    else:
+                        filename = parser.get_filename_from_url(full_url, index + 1)
+                        if self.auto_rename.get():
+                            filename = f"pin_{index+1:04d}_{filename}"
 
-                if download_success:
-                    # Проверка размера файла
-                    try:
-                        if os.path.exists(filepath):
-                            file_size_mb = os.path.getsize(filepath) / (1024 * 1024)
-                            if file_size_mb < self.min_size_mb.get() or file_size_mb > self.max_size_mb.get():
-                                try:
-                                    os.remove(filepath)
-                                except:
-                                    pass
-                                skipped += 1
-                                self.current_downloaded_count += 1
-                                self.safe_update_ui(lambda f=filename, s=file_size_mb:
-                                                  self.log(f"⏭ Пропущено (размер {s:.2f} МБ не подходит): {f}") or 0)
-                                # Обновляем прогресс
-                                self.safe_update_ui(lambda c=self.current_downloaded_count, t=self.total_images_to_download:
-                                                  self.progress_bar.config(value=c) or 0)
-                                self.safe_update_ui(lambda i=index+1, t=len(image_urls), c=self.current_downloaded_count, tot=self.total_images_to_download:
-                                                  self.progress_var.set(f"Скачивание: {i}/{t} (всего: {c}/{tot})") or 0)
-                                self.stats["skipped"] = skipped
-                                self.stats["downloaded"] = downloaded
-                                self.stats["failed"] = failed
-                                self.safe_after(0, lambda: self.update_stats() or 0)
-                                continue
-                            else:
-                                downloaded += 1
-                                self.current_downloaded_count += 1
-                                self.safe_update_ui(lambda f=filename, s=file_size_mb:
-                                                  self.log(f"✓ Скачано ({s:.2f} МБ): {f}") or 0)
-                        else:
-                            # Файл не был создан
-                            failed += 1
-                            self.safe_update_ui(lambda f=filename:
-                                              self.log(f"❌ Файл не был создан: {f}") or 0)
-                    except Exception as e:
-                        self.safe_update_ui(lambda e=e, f=filename:
-                                          self.log(f"⚠️ Ошибка проверки размера файла {f}: {e}") or 0)
-                        # Считаем успешным если файл существует
-                        if os.path.exists(filepath):
-                            downloaded += 1
-                            self.current_downloaded_count += 1
-                else:
-                    failed += 1
-                    self.current_downloaded_count += 1
-                    self.safe_update_ui(lambda f=filename, u=full_url[:50]:
-                                      self.log(f"❌ Ошибка скачивания: {f} (URL: {u}...)") or 0)
+                    parser.board_order.append(parser.get_image_key(full_url))
 
-                # Обновляем прогресс после каждой попытки скачивания (включая ошибки)
-                self.safe_update_ui(lambda c=self.current_downloaded_count, t=self.total_images_to_download:
-                                  self.progress_bar.config(value=c) or 0)
-                self.safe_update_ui(lambda i=index+1, t=len(image_urls), c=self.current_downloaded_count, tot=self.total_images_to_download:
-                                  self.progress_var.set(f"Скачивание: {i}/{t} (всего: {c}/{tot})") or 0)
-                # Таймер обновляется автоматически каждую секунду
+                    # Пропуск уже скачанных (resume функционал) - по ключу изображения,
+                    # поэтому сдвиг номеров на доске не вызывает повторного скачивания
+                    already_downloaded = False
+                    if resume:
+                        filename, already_downloaded = parser.resolve_download_filename(full_url, filename)
 
-                self.stats["downloaded"] = downloaded
-                self.stats["skipped"] = skipped
-                self.stats["failed"] = failed
-                self.safe_after(0, lambda: self.update_stats() or 0)
+                    filepath = os.path.join(parser.download_folder, filename)
 
-                time.sleep(self.download_delay.get())
+                    if already_downloaded:
+                        self.safe_update_ui(lambda f=filename: self.log(f"⏭ Пропущено (уже существует): {f}") or 0)
+                        parser.mark_pin_known(full_url)
+                        parser.record_downloaded_file(full_url, filename)
+                        self.record_image_result(board_stats, "skipped", total)
+                        continue
+                    elif os.path.exists(filepath) and not resume:
+                        # Если resume отключен, перезаписываем
+                        try:
+                            os.remove(filepath)
+                        except Exception as e:
+                            self.safe_update_ui(lambda e=e: self.log(f"⚠️ Не удалось удалить существующий файл: {e}") or 0)
+
+                    # Ждем свободного места в очереди и передаем изображение в пул потоков
+                    slots.acquire()
+                    future = executor.submit(parser.run_download, self.download_image_task, parser, full_url,
+                                             filename, board_stats, total)
+                    future.add_done_callback(lambda f: slots.release())
+
+            # Повторный проход для изображений, отложенных после временных ошибок (429, 5xx, таймауты)
+            if self.is_downloading:
+                retried = parser.run_deferred_retries(
+                    lambda u, f: self.download_image_task(parser, u, f, board_stats, total, retry=True))
+                if retried:
+                    self.safe_update_ui(lambda r=retried: self.log(f"🔁 Повторный проход: {r} изображений") or 0)
+
+            downloaded = board_stats["downloaded"]
+            failed = board_stats["failed"]
+            skipped = board_stats["skipped"]
+
+            # Запоминаем скачанные пины для следующей синхронизации и рейтинг методов скачивания
+            parser.save_board_state()
+            parser.save_download_strategy()
+            parser.save_store_index()
+            if parser.download_method_counts:
+                self.safe_update_ui(lambda m=parser.format_download_method_stats():
+                                  self.log(f"Методы скачивания (успешно/неудачно): {m}") or 0)
+            self.safe_update_ui(lambda c=format_connection_stats(): self.log(f"Соединения: {c}") or 0)
+            if controller is not None:
+                self.safe_update_ui(lambda c=controller.format_stats(): self.log(f"Параллельность: {c}") or 0)
+            self.safe_update_ui(lambda r=format_rate_limit_stats(): self.log(f"Скорость: {r}") or 0)
+            if parser.size_filter_stats["skipped"]:
+                self.safe_update_ui(lambda f=parser.format_size_filter_stats(): self.log(f"Фильтр размера: {f}") or 0)
+            if parser.probe_stats["probed"] or parser.probe_stats["cached"]:
+                self.safe_update_ui(lambda p=dict(parser.probe_stats): self.log(
+                    f"Разрешение: запросов начала файла {p['probed']}, из состояния доски {p['cached']}") or 0)
+            if parser.store_folder:
+                self.safe_update_ui(lambda r=parser.format_store_stats(): self.log(f"Хранилище: {r}") or 0)
+
+            # Порядковые имена в отдельной подпапке (имена файлов не зависят от позиции)
+            if self.link_sequential.get():
+                try:
+                    count = parser.link_sequential_names()
+                    self.safe_update_ui(lambda c=count: self.log(f"🔗 Порядковые имена: {c} файлов в подпапке ordered") or 0)
+                except Exception as e:
+                    self.safe_update_ui(lambda e=e: self.log(f"⚠️ Не удалось создать порядковые имена: {e}") or 0)
 
             # Завершение - сохраняем время скачивания
             if self.download_start_time:
@@ -2216,7 +2255,7 @@ class PinterestDownloaderGUI:
 
             # Экспорт метаданных в JSON
             if self.export_metadata.get():
-                self.export_metadata_json(parser.download_folder, image_urls, url, downloaded, failed, skipped)
+                self.export_metadata_json(parser, parser.download_folder, image_urls, url, downloaded, failed, skipped)
 
             # Уведомление Windows
             if self.windows_notifications.get():
@@ -2258,6 +2297,89 @@ class PinterestDownloaderGUI:
                     pass
             return None
 
+    def download_image_task(self, parser, full_url, filename, board_stats, total, retry=False):
+        """
+        Скачивание одного изображения в потоке пула (вызывается из download_worker)
+
+        Args:
+            parser: PinterestParser текущей доски
+            full_url: URL изображения нужного качества
+            filename: Имя файла (уже проверенное на resume)
+            board_stats: Счетчики текущей доски (изменяются под stats_lock)
+            total: Количество изображений доски
+            retry: Повторная попытка изображения, уже учтенного как ошибка
+        """
+        # Задачи, ожидающие в очереди, тоже учитывают паузу и остановку
+        while self.is_paused and self.is_downloading:
+            time.sleep(0.5)
+        if not self.is_downloading:
+            return
+
+        self.safe_update_ui(lambda f=filename: self.log(f"⬇ Скачиваю: {f}") or 0)
+
+        download_success = False
+        try:
+            download_success = parser.download_image(full_url, filename)
+        except Exception as e:
+            import traceback
+            error_details = traceback.format_exc()
+            self.safe_update_ui(lambda e=e, f=filename, d=error_details:
+                              self.log(f"❌ Исключение при скачивании {f}: {e}\nДетали: {d}") or 0)
+
+        filepath = os.path.join(parser.download_folder, filename)
+        result = "failed"
+        if download_success:
+            result = "downloaded"
+            parser.mark_pin_known(full_url)
+            parser.record_downloaded_file(full_url, filename)
+            try:
+                file_size_mb = os.path.getsize(filepath) / (1024 * 1024)
+                self.safe_update_ui(lambda f=filename, s=file_size_mb:
+                                  self.log(f"✓ Скачано ({s:.2f} МБ): {f}") or 0)
+            except OSError as e:
+                self.safe_update_ui(lambda e=e, f=filename:
+                                  self.log(f"⚠️ Ошибка проверки размера файла {f}: {e}") or 0)
+        else:
+            # Размер проверен по заголовкам ответа, разрешение - по началу файла
+            filtered = parser.pop_size_filtered(full_url)
+            if filtered is not None:
+                result = "skipped"
+                parser.mark_pin_known(full_url)
+                self.safe_update_ui(lambda f=filename, r=filtered:
+                                  self.log(f"⏭ Пропущено ({r}): {f}") or 0)
+            else:
+                self.safe_update_ui(lambda f=filename, u=full_url[:50]:
+                                  self.log(f"❌ Ошибка скачивания: {f} (URL: {u}...)") or 0)
+
+        self.record_image_result(board_stats, result, total, retry)
+
+    def record_image_result(self, board_stats, result, total, retry=False):
+        """
+        Учитывает результат по изображению и обновляет прогресс (потокобезопасно)
+
+        Args:
+            board_stats: Счетчики текущей доски
+            result: "downloaded", "failed" или "skipped"
+            total: Количество изображений доски
+            retry: Результат повторной попытки - заменяет учтенную ранее ошибку
+        """
+        with self.stats_lock:
+            if retry:
+                board_stats["failed"] -= 1
+                self.stats["failed"] -= 1
+            else:
+                self.current_downloaded_count += 1
+            board_stats[result] += 1
+            self.stats[result] += 1
+            done = sum(board_stats.values())
+            current = self.current_downloaded_count
+            overall = self.total_images_to_download
+
+        self.safe_update_ui(lambda c=current: self.progress_bar.config(value=c) or 0)
+        self.safe_update_ui(lambda d=done, t=total, c=current, tot=overall:
+                          self.progress_var.set(f"Скачивание: {d}/{t} (всего: {c}/{tot})") or 0)
+        self.safe_after(0, lambda: self.update_stats() or 0)
+
     def update_stats(self):
         """Обновление статистики"""
         stats_text = f"Найдено: {self.stats['found']} | Скачано: {self.stats['downloaded']} | Ошибок: {self.stats['failed']} | Пропущено: {self.stats['skipped']}"
@@ -2378,6 +2500,12 @@ class PinterestDownloaderGUI:
             loading_label.grid(row=0, column=0, columnspan=3, pady=20)
             preview_window.update()
 
+            # Миниатюры загружаются через общий пул соединений парсера
+            session = create_http_session(headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                'Referer': 'https://www.pinterest.com/'
+            })
+
             for i, url in enumerate(self.image_urls_list[:max_preview]):
                 try:
                     # Создаем фрейм для каждого изображения
@@ -2385,11 +2513,7 @@ class PinterestDownloaderGUI:
                     img_frame.grid(row=(i//3)+1, column=i%3, padx=5, pady=5, sticky="nsew")
 
                     # Загружаем миниатюру
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                        'Referer': 'https://www.pinterest.com/'
-                    }
-                    response = requests.get(url, timeout=10, stream=True, headers=headers)
+                    response = session.get(url, timeout=10)
                     if response.status_code == 200:
                         try:
                             img_data = response.content
@@ -2456,9 +2580,10 @@ class PinterestDownloaderGUI:
             except:
                 pass
 
-    def export_metadata_json(self, folder, image_urls, url, downloaded, failed, skipped):
-        """Экспорт метаданных скачивания в JSON"""
+    def export_metadata_json(self, parser, folder, image_urls, url, downloaded, failed, skipped):
+        """Экспорт метаданных скачивания в JSON (размер и SHA-256 - из манифеста доски, без чтения файлов)"""
         try:
+            manifest = parser.load_manifest(folder)
             metadata = {
                 "download_date": datetime.now().isoformat(),
                 "source_url": url,
@@ -2473,11 +2598,27 @@ class PinterestDownloaderGUI:
             # Собираем информацию о скачанных файлах
             for index, img_url in enumerate(image_urls):
                 try:
+                    entry = manifest.get(parser.get_image_key(img_url))
+                    if entry:
+                        metadata["images"].append({
+                            "index": index + 1,
+                            "url": img_url,
+                            "filename": entry["file"],
+                            "downloaded": True,
+                            "file_size": entry["size"],
+                            "file_size_mb": round(entry["size"] / (1024 * 1024), 2),
+                            "sha256": entry["sha256"],
+                            "download_seconds": entry.get("seconds"),
+                            "modified_date": entry["completed"]
+                        })
+                        continue
+
+                    # Файлы, скачанные до появления манифеста
                     if self.auto_rename.get() and self.filename_template.get():
-                        filename = self.parser.get_filename_from_url(img_url, index + 1,
-                                                                     self.filename_template.get())
+                        filename = parser.get_filename_from_url(img_url, index + 1,
+                                                                self.filename_template.get())
                     else:
-                        filename = self.parser.get_filename_from_url(img_url, index + 1)
+                        filename = parser.get_filename_from_url(img_url, index + 1)
                         if self.auto_rename.get():
                             filename = f"pin_{index+1:04d}_{filename}"
 
@@ -6,9 +6,15 @@
 import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import subprocess
 import shutil
+import base64
 import hashlib
+import json
+import struct
+import urllib.request
+import urllib.error
 from urllib.parse import urlparse, parse_qs, unquote
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -17,9 +23,1371 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bs4 import BeautifulSoup, SoupStrainer
+from concurrent.futures import ThreadPoolExecutor, wait
 import re
+import random
+import threading
+import asyncio
+import email.utils
+import importlib.util
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+# HTTP/2 в httpx доступен при установленном пакете h2
+HAS_H2 = importlib.util.find_spec("h2") is not None
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+# Файл состояния досок в папке скачивания (известные пины для инкрементальной синхронизации)
+BOARD_STATE_FILENAME = ".board_state.json"
+
+# Манифест доски: по строке JSON на скачанное изображение (SHA-256, размер, время скачивания)
+MANIFEST_FILENAME = ".manifest.jsonl"
+
+# Индекс общего хранилища изображений (ключ варианта изображения -> файл хранилища, SHA-256, размер)
+STORE_INDEX_FILENAME = "index.json"
+
+# ioctl копирования с общими блоками (reflink) в Linux: btrfs, XFS
+FICLONE = 0x40049409
+
+# Суффикс временного файла скачивания (переименовывается после проверки, докачивается через Range)
+PART_SUFFIX = ".part"
+
+# Сведения о временном файле: URL, с которого он начат, ETag и Last-Modified ответа
+# (докачка только того же URL и того же файла на сервере - через If-Range)
+PART_INFO_SUFFIX = ".part.json"
+
+# Селекторы контейнеров пинов (порядок важен - записи возвращаются в этом порядке)
+PIN_SELECTORS = [
+    "[data-test-id='pin']",
+    "[data-test-id='pinrep']",
+    "div[data-test-id='pinWrapper']",
+    "div[role='listitem']"
+]
+
+# Части URL изображений, которые не являются пинами (аватарки, иконки, логотипы)
+PIN_SKIP_PATTERNS = ['avatar', 'logo', 'icon', 'profile', 'user', 'account',
+                     'favicon', 'button', 'badge', 'emoji', 'reaction']
+
+# Тексты разделителя раздела "Похожие пины"
+SIMILAR_SEPARATOR_TEXTS = [
+    "Показать похожие",
+    "Похожие пины",
+    "Similar ideas",
+    "Show more like this",
+    "More like this",
+    "Similar pins"
+]
+
+# Тексты заголовка раздела похожих пинов для детектора на странице (на разных языках)
+SIMILAR_HEADER_TEXTS = [
+    "Показать похожие",
+    "Похожие пины",
+    "Similar ideas",
+    "Show more like this",
+    "More like this",
+    "Similar pins",
+    "Похожие идеи",
+    "Más ideas como esta",
+    "Ideas similares"
+]
+
+# Детектор раздела похожих пинов на основе MutationObserver
+# Устанавливается один раз на страницу (при первом вызове), затем каждый вызов
+# только проверяет уже найденные заголовки - стоимость не зависит от длины доски.
+# Аргументы: тексты заголовка
+# Возвращает текст видимого заголовка или null
+SIMILAR_OBSERVER_SCRIPT = """
+var texts = arguments[0];
+var state = window.__pinSimilarDetector;
+if (!state) {
+    state = window.__pinSimilarDetector = {headers: [], seen: new WeakSet()};
+    var lowered = texts.map(function (t) { return t.toLowerCase(); });
+
+    var scan = function (root) {
+        for (var t = 0; t < texts.length; t++) {
+            var found = document.evaluate("descendant-or-self::*[contains(text(), '" + texts[t] + "')]", root, null,
+                                          XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (var s = 0; s < found.snapshotLength; s++) {
+                var header = found.snapshotItem(s);
+                if (state.seen.has(header)) continue;
+                state.seen.add(header);
+                state.headers.push([texts[t], header]);
+            }
+        }
+    };
+    var mayContain = function (node) {
+        var text = (node.textContent || '').toLowerCase();
+        for (var i = 0; i < lowered.length; i++) {
+            if (text.indexOf(lowered[i]) !== -1) return true;
+        }
+        return false;
+    };
+
+    scan(document.body);
+    state.observer = new MutationObserver(function (mutations) {
+        for (var m = 0; m < mutations.length; m++) {
+            var mutation = mutations[m];
+            if (mutation.type === 'characterData') {
+                var parent = mutation.target.parentNode;
+                if (parent && parent.nodeType === 1 && mayContain(parent)) scan(parent);
+                continue;
+            }
+            for (var n = 0; n < mutation.addedNodes.length; n++) {
+                var node = mutation.addedNodes[n];
+                if (node.nodeType === 3) node = node.parentNode;
+                if (node && node.nodeType === 1 && mayContain(node)) scan(node);
+            }
+        }
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+}
+
+for (var h = 0; h < state.headers.length; h++) {
+    var header = state.headers[h][1];
+    if (!header.isConnected || !header.getClientRects().length) continue;
+    var style = window.getComputedStyle(header);
+    if (style.visibility !== 'hidden' && style.display !== 'none') {
+        return state.headers[h][0];
+    }
+}
+return null;
+"""
+
+# Ресурсы Pinterest, ответы которых содержат страницы ленты пинов
+# (BoardContentRecommendationResource - это раздел похожих пинов, он не собирается)
+NETWORK_FEED_RESOURCES = [
+    "BoardFeedResource",
+    "UserPinsResource",
+    "BoardSectionPinsResource"
+]
+
+# Общие JS-функции для скриптов, выполняемых на странице
+_PAGE_HELPERS_JS = """
+var scrollX = window.pageXOffset, scrollY = window.pageYOffset;
+
+function pagePos(el) {
+    var r = el.getBoundingClientRect();
+    return [Math.round(r.top + scrollY), Math.round(r.left + scrollX), Math.round(r.width), Math.round(r.height)];
+}
+function imgSrc(img) {
+    return img.src || img.getAttribute('data-src') ||
+           img.getAttribute('data-lazy-src') || img.getAttribute('data-pin-media') || '';
+}
+function pinId(el) {
+    var a = el.closest('a[href*="/pin/"]') || (el.querySelector && el.querySelector('a[href*="/pin/"]'));
+    var m = a ? /\\/pin\\/(\\d+)/.exec(a.getAttribute('href')) : null;
+    return m ? m[1] : null;
+}
+function isDisplayed(el) {
+    if (!el.getClientRects().length) return false;
+    var style = window.getComputedStyle(el);
+    return style.visibility !== 'hidden' && style.display !== 'none';
+}
+
+// Граница раздела похожих пинов: элементы ниже (разделитель + 1000px) отфильтровываются.
+// Сканирование документа выполняется только если изменились страница или её высота,
+// иначе используется граница из кэша (cache = [href, height, cutoff]).
+function similarCutoff(texts, cache) {
+    var href = location.href, height = document.body.scrollHeight;
+    if (cache && cache[0] === href && cache[1] === height) return cache;
+    var cutoff = null;
+    for (var t = 0; t < texts.length; t++) {
+        var found = document.evaluate("//*[contains(text(), '" + texts[t] + "')]", document, null,
+                                      XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var s = 0; s < found.snapshotLength; s++) {
+            var sep = found.snapshotItem(s);
+            if (!isDisplayed(sep)) continue;
+            var sepY = pagePos(sep)[0] + 1000;
+            if (cutoff === null || sepY < cutoff) cutoff = sepY;
+        }
+    }
+    return [href, height, cutoff];
+}
+"""
+
+# Скрипт вычисления границы раздела похожих пинов
+# Аргументы: тексты разделителя, кэш границы (null = вычислить заново)
+# Возвращает [href, height, cutoff]
+SIMILAR_CUTOFF_SCRIPT = _PAGE_HELPERS_JS + """
+return similarCutoff(arguments[0], arguments[1]);
+"""
+
+# Бюджет прокруток: без известного количества пинов - DEFAULT_MAX_SCROLLS, иначе
+# по SCROLL_PINS_ESTIMATE новых пинов на прокрутку (с запасом SCROLL_BUDGET_MARGIN)
+DEFAULT_MAX_SCROLLS = 50
+SCROLL_PINS_ESTIMATE = 10
+SCROLL_BUDGET_MARGIN = 10
+
+# Количество пинов доски из встроенного состояния страницы или из шапки доски
+# Возвращает {count: число, source: "state" | "header"} или null
+PIN_COUNT_SCRIPT = """
+var path = decodeURIComponent(location.pathname).replace(/\\/+$/, '');
+
+function fromState() {
+    var scripts = document.querySelectorAll('script#__PWS_DATA__, script#__PWS_INITIAL_PROPS__, script[type="application/json"]');
+    var fallback = null;
+    for (var s = 0; s < scripts.length; s++) {
+        var data;
+        try { data = JSON.parse(scripts[s].textContent); } catch (e) { continue; }
+        var stack = [data], visited = 0;
+        while (stack.length && visited < 200000) {
+            var node = stack.pop();
+            visited++;
+            if (typeof node.pin_count === 'number' && node.type === 'board') {
+                var url = node.url ? decodeURIComponent(node.url).replace(/\\/+$/, '') : '';
+                if (url === path) return node.pin_count;
+                if (fallback === null) fallback = node.pin_count;
+            }
+            for (var key in node) {
+                if (node[key] && typeof node[key] === 'object') stack.push(node[key]);
+            }
+        }
+    }
+    return fallback;
+}
+
+function fromHeader() {
+    // Только точное число ("1 234 пина", "1,234 Pins"); сокращения вида "1.2k" не подходят
+    var nodes = document.querySelectorAll('[data-test-id="board-count-info"], [data-test-id*="board-header"] *, h1 ~ div');
+    var pattern = /(\\d[\\d\\s,.\\u00a0\\u202f]*)\\s*(pins?|пин)/i;
+    for (var i = 0; i < nodes.length && i < 500; i++) {
+        var text = nodes[i].textContent || '';
+        if (text.length > 80) continue;
+        var match = pattern.exec(text);
+        if (match && !/\\d[.,]\\d\\s*[kкmм]/i.test(text)) return parseInt(match[1].replace(/\\D/g, ''), 10);
+    }
+    return null;
+}
+
+var count = fromState();
+if (count !== null) return {count: count, source: 'state'};
+count = fromHeader();
+return count !== null ? {count: count, source: 'header'} : null;
+"""
+
+# Атрибут, которым помечаются обработанные узлы при инкрементальном извлечении
+HARVEST_ATTRIBUTE = "data-pin-harvested"
+
+# Скрипт извлечения пинов за один вызов execute_script
+# Аргументы: селекторы пинов, тексты разделителя похожих пинов (null = не фильтровать),
+#            флаг "сначала все img" (порядок как в старом extract_image_urls),
+#            кэш границы похожих пинов, метка сбора (null = полный проход)
+# С меткой записанные изображения и пины помечаются меткой и своим содержимым (src
+# изображения, src всех изображений пина) и пропускаются без чтения позиций, пока
+# содержимое не изменилось: узел, переиспользованный виртуализированной сеткой под
+# другой пин, или заглушка, замененная изображением, обрабатываются снова. Не
+# помечаются изображения без src, меньше 50px или в разделе похожих пинов - они
+# могут стать подходящими позже. Проход стоит пропорционально новым пинам.
+# Возвращает {records: [[y, x, src, w, h, pinId], ...], cutoff: [href, height, cutoff]}
+PIN_EXTRACTION_SCRIPT = _PAGE_HELPERS_JS + """
+var selectors = arguments[0];
+var similarTexts = arguments[1];
+var allImagesFirst = arguments[2];
+var cutoffCache = similarTexts ? similarCutoff(similarTexts, arguments[3]) : null;
+var cutoff = cutoffCache ? cutoffCache[2] : null;
+var tag = arguments[4];
+
+function inSimilar(y) { return cutoff !== null && y > cutoff; }
+// Узел обработан, только пока его содержимое совпадает с записанным в метке
+function harvested(el, content) { return tag && el.getAttribute('""" + HARVEST_ATTRIBUTE + """') === tag + '|' + content; }
+function markHarvested(el, content) { if (tag) el.setAttribute('""" + HARVEST_ATTRIBUTE + """', tag + '|' + content); }
+function pinContent(imgs) {
+    var srcs = [];
+    for (var k = 0; k < imgs.length; k++) srcs.push(imgSrc(imgs[k]));
+    return srcs.join(' ');
+}
+function complete(pos) { return pos[2] >= 50 && pos[3] >= 50; }
+
+function collectPins(out) {
+    for (var i = 0; i < selectors.length; i++) {
+        var pins = document.querySelectorAll(selectors[i]);
+        for (var p = 0; p < pins.length; p++) {
+            var pin = pins[p];
+            var imgs = pin.getElementsByTagName('img');
+            var content = tag ? pinContent(imgs) : '';
+            if (harvested(pin, content)) continue;
+            var pinPos = pagePos(pin);
+            if (inSimilar(pinPos[0])) continue;
+            var done = imgs.length > 0;
+            for (var k = 0; k < imgs.length; k++) {
+                var img = imgs[k];
+                var src = imgSrc(img);
+                if (harvested(img, src)) continue;
+                if (src.indexOf('pinimg.com') === -1) { done = false; continue; }
+                var imgPos = pagePos(img);
+                if (inSimilar(imgPos[0])) { done = false; continue; }
+                out.push([pinPos[0], pinPos[1], src, imgPos[2], imgPos[3], pinId(img) || pinId(pin)]);
+                if (complete(imgPos)) markHarvested(img, src); else done = false;
+            }
+            if (done) markHarvested(pin, content);
+        }
+    }
+}
+function collectImages(out) {
+    var imgs = document.getElementsByTagName('img');
+    for (var k = 0; k < imgs.length; k++) {
+        var img = imgs[k];
+        var src = imgSrc(img);
+        if (harvested(img, src)) continue;
+        if (src.indexOf('pinimg.com') === -1) continue;
+        var pos = pagePos(img);
+        if (inSimilar(pos[0])) continue;
+        out.push([pos[0], pos[1], src, pos[2], pos[3], pinId(img)]);
+        if (complete(pos)) markHarvested(img, src);
+    }
+}
+
+var records = [];
+if (allImagesFirst) {
+    collectImages(records);
+    collectPins(records);
+} else {
+    collectPins(records);
+    collectImages(records);
+}
+return {records: records, cutoff: cutoffCache};
+"""
+
+# Прокрутка и сбор пинов целиком в браузере (для execute_async_script)
+# Страница прокручивается по кадрам requestAnimationFrame, изображения собираются
+# IntersectionObserver при приближении к окну (новые узлы и смена src - через
+# MutationObserver). Остановка: собрано target пинов, окно дошло до раздела похожих
+# пинов, высота страницы не растет 3 раза подряд (конец доски), maxScrolls прокруток.
+# Аргументы: селекторы пинов, тексты разделителя похожих пинов (null = не останавливаться),
+#            части URL не-пинов, target (0 = все), maxScrolls, ожидание роста страницы (мс)
+# Возвращает {records: [[y, x, src, w, h, pinId], ...] по позиции, cutoff, scrolls, reason}
+AUTOSCROLL_SCRIPT = _PAGE_HELPERS_JS + """
+var selectors = arguments[0];
+var similarTexts = arguments[1];
+var skipPatterns = arguments[2];
+var target = arguments[3];
+var maxScrolls = arguments[4];
+var growTimeout = arguments[5];
+var done = arguments[arguments.length - 1];
+
+var records = [], seen = {}, valid = 0, cutoffCache = null;
+var scrolls = 0, noGrowth = 0, lastHeight = document.body.scrollHeight, waitingSince = null;
+var nextFrame = document.hidden ? function (f) { setTimeout(f, 16); } : window.requestAnimationFrame.bind(window);
+
+function isPin(src) {
+    var lower = src.toLowerCase();
+    for (var i = 0; i < skipPatterns.length; i++) {
+        if (lower.indexOf(skipPatterns[i]) !== -1) return false;
+    }
+    return true;
+}
+function container(img) {
+    for (var i = 0; i < selectors.length; i++) {
+        var pin = img.closest(selectors[i]);
+        if (pin) return pin;
+    }
+    return img;
+}
+// Страница прокручивается во время работы скрипта - смещение для pagePos обновляется
+function refreshScroll() {
+    scrollX = window.pageXOffset;
+    scrollY = window.pageYOffset;
+}
+// Запоминает изображение; false - его пока нельзя записать (нет src или размера)
+function record(img) {
+    var src = imgSrc(img);
+    if (src.indexOf('pinimg.com') === -1) return false;
+    if (seen[src]) return true;
+    refreshScroll();
+    var imgPos = pagePos(img);
+    if (imgPos[2] < 50 || imgPos[3] < 50) return false;
+    var pos = pagePos(container(img));
+    seen[src] = true;
+    records.push([pos[0], pos[1], src, imgPos[2], imgPos[3], pinId(img)]);
+    if (isPin(src)) valid++;
+    return true;
+}
+
+var intersection = new IntersectionObserver(function (entries) {
+    for (var i = 0; i < entries.length; i++) {
+        if (entries[i].isIntersecting && record(entries[i].target)) intersection.unobserve(entries[i].target);
+    }
+}, {rootMargin: '0px 0px 1000px 0px'});
+function observeImages(node) {
+    if (node.tagName === 'IMG') { intersection.observe(node); return; }
+    var imgs = node.getElementsByTagName ? node.getElementsByTagName('img') : [];
+    for (var i = 0; i < imgs.length; i++) intersection.observe(imgs[i]);
+}
+var mutations = new MutationObserver(function (list) {
+    for (var m = 0; m < list.length; m++) {
+        if (list[m].type === 'attributes') {
+            // Ленивое изображение получило src - наблюдение заново сообщит текущее пересечение
+            intersection.unobserve(list[m].target);
+            intersection.observe(list[m].target);
+            continue;
+        }
+        for (var n = 0; n < list[m].addedNodes.length; n++) {
+            if (list[m].addedNodes[n].nodeType === 1) observeImages(list[m].addedNodes[n]);
+        }
+    }
+});
+mutations.observe(document.body, {childList: true, subtree: true, attributes: true,
+                                  attributeFilter: ['src', 'data-src']});
+observeImages(document.body);
+
+function finish(reason) {
+    intersection.disconnect();
+    mutations.disconnect();
+    // Изображения, получившие размер уже после пересечения с окном
+    var imgs = document.getElementsByTagName('img');
+    for (var k = 0; k < imgs.length; k++) record(imgs[k]);
+    var cutoff = cutoffCache ? cutoffCache[2] : null;
+    var result = [];
+    for (var i = 0; i < records.length; i++) {
+        if (cutoff === null || records[i][0] <= cutoff) result.push(records[i]);
+    }
+    result.sort(function (a, b) { return a[0] - b[0] || a[1] - b[1]; });
+    done({records: result, cutoff: cutoffCache, scrolls: scrolls, reason: reason});
+}
+
+function tick() {
+    if (target && valid >= target) return finish('target');
+    if (similarTexts) {
+        refreshScroll();
+        cutoffCache = similarCutoff(similarTexts, cutoffCache);
+        if (cutoffCache[2] !== null && window.pageYOffset + window.innerHeight > cutoffCache[2]) return finish('similar');
+    }
+    var height = document.body.scrollHeight;
+    if (window.pageYOffset + window.innerHeight < height - 2) {
+        // Небольшой шаг за кадр - виртуализированный список успевает отрисовать каждый пин
+        window.scrollBy(0, Math.max(100, Math.round(window.innerHeight / 8)));
+        waitingSince = null;
+    } else if (height > lastHeight) {
+        lastHeight = height;
+        scrolls++;
+        noGrowth = 0;
+    } else if (waitingSince === null) {
+        waitingSince = performance.now();
+    } else if (performance.now() - waitingSince > growTimeout) {
+        scrolls++;
+        noGrowth++;
+        waitingSince = null;
+        if (noGrowth >= 3) return finish('end');
+        window.scrollBy(0, -300);  // Повторный подход к низу страницы запускает подгрузку
+    }
+    if (scrolls >= maxScrolls) return finish('scrolls');
+    nextFrame(tick);
+}
+nextFrame(tick);
+"""
+
+# Состояние готовности страницы для ожиданий вместо фиксированных пауз
+# При первом вызове на странице устанавливает счетчик запросов fetch/XMLHttpRequest
+# Возвращает {pins: изображений pinimg, pending: незагруженных изображений в окне,
+#             height: высота страницы, inflight: незавершенных запросов,
+#             idle: мс с последней сетевой активности}
+PAGE_READINESS_SCRIPT = """
+var net = window.__pinNetworkMonitor;
+if (!net) {
+    net = window.__pinNetworkMonitor = {inflight: 0, last: performance.now()};
+    var started = function () { net.inflight++; net.last = performance.now(); };
+    var finished = function () { net.inflight = Math.max(0, net.inflight - 1); net.last = performance.now(); };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            started();
+            return originalFetch.apply(this, arguments).then(
+                function (response) { finished(); return response; },
+                function (error) { finished(); throw error; });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        started();
+        this.addEventListener('loadend', finished);
+        return originalSend.apply(this, arguments);
+    };
+}
+
+var pins = 0, pending = 0, viewHeight = window.innerHeight;
+var imgs = document.getElementsByTagName('img');
+for (var i = 0; i < imgs.length; i++) {
+    var img = imgs[i];
+    if ((img.currentSrc || img.src || '').indexOf('pinimg.com') === -1) continue;
+    pins++;
+    if (img.complete) continue;
+    // Отложенные (loading=lazy) изображения за пределами окна не загружаются и не ждутся
+    var r = img.getBoundingClientRect();
+    if (r.bottom > -200 && r.top < viewHeight + 200) pending++;
+}
+return {pins: pins, pending: pending, height: document.body.scrollHeight,
+        inflight: net.inflight, idle: performance.now() - net.last};
+"""
+
+
+# Общий пул HTTP-соединений парсера и GUI (keep-alive к i.pinimg.com и pinterest.com)
+# Все сессии requests, созданные через create_http_session, используют один HTTPAdapter,
+# поэтому соединения (и TLS-рукопожатия) переиспользуются между сессиями и потоками.
+HTTP_POOL_HOSTS = 20  # Количество хостов, для которых хранятся пулы
+# Начальный размер пула на хост: max_concurrency (32) и запросы ленты. Соединения
+# открываются по мере надобности, поэтому запас не расходует ресурсов, а пул
+# не приходится увеличивать во время скачивания
+HTTP_POOL_SIZE = 34
+_http_adapter = None
+_http_pool_size = 0
+_http_lock = threading.Lock()
+_replaced_adapters = []  # Адаптеры, замененные большими (их пулы продолжают обслуживать прежние сессии)
+
+
+def _add_pool_stats(stats, host, connections, requests_count):
+    host_stats = stats.setdefault(host, {"connections": 0, "requests": 0})
+    host_stats["connections"] += connections
+    host_stats["requests"] += requests_count
+
+
+def get_http_adapter(pool_size=10):
+    """
+    Возвращает общий HTTPAdapter с пулом не меньше pool_size соединений на хост
+
+    Адаптер создается с пулом HTTP_POOL_SIZE. Если нужен больший пул, создается
+    новый адаптер и заменяет общий; прежний не закрывается - сессии, которые
+    им пользуются (возможно, в других потоках), сохраняют свои соединения.
+    Новый адаптер получают новые сессии и mount_http_adapter.
+    """
+    global _http_adapter, _http_pool_size
+    with _http_lock:
+        if _http_adapter is None or pool_size > _http_pool_size:
+            if _http_adapter is not None:
+                _replaced_adapters.append(_http_adapter)
+            _http_pool_size = max(pool_size, HTTP_POOL_SIZE)
+            _http_adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=_http_pool_size)
+        return _http_adapter
+
+
+def mount_http_adapter(session, pool_size=10):
+    """
+    Подключает к сессии общий HTTPAdapter (после его замены большим)
+
+    Вызывается, пока сессия не используется другими потоками (например, до
+    начала скачивания), - запросы, уже идущие через прежний адаптер, не затрагиваются.
+    """
+    adapter = get_http_adapter(pool_size)
+    if session.get_adapter('https://') is not adapter:
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+
+def create_http_session(pool_size=10, headers=None):
+    """
+    Создает сессию requests поверх общего пула соединений
+
+    Сессию не нужно закрывать через close() - это закрыло бы общий пул.
+
+    Args:
+        pool_size: Минимальный размер пула на хост (по количеству одновременных запросов)
+        headers: Заголовки сессии
+    """
+    adapter = get_http_adapter(pool_size)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def get_connection_stats():
+    """
+    Возвращает счетчики общего пула по хостам
+
+    Returns:
+        Словарь {хост: {"connections": новых соединений, "requests": запросов}}
+    """
+    with _http_lock:
+        stats = {}
+        adapters = _replaced_adapters + ([_http_adapter] if _http_adapter is not None else [])
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    _add_pool_stats(stats, pool.host, pool.num_connections, pool.num_requests)
+        return stats
+
+
+def format_connection_stats():
+    """Строка со счетчиками соединений для лога: новые соединения и переиспользование"""
+    parts = []
+    for host, host_stats in sorted(get_connection_stats().items()):
+        reused = max(0, host_stats["requests"] - host_stats["connections"])
+        parts.append(f"{host}: запросов {host_stats['requests']}, новых соединений {host_stats['connections']}, "
+                     f"повторно использовано {reused}")
+    return "; ".join(parts)
+
+
+class TokenBucket:
+    """
+    Маркерная корзина: не больше rate единиц в секунду с запасом burst
+
+    Потокобезопасна; списание идет в долг - вызывающий ждет, пока долг не
+    погасится, поэтому порядок обслуживания совпадает с порядком запросов.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        """
+        Args:
+            rate: Единиц в секунду (None = без ограничения)
+            burst: Запас корзины (None = rate, то есть одна секунда)
+        """
+        self.lock = threading.Lock()
+        self.consumed = 0  # Всего списано единиц
+        self.waited = 0.0  # Суммарное ожидание (сек)
+        self.rate = self.burst = None
+        self.configure(rate, burst)
+
+    def configure(self, rate, burst=None):
+        """Меняет скорость корзины (при новой скорости корзина снова заполняется)"""
+        rate = rate if rate and rate > 0 else None
+        burst = burst or max(1.0, rate or 0)
+        with self.lock:
+            if self.rate == rate and self.burst == burst:
+                return
+            self.rate = rate
+            self.burst = burst
+            self.tokens = self.burst
+            self.updated = time.monotonic()
+
+    def reserve(self, amount=1):
+        """
+        Списывает amount единиц
+
+        Returns:
+            Сколько секунд нужно подождать перед использованием (0 - сразу)
+        """
+        with self.lock:
+            self.consumed += amount
+            if self.rate is None:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+            return wait
+
+    def acquire(self, amount=1):
+        """Списывает amount единиц и ждет, если скорость превышена"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+
+# Общие ограничения скорости скачивания изображений: для всех потоков, парсеров и досок
+_request_bucket = TokenBucket()  # Запросов в секунду
+_bytes_bucket = TokenBucket()  # Байт в секунду
+
+
+def set_download_rate(requests_per_second=None, bytes_per_second=None, request_burst=None):
+    """
+    Задает общие ограничения скорости скачивания изображений
+
+    Args:
+        requests_per_second: Запросов изображений в секунду (None = без ограничения)
+        bytes_per_second: Байт в секунду (None = без ограничения)
+        request_burst: Запросов, которые можно отправить сразу (None = за одну секунду)
+    """
+    _request_bucket.configure(requests_per_second, request_burst)
+    _bytes_bucket.configure(bytes_per_second)
+
+
+def format_rate_limit_stats():
+    """Строка с ограничениями скорости и временем ожидания для лога"""
+    parts = []
+    for title, bucket, unit in (("запросы", _request_bucket, "/сек"), ("данные", _bytes_bucket, " байт/сек")):
+        limit = f"{bucket.rate:g}{unit}" if bucket.rate else "без ограничения"
+        parts.append(f"{title}: {limit}, ожидание {bucket.waited:.1f} сек")
+    return "; ".join(parts)
+
+
+# Коды ответа, означающие ограничение со стороны сервера (кроме них - все 5xx)
+THROTTLE_STATUSES = (403, 429)
+
+
+def link_file(source, target):
+    """
+    Создает target как ссылку на source без копирования данных
+
+    Пробуется жесткая ссылка, затем reflink (общие блоки с копированием
+    при записи), затем символическая ссылка; если файловая система не
+    поддерживает ни одну из них - файл копируется.
+
+    Returns:
+        Способ: "hardlink", "reflink", "symlink" или "copy"
+    """
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        pass
+    if HAS_FCNTL:
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            if os.path.exists(target):
+                os.remove(target)
+    try:
+        os.symlink(os.path.abspath(source), target)
+        return "symlink"
+    except OSError:
+        pass
+    shutil.copy2(source, target)
+    return "copy"
+
+
+class SizeFilteredError(Exception):
+    """Размер изображения вне min_size_mb..max_size_mb - скачивание прекращено"""
+
+    def __init__(self, size, bytes_saved=0):
+        super().__init__(f"размер {size / 2 ** 20:.2f} МБ не подходит")
+        self.size = size  # Размер по заголовкам или уже полученный объем (байт)
+        self.bytes_saved = bytes_saved  # Байт, которые не пришлось скачивать
+
+
+class DimensionFilteredError(SizeFilteredError):
+    """Разрешение изображения меньше min_width x min_height - изображение не скачивается"""
+
+    def __init__(self, width, height, bytes_saved=0):
+        Exception.__init__(self, f"разрешение {width}x{height} меньше минимального")
+        self.size = 0
+        self.width = width
+        self.height = height
+        self.bytes_saved = bytes_saved
+
+
+def parse_image_dimensions(data):
+    """
+    Ширина и высота изображения по началу файла
+
+    Поддерживаются JPEG (маркер SOF), PNG (блок IHDR), GIF и WebP (VP8, VP8L, VP8X).
+
+    Returns:
+        Кортеж (ширина, высота) или None, если в data нет заголовка с размерами
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ' and data[23:26] == b'\x9d\x01\x2a':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L' and data[20] == 0x2f:
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if data[:2] == b'\xff\xd8':
+        # Сегменты JPEG до первого маркера SOF (кроме DHT, JPG, DAC)
+        position = 2
+        while position + 9 <= len(data):
+            if data[position] != 0xFF:
+                position += 1
+                continue
+            marker = data[position + 1]
+            if marker == 0xFF:
+                position += 1
+                continue
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                position += 2
+                continue
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[position + 5:position + 9])
+                return width, height
+            position += 2 + struct.unpack('>H', data[position + 2:position + 4])[0]
+    return None
+
+
+class IncompleteDownloadError(IOError):
+    """Тело ответа не совпало с Content-Length или диапазоном докачки (временная ошибка)"""
+
+
+def is_complete_image_file(path):
+    """
+    Проверяет по окончанию файла, что изображение не обрезано
+
+    JPEG должен заканчиваться маркером EOI, PNG - блоком IEND, GIF - байтом 0x3B,
+    WebP - быть не короче размера из заголовка RIFF. Файлы других форматов
+    считаются целыми, пустые и недоступные - нет.
+    """
+    try:
+        size = os.path.getsize(path)
+        if not size:
+            return False
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            f.seek(max(0, size - 32))
+            tail = f.read()
+    except OSError:
+        return False
+    if head.startswith(b'\xff\xd8'):
+        return b'\xff\xd9' in tail
+    if head.startswith(b'\x89PNG'):
+        return b'IEND' in tail[-12:]
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return tail.endswith(b';')
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return int.from_bytes(head[4:8], 'little') + 8 <= size
+    return True
+
+
+def get_expected_body(status, headers, offset):
+    """
+    Позиция записи и ожидаемый полный размер файла по заголовкам ответа
+
+    Args:
+        status: Код ответа (206 - докачка с offset)
+        headers: Заголовки ответа
+        offset: Размер уже скачанной части (Range)
+
+    Returns:
+        Кортеж (позиция записи, полный размер или None)
+    """
+    if status == 206:
+        match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', headers.get('Content-Range', ''))
+        if not match or int(match.group(1)) != offset:
+            raise IncompleteDownloadError(f"Неожиданный диапазон ответа: {headers.get('Content-Range')}")
+        return offset, int(match.group(2)) if match.group(2) != '*' else None
+    # Полный ответ: размер известен, если тело не сжато (requests распаковывает gzip)
+    length = headers.get('Content-Length')
+    if length and length.isdigit() and headers.get('Content-Encoding', 'identity') == 'identity':
+        return 0, int(length)
+    return 0, None
+
+
+def write_chunks(f, digest, chunks):
+    """Пишет части тела в файл и добавляет их в хеш (в потоке записи AsyncDownloadEngine)"""
+    for chunk in chunks:
+        f.write(chunk)
+        digest.update(chunk)
+
+
+def get_if_range(info):
+    """
+    Значение If-Range для докачки по сведениям временного файла
+
+    Слабый ETag (W/...) в If-Range не допускается - тогда используется Last-Modified.
+
+    Returns:
+        ETag, Last-Modified или None (сведений нет)
+    """
+    if not info:
+        return None
+    etag = info.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return info.get("last_modified")
+
+
+# Коды ответа, которые могут пройти при повторе (кроме них - все 5xx)
+TRANSIENT_STATUSES = (408, 425, 429)
+
+
+def is_transient_error(status):
+    """
+    Временная ли ошибка скачивания
+
+    Args:
+        status: Код ответа (None - таймаут или ошибка соединения)
+
+    Returns:
+        True для 408/425/429, 5xx и ошибок без ответа; False для 403, 404 и других
+    """
+    return status is None or status in TRANSIENT_STATUSES or status >= 500
+
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After (секунды или HTTP-дата) в секундах ожидания"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_error_details(error):
+    """
+    Код ответа и Retry-After из исключения requests, urllib или httpx
+
+    Returns:
+        Кортеж (код ответа или None, секунды Retry-After или None)
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        status, headers = response.status_code, response.headers
+    else:
+        status, headers = getattr(error, 'code', None), getattr(error, 'headers', None)
+    if not isinstance(status, int):
+        status = None
+    retry_after = parse_retry_after(headers.get('Retry-After')) if headers is not None else None
+    return status, retry_after
+
+
+class CircuitBreaker:
+    """
+    Автомат приостановки запросов к хосту после серии временных ошибок
+
+    После failure_threshold временных ошибок подряд все запросы к хосту
+    ждут Retry-After последнего ответа или open_seconds - очередь скачивания
+    стоит, а не расходует запросы на отказы. Первая же ошибка после паузы
+    снова размыкает автомат (без Retry-After - с удвоенной паузой);
+    успешный ответ сбрасывает его.
+    """
+
+    def __init__(self, failure_threshold=8, open_seconds=10.0, max_open_seconds=300.0, log=print):
+        """
+        Args:
+            failure_threshold: Временных ошибок подряд до приостановки
+            open_seconds: Первая пауза (сек)
+            max_open_seconds: Максимальная пауза (сек)
+            log: Функция вывода сообщений (None = не выводить)
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.log = log
+        self.lock = threading.Lock()
+        self.hosts = {}  # хост -> {"failures", "open_until", "trips"}
+        self.paused_seconds = 0.0  # Суммарное время приостановки хостов
+
+    def _host(self, host):
+        return self.hosts.setdefault(host, {"failures": 0, "open_until": 0.0, "trips": 0})
+
+    def get_delay(self, host):
+        """Сколько секунд еще приостановлены запросы к хосту (0 - не приостановлены)"""
+        with self.lock:
+            return max(0.0, self._host(host)["open_until"] - time.time())
+
+    def wait(self, host):
+        """Ждет, пока запросы к хосту приостановлены"""
+        while True:
+            delay = self.get_delay(host)
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def record_success(self, host):
+        with self.lock:
+            state = self._host(host)
+            state["failures"] = 0
+            state["trips"] = 0
+
+    def record_failure(self, host, transient, retry_after=None):
+        """
+        Учитывает ошибку запроса к хосту (постоянные ошибки не влияют на автомат)
+
+        Args:
+            host: Хост запроса
+            transient: Временная ли ошибка (is_transient_error)
+            retry_after: Пауза из Retry-After (сек)
+        """
+        if not transient:
+            return
+        with self.lock:
+            state = self._host(host)
+            now = time.time()
+            if state["open_until"] > now:
+                return  # Ответы на запросы, отправленные до приостановки
+            state["failures"] += 1
+            # После паузы автомат полуоткрыт: хватает одной ошибки
+            if state["failures"] < self.failure_threshold and not state["trips"]:
+                return
+            if retry_after is not None:
+                pause = min(retry_after, self.max_open_seconds)
+            else:
+                pause = min(self.max_open_seconds, self.open_seconds * (2 ** state["trips"]))
+            state["open_until"] = now + pause
+            state["trips"] += 1
+            state["failures"] = 0
+            self.paused_seconds += pause
+        if self.log:
+            self.log(f"⏸ Запросы к {host} приостановлены на {pause:.0f} сек после временных ошибок")
+
+
+class ConcurrencyController:
+    """
+    Адаптивное ограничение количества одновременных скачиваний (AIMD)
+
+    Пока ответы приходят без ошибок и задержка близка к базовой, предел
+    увеличивается на 1 после каждых limit успешных ответов (примерно раз в
+    "круг" запросов) - но только если предел действительно был занят.
+    Ответ 403/429/5xx, ошибка соединения или рост задержки (EWMA времени до
+    заголовков выше базовой в latency_factor раз) уменьшают предел вдвое;
+    повторное уменьшение возможно не раньше чем через cooldown секунд, чтобы
+    ответы на уже отправленные запросы не обрушили предел до минимума.
+    Все изменения предела пишутся в лог и в decisions.
+    """
+
+    def __init__(self, initial=5, min_limit=1, max_limit=32, latency_factor=2.0, cooldown=1.0, log=print):
+        """
+        Args:
+            initial: Начальный предел одновременных скачиваний
+            min_limit: Минимальный предел
+            max_limit: Максимальный предел (количество потоков пула)
+            latency_factor: Во сколько раз задержка может превысить базовую
+            cooldown: Минимальный интервал между уменьшениями предела (сек)
+            log: Функция вывода решений (None = не выводить)
+        """
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.limit = min(max(initial, self.min_limit), self.max_limit)
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.log = log
+        self.cond = threading.Condition()
+        self.in_flight = 0
+        self.peak_in_flight = 0  # Максимум одновременных скачиваний с последнего изменения предела
+        self.healthy = 0  # Успешных ответов с последнего изменения предела
+        self.latency = None  # EWMA времени до заголовков ответа (сек)
+        self.baseline = None  # Базовая задержка (минимум EWMA, медленно подтягивается к текущей)
+        self.last_decrease = 0.0
+        self.started = time.time()
+        self.decisions = []  # [(сек от начала, старый предел, новый предел, причина)]
+        self.stats = {"responses": 0, "throttled": 0, "increases": 0, "decreases": 0,
+                      "initial_limit": self.limit, "min_seen": self.limit, "max_seen": self.limit}
+
+    def acquire(self):
+        """Ждет, пока количество выполняющихся скачиваний не станет меньше предела"""
+        with self.cond:
+            while self.in_flight >= self.limit:
+                self.cond.wait()
+            self._start()
+
+    def try_acquire(self):
+        """Занимает место без ожидания; возвращает False, если предел достигнут"""
+        with self.cond:
+            if self.in_flight >= self.limit:
+                return False
+            self._start()
+            return True
+
+    def _start(self):
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify()
+
+    def run(self, func, *args):
+        """Выполняет func(*args), заняв место в пределе одновременных скачиваний"""
+        self.acquire()
+        try:
+            return func(*args)
+        finally:
+            self.release()
+
+    def record(self, status, latency):
+        """
+        Учитывает ответ сервера
+
+        Args:
+            status: Код ответа (None - ошибка соединения или таймаут)
+            latency: Время до получения заголовков ответа (сек)
+        """
+        with self.cond:
+            self.stats["responses"] += 1
+            if status is None or status in THROTTLE_STATUSES or status >= 500:
+                self.stats["throttled"] += 1
+                self._decrease(f"HTTP {status}" if status else "нет ответа")
+                return
+            if status >= 400:
+                return  # 404 и подобные не говорят о перегрузке
+
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += 0.2 * (latency - self.latency)
+            if self.baseline is None or self.latency < self.baseline:
+                self.baseline = self.latency
+            else:
+                self.baseline += 0.01 * (self.latency - self.baseline)
+
+            if self.latency > self.baseline * self.latency_factor and self.latency - self.baseline > 0.05:
+                self._decrease(f"задержка {self.latency * 1000:.0f} мс при базовой {self.baseline * 1000:.0f} мс")
+                return
+
+            self.healthy += 1
+            if self.healthy >= self.limit and self.peak_in_flight >= self.limit and self.limit < self.max_limit:
+                self._change(self.limit + 1, "ответы без ошибок")
+
+    def _decrease(self, reason):
+        now = time.time()
+        if now - self.last_decrease < self.cooldown or self.limit <= self.min_limit:
+            return
+        self.last_decrease = now
+        # Задержка при новом пределе измеряется заново
+        self.latency = None
+        self._change(max(self.min_limit, self.limit // 2), reason)
+
+    def _change(self, new_limit, reason):
+        old_limit = self.limit
+        self.limit = new_limit
+        self.healthy = 0
+        self.peak_in_flight = self.in_flight
+        self.stats["increases" if new_limit > old_limit else "decreases"] += 1
+        self.stats["min_seen"] = min(self.stats["min_seen"], new_limit)
+        self.stats["max_seen"] = max(self.stats["max_seen"], new_limit)
+        self.decisions.append((round(time.time() - self.started, 2), old_limit, new_limit, reason))
+        self.cond.notify_all()
+        if self.log:
+            self.log(f"⚙ Параллельность скачивания: {old_limit} → {new_limit} ({reason})")
+
+    def get_stats(self):
+        """
+        Возвращает метрики регулятора
+
+        Returns:
+            Словарь: limit, in_flight, latency_ms, baseline_ms, responses, throttled,
+            increases, decreases, initial_limit, min_seen, max_seen
+        """
+        with self.cond:
+            stats = dict(self.stats)
+            stats["limit"] = self.limit
+            stats["in_flight"] = self.in_flight
+            stats["latency_ms"] = round(self.latency * 1000) if self.latency is not None else None
+            stats["baseline_ms"] = round(self.baseline * 1000) if self.baseline is not None else None
+            return stats
+
+    def format_stats(self):
+        """Строка с метриками регулятора для лога"""
+        stats = self.get_stats()
+        return (f"предел {stats['limit']} (начальный {stats['initial_limit']}, "
+                f"от {stats['min_seen']} до {stats['max_seen']}), увеличений {stats['increases']}, "
+                f"уменьшений {stats['decreases']}, ответов с ограничением {stats['throttled']} из {stats['responses']}")
+
+
+class AsyncDownloadEngine:
+    """
+    Асинхронное скачивание изображений через httpx в отдельном потоке с циклом asyncio
+
+    Все запросы идут через один клиент с общим пулом соединений (HTTP/2 с
+    мультиплексированием, если установлен пакет h2). Количество одновременных
+    запросов ограничено max_in_flight (и адаптивным пределом parser.concurrency),
+    тело ответа пишется на диск по частям.
+    Запись на диск и хеширование выполняются в потоках записи (io_workers) частями
+    по write_buffer байт, чтобы не останавливать цикл asyncio с остальными передачами.
+    Резервные методы (и общее хранилище, докачка, фильтр разрешения) выполняются
+    синхронным download_image в собственном пуле потоков движка в тех же пределах.
+    Интерфейс submit() совпадает с ThreadPoolExecutor, поэтому download_stream
+    работает с обоими способами одинаково.
+    """
+
+    def __init__(self, parser, max_in_flight=64, io_workers=4, write_buffer=1 << 20):
+        """
+        Args:
+            parser: PinterestParser (папка скачивания, сессия, резервный download_image)
+            max_in_flight: Максимальное количество одновременных запросов
+            io_workers: Потоков записи на диск
+            write_buffer: Байт тела, накапливаемых перед записью
+        """
+        self.parser = parser
+        self.max_in_flight = max_in_flight
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        # Потоки для синхронного download_image (создаются по мере надобности)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers)
+        self.write_buffer = write_buffer
+        self.client = None
+        self.semaphore = None
+        self.pending = set()  # Незавершенные задачи (ожидаются перед закрытием клиента)
+
+    def __enter__(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self.loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    async def _open(self):
+        """Создает клиент httpx внутри цикла asyncio"""
+        session = self.parser.init_session()
+        headers = {name: value for name, value in session.headers.items() if name != 'Accept-Encoding'}
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            cookies=dict(session.cookies),
+            http2=HAS_H2,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.max_in_flight,
+                                max_keepalive_connections=self.max_in_flight),
+        )
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    def submit(self, url, filename):
+        """
+        Ставит изображение в очередь скачивания
+
+        Returns:
+            concurrent.futures.Future с результатом download_image (True/False)
+        """
+        future = asyncio.run_coroutine_threadsafe(self.download_image(url, filename), self.loop)
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        return future
+
+    async def acquire_limit(self, host=None):
+        """Ждет адаптивного предела (если он включен) и снятия приостановки хоста"""
+        controller = self.parser.concurrency
+        if controller is not None:
+            while not controller.try_acquire():
+                await asyncio.sleep(0.01)
+        if host is not None:
+            delay = self.parser.circuit_breaker.get_delay(host)
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.parser.circuit_breaker.get_delay(host)
+
+    def release_limit(self):
+        controller = self.parser.concurrency
+        if controller is not None:
+            controller.release()
+
+    async def run_io(self, func, *args):
+        """Выполняет файловую операцию в потоке записи, не блокируя цикл asyncio"""
+        return await self.loop.run_in_executor(self.io_executor, func, *args)
+
+    async def run_sync(self, url, filename, skip_methods=()):
+        """
+        Скачивает изображение синхронным download_image в пуле потоков движка
+
+        Запрос занимает место в max_in_flight и адаптивном пределе, как основной.
+
+        Args:
+            skip_methods: Методы, которые не нужно пробовать (уже не сработали)
+        """
+        async with self.semaphore:
+            await self.acquire_limit()
+            try:
+                return await self.loop.run_in_executor(
+                    self.executor, lambda: self.parser.download_image(url, filename, skip_methods=skip_methods))
+            finally:
+                self.release_limit()
+
+    async def download_image(self, url, filename):
+        """
+        Скачивает изображение основным запросом; при ошибке - всеми методами download_image
+
+        Returns:
+            True если успешно, False в противном случае
+        """
+        filepath = os.path.join(self.parser.download_folder, filename)
+        if (self.parser.store_folder or self.parser.get_partial_size(filepath)
+                or self.parser.min_width or self.parser.min_height):
+            # Общее хранилище, докачка через Range и фильтр разрешения - синхронным download_image
+            return await self.run_sync(url, filename)
+        host = urlparse(url).netloc
+        breaker = self.parser.circuit_breaker
+        async with self.semaphore:
+            await self.acquire_limit(host)
+            wait = _request_bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            started = time.time()
+            try:
+                async with self.client.stream("GET", url) as response:
+                    self.parser.observe_response(response.status_code, time.time() - started)
+                    response.raise_for_status()
+                    breaker.record_success(host)
+                    # Временный файл переименовывается только после проверки размера
+                    # (при ошибке download_image докачает его через Range)
+                    part_path = filepath + PART_SUFFIX
+                    _, expected_size = get_expected_body(response.status_code, response.headers, 0)
+                    await self.run_io(self.parser.check_part_response, filepath, url, response.headers, 0)
+                    await self.run_io(self.parser.check_expected_size, expected_size, 0, filepath)
+                    digest = hashlib.sha256()
+                    size = 0
+                    chunks, buffered = [], 0
+                    f = await self.run_io(open, part_path, 'wb')
+                    try:
+                        async for chunk in response.aiter_bytes(65536):
+                            chunks.append(chunk)
+                            buffered += len(chunk)
+                            size += len(chunk)
+                            wait = _bytes_bucket.reserve(len(chunk))
+                            if wait > 0:
+                                await asyncio.sleep(wait)
+                            if self.parser.size_outside_limits(size, complete=False):
+                                break
+                            if buffered >= self.write_buffer:
+                                await self.run_io(write_chunks, f, digest, chunks)
+                                chunks, buffered = [], 0
+                        if chunks:
+                            await self.run_io(write_chunks, f, digest, chunks)
+                    finally:
+                        await self.run_io(f.close)
+                    if self.parser.size_outside_limits(size, complete=size == expected_size or expected_size is None):
+                        await self.run_io(self.parser.remove_partial, filepath)
+                        raise SizeFilteredError(size, expected_size - size if expected_size else 0)
+                    if expected_size is not None and size != expected_size:
+                        raise IncompleteDownloadError(f"Получено {size} из {expected_size} байт: {filename}")
+                    await self.run_io(os.replace, part_path, filepath)
+                    await self.run_io(self.parser.remove_partial, filepath)
+                    self.parser.finish_digest(filepath, digest, size, started)
+                self.parser.record_download_method(url, 'full_headers', True)
+                await self.run_io(self.parser.record_manifest, url, filename, self.parser.pop_digest(filepath))
+                return True
+            except SizeFilteredError as e:
+                self.parser.record_size_filtered(url, filename, e)
+                return False
+            except httpx.HTTPError as e:
+                status, retry_after = get_error_details(e)
+                if isinstance(e, httpx.TransportError):
+                    self.parser.observe_response(None, time.time() - started)
+                breaker.record_failure(host, is_transient_error(status), retry_after)
+            except OSError:
+                pass  # Обрыв или ошибка записи - download_image докачает .part
+            except Exception as e:
+                print(f"✗ Ошибка асинхронного скачивания {filename}: {e!r}")
+            finally:
+                self.release_limit()
+
+        # Резервные методы (другие размеры, urllib, cookies браузера) - синхронно в пуле потоков,
+        # начиная со следующего за основным: full_headers только что не сработал
+        self.parser.record_download_method(url, 'full_headers', False)
+        return await self.run_sync(url, filename, skip_methods=('full_headers',))
+
+    def shutdown(self):
+        """Дожидается завершения запросов, закрывает клиент и останавливает цикл"""
+        wait(list(self.pending))
+        if self.client is not None:
+            asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result()
+            self.client = None
+        self.executor.shutdown()
+        self.io_executor.shutdown()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
 
 
 class PinterestParser:
@@ -32,11 +1400,84 @@ class PinterestParser:
         """
         self.download_folder = download_folder
         self.driver = None
-        self.scroll_delay = 2.0  # Задержка при прокрутке
-        self.download_delay = 0.5  # Задержка между скачиваниями
+        self.scroll_delay = 2.0  # Задержка при прокрутке (верхняя граница ожидания новых пинов)
+        self.scroll_mode = "python"  # Прокрутка: python (команда на каждый шаг) или async (один скрипт в браузере)
+        self.expected_pin_count = None  # Количество пинов открытой доски (probe_pin_count), None = неизвестно
+        self.initial_state = None  # Встроенное состояние открытой страницы (parse_initial_state)
+        self.network_idle_ms = 300  # Страница готова после стольких мс без запросов fetch/XHR
+        self.ready_settle = 0.3  # Количество пинов и высота страницы не меняются столько секунд
+        self.no_growth_wait = 1.0  # Сколько ждать новых пинов после прокрутки, если сеть уже затихла
+        self.ready_poll_interval = 0.1  # Интервал проверки готовности страницы
+        self.wait_stats = {}  # Этап -> ожиданий, секунд ожидания, прежних пауз (сек), по таймауту
+        self.download_delay = 0.5  # Задержка между скачиваниями (в GUI задает download_rate)
+        self.download_rate = None  # Запросов изображений в секунду на все скачивания (None = без ограничения)
+        self.download_bytes_rate = None  # Байт в секунду на все скачивания (None = без ограничения)
         self.image_quality = "full"  # Качество изображений: full, medium, small
-        self.max_workers = 5  # Количество потоков для параллельного скачивания
+        self.max_workers = 5  # Одновременных скачиваний (начальный предел при adaptive_concurrency)
+        self.adaptive_concurrency = True  # Подбирать количество одновременных скачиваний (ConcurrencyController)
+        self.min_concurrency = 1  # Нижняя граница адаптивного предела
+        self.max_concurrency = 32  # Верхняя граница адаптивного предела (количество потоков пула)
+        self.concurrency = None  # ConcurrencyController текущего скачивания
+        self.download_queue_size = 50  # Размер очереди URL, ожидающих скачивания
+        self.download_backend = "threads"  # Способ скачивания: threads (пул потоков), async (asyncio + httpx)
+        self.async_max_in_flight = 64  # Одновременных запросов в режиме async
         self.session = None  # Переиспользуемая сессия requests
+        self._similar_cutoff_cache = None  # Кэш границы похожих пинов: [href, height, cutoff]
+        self.incremental_harvest = True  # Проход извлечения при прокрутке обрабатывает только новые узлы
+        self._harvest_id = 0  # Номер метки HARVEST_ATTRIBUTE текущего сбора
+        self._harvest_seen = None  # seen_urls, для которого действует метка
+        self._harvest_tag = None
+        self.discovery_mode = "auto"  # Поиск изображений: auto (лента без браузера, затем браузер), api, browser, network
+        self.api_base_url = None  # Адрес для JSON-ресурсов (None = хост из URL доски)
+        self.api_page_size = 25  # Количество пинов на страницу ленты
+        self.api_max_pages = 500  # Ограничение количества страниц ленты
+        self.feed_complete = False  # Лента доски прочитана до конца (iter_board_feed_urls)
+        self.api_session = None  # Сессия requests для JSON-ресурсов
+        self._pending_feed_requests = set()  # requestId ответов ленты, ожидающих завершения загрузки
+        self.pin_id_by_url = {}  # ID пина по URL изображения (из DOM и ответов ленты)
+        self.incremental_sync = False  # Скачивать только новые пины с начала доски
+        self.sync_known_run = 20  # Сколько известных пинов подряд означает, что новых больше нет
+        self.board_state = None  # Содержимое BOARD_STATE_FILENAME
+        self.board_state_key = None  # Ключ текущей доски в board_state
+        self.known_pin_keys = set()  # Известные пины текущей доски
+        self.downloaded_files = {}  # Скачанные файлы текущей доски: ключ изображения -> имя файла
+        self._file_owners = {}  # Обратный индекс: имя файла -> ключ изображения
+        self.board_order = []  # Ключи изображений текущего запуска в порядке доски
+        self.previous_board_order = []  # Порядок доски из предыдущих запусков
+        self.filename_template = None  # Шаблон имени файла (None = имя файла из URL)
+        self.link_sequential = False  # Создавать ссылки с порядковыми именами после скачивания
+        self.strategy_file = "download_strategy.json"  # Рейтинг методов скачивания (None = не сохранять)
+        self.strategy_demote_after = 3  # Неудач подряд, после которых метод переносится в конец
+        self.strategy_explore_every = 50  # Каждое N-е скачивание семейства - в исходном порядке методов
+        self.download_strategy = None  # Рейтинг методов по семействам URL и счетчики
+        self.download_method_counts = {}  # Счетчики методов текущего запуска: {метод: [успешно, неудачно]}
+        self.retry_attempts = 3  # Повторов запроса при временной ошибке (429, 5xx, таймаут)
+        self.retry_backoff = 0.5  # Начальная пауза повтора (сек), удваивается с каждой попыткой
+        self.retry_max_delay = 30.0  # Максимальная пауза повтора (сек)
+        self.circuit_breaker = CircuitBreaker()  # Приостановка запросов к хосту после серии временных ошибок
+        self.deferred_retry = True  # Повторять отложенные изображения после основного прохода
+        self.deferred_retry_workers = 2  # Потоков повторного прохода
+        self.deferred_downloads = {}  # Отложенные после временных ошибок: URL -> (имя файла, папка доски)
+        self.deferring = True  # Откладывать изображения после временных ошибок (не во время повторного прохода)
+        self.resume_partial = True  # Докачивать прерванные скачивания (Range) вместо повторного скачивания
+        self.min_size_mb = 0  # Минимальный размер изображения (МБ), меньшие не сохраняются
+        self.max_size_mb = None  # Максимальный размер изображения (МБ), None = без ограничения
+        self.size_filtered = {}  # Отфильтрованные по размеру или разрешению: URL -> SizeFilteredError
+        self.store_folder = None  # Общее хранилище изображений всех досок (None = скачивать в папку доски)
+        self.store_key = "image"  # Ключ хранилища: image (ключ изображения pinimg) или sha256 (содержимое)
+        self.store_index = None  # Индекс хранилища: ключ варианта -> файл (относительно store_folder), SHA-256, размер
+        self.store_stats = {"linked": 0, "stored": 0, "duplicates": 0, "bytes_saved": 0, "links": {}}
+        self._store_lock = threading.Lock()
+        self.download_digests = {}  # Путь файла -> SHA-256, размер и время, посчитанные при записи
+        self.served_urls = {}  # Путь файла -> URL, с которого он фактически скачан (см. pop_served_url)
+        self._manifest_lock = threading.Lock()
+        self.min_width = 0  # Минимальная ширина изображения (px), меньшие не скачиваются
+        self.min_height = 0  # Минимальная высота изображения (px)
+        self.probe_bytes = 32768  # Начало файла, запрашиваемое для определения разрешения (Range)
+        self.image_dimensions = {}  # Разрешения изображений доски: "размер/ключ" -> [ширина, высота]
+        self.probe_stats = {"probed": 0, "cached": 0}  # Запросов разрешения и ответов из состояния доски
+        self.size_filter_stats = {"skipped": 0, "bytes_saved": 0}  # Счетчики фильтра размера за запуск
+        self._strategy_lock = threading.Lock()
         self.setup_download_folder()
 
     def setup_download_folder(self):
@@ -77,8 +1518,7 @@ class PinterestParser:
                 'Pragma': 'no-cache',
                 'DNT': '1'
             }
-            self.session = requests.Session()
-            self.session.headers.update(headers)
+            self.session = create_http_session(self.get_pool_size(), headers)
 
             # Пробуем добавить cookies из браузера, если он открыт
             try:
@@ -89,6 +1529,79 @@ class PinterestParser:
                 pass
         return self.session
 
+    def get_pool_size(self):
+        """Размер пула соединений на хост: по количеству одновременных скачиваний"""
+        return max(10, self.get_download_workers() + 2)
+
+    def get_download_rate(self):
+        """
+        Скорость запросов изображений (в секунду) для общего ограничения
+
+        Ограничение действует, только если download_rate задан явно (в GUI - по
+        задержке скачивания, rate_from_delay); иначе скорость не ограничивается
+        и количество запросов определяет только адаптивная параллельность.
+        """
+        return self.download_rate or None
+
+    def rate_from_delay(self, delay):
+        """
+        Скорость запросов, соответствующая паузе delay после каждого изображения в max_workers потоках
+
+        Вместо простоя после каждого запроса потоки забирают разрешения из общей
+        корзины - при той же средней нагрузке на сервер время ответа не
+        добавляется к паузе.
+
+        Returns:
+            Запросов в секунду (max_workers / delay) или None при delay <= 0
+        """
+        if delay and delay > 0:
+            return self.max_workers / delay
+        return None
+
+    def apply_download_rate(self):
+        """Применяет ограничения скорости парсера к общим корзинам скачивания"""
+        # Сразу можно начать max_workers запросов - как одновременный старт потоков раньше
+        set_download_rate(self.get_download_rate(), self.download_bytes_rate, request_burst=self.max_workers)
+
+    def get_download_workers(self):
+        """Количество потоков скачивания: верхняя граница адаптивного предела или max_workers"""
+        return self.max_concurrency if self.adaptive_concurrency else self.max_workers
+
+    def start_concurrency_controller(self, max_limit=None, log=print):
+        """
+        Создает регулятор одновременных скачиваний для очередного скачивания
+
+        Начальный предел - итоговый предел предыдущего скачивания этим парсером
+        (или max_workers), поэтому следующая доска не начинает подбор заново.
+
+        Args:
+            max_limit: Верхняя граница предела (None = max_concurrency)
+            log: Функция вывода решений регулятора
+
+        Returns:
+            ConcurrencyController или None, если adaptive_concurrency выключен
+        """
+        if not self.adaptive_concurrency:
+            self.concurrency = None
+            return None
+        initial = self.concurrency.limit if self.concurrency is not None else self.max_workers
+        self.concurrency = ConcurrencyController(initial=initial, min_limit=self.min_concurrency,
+                                                 max_limit=max_limit or self.max_concurrency, log=log)
+        return self.concurrency
+
+    def run_download(self, func, *args):
+        """Выполняет задачу скачивания в пределах адаптивного предела (если он включен)"""
+        controller = self.concurrency
+        if controller is None:
+            return func(*args)
+        return controller.run(func, *args)
+
+    def observe_response(self, status, latency):
+        """Передает код и время ответа сервера изображений регулятору одновременных скачиваний"""
+        controller = self.concurrency
+        if controller is not None:
+            controller.record(status, latency)
+
     def check_chrome_installed(self):
         """Проверяет, установлен ли Chrome"""
         chrome_paths = [
@@ -139,6 +1652,10 @@ class PinterestParser:
             }
             chrome_options.add_experimental_option("prefs", prefs)
 
+            # Журнал сетевых событий для сбора пинов из ответов ленты (режим network)
+            if self.discovery_mode == "network":
+                chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
             # Пытаемся установить ChromeDriver
             print("Установка ChromeDriver...")
             driver_path = None
@@ -271,144 +1788,282 @@ class PinterestParser:
 
         return image_url
 
+    def probe_pin_count(self):
+        """
+        Определяет количество пинов открытой доски до прокрутки
+
+        Число берется из встроенного состояния страницы (объект доски с pin_count),
+        а если его нет - из шапки доски. Результат сохраняется в expected_pin_count.
+
+        Returns:
+            Количество пинов или None, если определить не удалось
+        """
+        self.expected_pin_count = None
+        try:
+            result = self.driver.execute_script(PIN_COUNT_SCRIPT)
+        except Exception as e:
+            print(f"Не удалось определить количество пинов доски: {e}")
+            return None
+        if result and result.get('count'):
+            self.expected_pin_count = int(result['count'])
+            source = "состояние страницы" if result.get('source') == 'state' else "шапка доски"
+            print(f"На доске {self.expected_pin_count} пинов ({source})")
+        return self.expected_pin_count
+
+    def get_scroll_budget(self, max_images=None):
+        """
+        Количество прокруток для сбора max_images (или всех пинов доски)
+
+        Без известного количества пинов (expected_pin_count) - DEFAULT_MAX_SCROLLS.
+        """
+        target = self.expected_pin_count
+        if max_images and max_images > 0:
+            target = min(max_images, target) if target else max_images
+        if not target:
+            return DEFAULT_MAX_SCROLLS
+        return -(-target // SCROLL_PINS_ESTIMATE) + SCROLL_BUDGET_MARGIN
+
+    def get_page_state(self):
+        """Состояние страницы (PAGE_READINESS_SCRIPT) или None, если страница недоступна"""
+        try:
+            return self.driver.execute_script(PAGE_READINESS_SCRIPT)
+        except Exception:
+            return None
+
+    def wait_until_ready(self, phase, timeout, grow_from=None, min_pins=0):
+        """
+        Ждет готовности страницы вместо фиксированной паузы
+
+        Страница готова, когда количество пинов и высота не меняются
+        ready_settle секунд, изображения в окне загружены и network_idle_ms мс
+        нет запросов fetch/XHR. После прокрутки (grow_from - состояние до нее)
+        дополнительно ждется появление новых пинов или рост страницы; если их
+        нет, а сеть затихла - не дольше no_growth_wait секунд (конец доски).
+
+        Args:
+            phase: Этап для отчета format_wait_stats
+            timeout: Верхняя граница ожидания (прежняя фиксированная пауза)
+            grow_from: Состояние страницы до прокрутки (None = рост не нужен)
+            min_pins: Минимальное количество пинов на странице
+
+        Returns:
+            Последнее состояние страницы (None, если страница недоступна)
+        """
+        started = time.time()
+        state = None
+        stable_since = started
+        timed_out = False
+        while True:
+            current = self.get_page_state()
+            now = time.time()
+            if current:
+                if not state or current['pins'] != state['pins'] or current['height'] != state['height']:
+                    stable_since = now
+                state = current
+                grown = grow_from is None or (current['pins'] > grow_from['pins'] or
+                                              current['height'] > grow_from['height'])
+                idle = not current['inflight'] and current['idle'] >= self.network_idle_ms
+                if (idle and not current['pending'] and now - stable_since >= self.ready_settle and
+                        ((grown and current['pins'] >= min_pins) or now - started >= self.no_growth_wait)):
+                    break
+            if now - started >= timeout:
+                timed_out = True
+                break
+            time.sleep(self.ready_poll_interval)
+
+        phase_stats = self.wait_stats.setdefault(phase, {"waits": 0, "seconds": 0.0, "limit": 0.0, "timeouts": 0})
+        phase_stats["waits"] += 1
+        phase_stats["seconds"] += time.time() - started
+        phase_stats["limit"] += timeout
+        phase_stats["timeouts"] += timed_out
+        return state
+
+    def format_wait_stats(self):
+        """Строка с временем ожидания страницы по этапам для лога"""
+        parts = []
+        for phase, stats in self.wait_stats.items():
+            part = f"{phase}: {stats['seconds']:.1f} из {stats['limit']:.1f} сек, ожиданий {stats['waits']}"
+            if stats["timeouts"]:
+                part += f", по таймауту {stats['timeouts']}"
+            parts.append(part)
+        waited = sum(stats["seconds"] for stats in self.wait_stats.values())
+        limit = sum(stats["limit"] for stats in self.wait_stats.values())
+        return f"{'; '.join(parts)}; всего {waited:.1f} сек вместо {limit:.1f} сек фиксированных пауз"
+
     def check_similar_pins_section(self):
         """
         Проверяет, появился ли раздел "Похожие пины" на странице
 
+        Вместо загрузки всего page_source на каждой прокрутке на страницу один раз
+        устанавливается MutationObserver, который запоминает заголовки раздела
+        по мере их появления. Здесь только читается его результат.
+
         Returns:
             True если раздел найден, False в противном случае
         """
         try:
-            # Тексты, которые указывают на раздел похожих пинов (на разных языках)
-            similar_texts = [
-                "Показать похожие",
-                "Похожие пины",
-                "Similar ideas",
-                "Show more like this",
-                "More like this",
-                "Similar pins",
-                "Похожие идеи",
-                "Más ideas como esta",
-                "Ideas similares"
-            ]
-
-            # Получаем весь текст страницы
-            page_text = self.driver.page_source.lower()
-
-            # Проверяем наличие текстов похожих пинов
-            for text in similar_texts:
-                if text.lower() in page_text:
-                    # Проверяем, виден ли этот текст на экране (в видимой области)
-                    try:
-                        elements = self.driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
-                        for element in elements:
-                            if element.is_displayed():
-                                print(f"Обнаружен раздел '{text}' - останавливаю прокрутку")
-                                return True
-                    except:
-                        pass
-
+            text = self.driver.execute_script(SIMILAR_OBSERVER_SCRIPT, SIMILAR_HEADER_TEXTS)
+            if text:
+                print(f"Обнаружен раздел '{text}' - останавливаю прокрутку")
+                return True
             return False
         except Exception as e:
             # В случае ошибки продолжаем работу
             return False
 
-    def scroll_and_load_images(self, max_scrolls=50, max_images=None):
+    def collect_new_image_urls(self, seen_urls, ignore_similar_section=False):
         """
-        Прокручивает страницу для загрузки изображений
-        Останавливается при обнаружении раздела "Похожие пины" или при достижении нужного количества
+        Выполняет проход извлечения и возвращает только новые URL
+
+        Args:
+            seen_urls: Множество уже собранных URL (дополняется)
+            ignore_similar_section: Не фильтровать раздел похожих пинов
+
+        Returns:
+            Список новых URL, отсортированных по позиции (сверху вниз, слева направо)
+        """
+        return [url for _, _, url in self.collect_new_image_data(seen_urls, ignore_similar_section)]
+
+    def collect_new_image_data(self, seen_urls, ignore_similar_section=False):
+        """
+        Выполняет проход извлечения и возвращает только новые изображения с позициями
+
+        Args:
+            seen_urls: Множество уже собранных URL (дополняется)
+            ignore_similar_section: Не фильтровать раздел похожих пинов
+
+        Returns:
+            Список кортежей (y, x, url), отсортированных по позиции
+        """
+        # Инкрементальный проход: узлы, уже записанные в этот seen_urls, помечены на
+        # странице и пропускаются. Новый сбор (другой seen_urls) получает новую метку.
+        if self.incremental_harvest:
+            if self._harvest_seen is not seen_urls:
+                self._harvest_id += 1
+                self._harvest_seen = seen_urls
+            self._harvest_tag = str(self._harvest_id)
+
+        # Временно устанавливаем флаг игнорирования для прохода извлечения
+        self._ignore_similar_section = ignore_similar_section
+        try:
+            current_images_data = self.extract_image_urls_with_positions()
+        finally:
+            self._ignore_similar_section = False
+            self._harvest_tag = None
+
+        new_images_data = []
+        for y, x, url in current_images_data:
+            if url not in seen_urls:
+                seen_urls.add(url)
+                new_images_data.append((y, x, url))
+        new_images_data.sort(key=lambda item: (item[0], item[1]))
+        return new_images_data
+
+    def iter_scroll_images(self, max_scrolls=None, max_images=None):
+        """
+        Прокручивает страницу и отдает URL изображений по мере их обнаружения
+        Останавливается при обнаружении раздела "Похожие пины", при достижении нужного
+        количества или когда собраны все пины доски (expected_pin_count)
+
+        Новые изображения каждого прохода отдаются в порядке позиции на странице,
+        поэтому порядок отдачи совпадает с порядком доски и скачивание может
+        начинаться до окончания прокрутки. При scroll_mode = "async" прокрутка
+        выполняется одним скриптом в браузере (autoscroll_in_page), и URL
+        отдаются после ее завершения.
 
         Args:
-            max_scrolls: Максимальное количество прокруток
+            max_scrolls: Максимальное количество прокруток (None = по количеству пинов, get_scroll_budget)
             max_images: Максимальное количество изображений для сбора (None = все)
+
+        Yields:
+            URL изображения
         """
+        if max_scrolls is None:
+            max_scrolls = self.get_scroll_budget(max_images)
+        if self.scroll_mode == "async":
+            image_urls = self.autoscroll_in_page(max_scrolls=max_scrolls, max_images=max_images)
+            if image_urls is not None:
+                yield from image_urls
+                return
+            print("Прокрутка в браузере не удалась, прокручиваю командами WebDriver...")
+
         last_height = self.driver.execute_script("return document.body.scrollHeight")
         scroll_count = 0
         no_new_content_count = 0  # Счетчик отсутствия нового контента
         similar_section_detected_count = 0  # Счетчик обнаружения раздела похожих пинов
-        collected_image_data = []  # Список кортежей (y, x, url) для сохранения порядка
+        seen_urls = set()  # Уже отданные URL
+        collected_count = 0  # Количество отданных URL
         no_images_loaded_count = 0  # Счетчик попыток, когда изображения не загружаются
         end_of_board_retry_count = 0  # Счетчик попыток при достижении конца доски
         ignore_similar_section = False  # Флаг для игнорирования фильтрации похожих пинов при недостатке изображений
+        limited = bool(max_images and max_images > 0)
+        # Без лимита прокрутка заканчивается, как только собраны все пины доски
+        expected = None if limited else self.expected_pin_count
 
-        if max_images and max_images > 0:
+        if limited:
             print(f"Начинаю прокрутку для загрузки первых {max_images} изображений...")
         else:
             print("Начинаю прокрутку страницы для загрузки всех изображений...")
 
         while scroll_count < max_scrolls:
-            # Если указано ограничение по количеству, проверяем сколько изображений уже собрано
             # Адаптивная частота сбора: чаще собираем, когда близки к нужному количеству
-            if max_images and max_images > 0:
-                # Определяем частоту сбора в зависимости от того, сколько уже собрано
-                current_count = len(collected_image_data)
+            collect_frequency = 1
+            if limited:
                 # Если обнаружен раздел похожих пинов и собрано мало, собираем каждую прокрутку
-                if ignore_similar_section and current_count < max_images * 0.7:
+                if ignore_similar_section and collected_count < max_images * 0.7:
                     collect_frequency = 1  # Собираем каждую прокрутку при недостатке изображений
-                elif current_count < max_images * 0.3:  # Меньше 30% - собираем каждую прокрутку
+                elif collected_count < max_images * 0.3:  # Меньше 30% - собираем каждую прокрутку
                     collect_frequency = 1
-                elif current_count < max_images * 0.7:  # Меньше 70% - собираем каждые 2 прокрутки
+                elif collected_count < max_images * 0.7:  # Меньше 70% - собираем каждые 2 прокрутки
                     collect_frequency = 2
-                elif current_count < max_images:  # Близко к нужному - собираем каждую прокрутку
+                else:  # Близко к нужному - собираем каждую прокрутку
                     collect_frequency = 1
-                else:  # Больше нужного - собираем реже
-                    collect_frequency = 3
-
-                # Собираем изображения с адаптивной частотой
-                if scroll_count % collect_frequency == 0:
-                    # Добавляем задержку для загрузки lazy-loaded изображений
-                    time.sleep(1.0)  # Увеличена задержка для лучшей загрузки
-                    # Временно устанавливаем флаг игнорирования для метода extract_image_urls_with_positions
-                    self._ignore_similar_section = ignore_similar_section
-                    current_images_data = self.extract_image_urls_with_positions()
-                    self._ignore_similar_section = False  # Сбрасываем флаг
-                    # Добавляем только новые URL (проверяем по URL)
-                    seen_urls = {url for _, _, url in collected_image_data}
-                    for y, x, url in current_images_data:
-                        if url not in seen_urls:
-                            collected_image_data.append((y, x, url))
-                            seen_urls.add(url)
-
-                    # Если собрано 0 изображений, продолжаем прокрутку дальше, но с ограничением
-                    if len(collected_image_data) == 0:
-                        no_images_loaded_count += 1
-                        if no_images_loaded_count <= 15:  # Максимум 15 попыток
-                            print(f"Изображения еще не загрузились (попытка {no_images_loaded_count}/15), продолжаю прокрутку...")
-                            continue
-                        else:
-                            print("Изображения не загружаются после 15 попыток, останавливаю прокрутку")
-                            break
-                    else:
-                        no_images_loaded_count = 0  # Сбрасываем счетчик, если изображения найдены
 
-                    required_count = int(max_images * 1.5)  # Запас 50%
-                    if len(collected_image_data) >= required_count:
-                        print(f"Собрано достаточно изображений: {len(collected_image_data)} >= {required_count} (нужно {max_images})")
+            # Собираем изображения с адаптивной частотой
+            if scroll_count % collect_frequency == 0:
+                # Ждем загрузки lazy-loaded изображений
+                self.wait_until_ready("сбор", 1.0)
+                for url in self.collect_new_image_urls(seen_urls, ignore_similar_section):
+                    yield url
+                    collected_count += 1
+                    if limited and collected_count >= max_images:
+                        print(f"Собрано достаточно изображений: {collected_count} (нужно {max_images})")
+                        print("Прокрутка завершена")
+                        return
+                    if expected and collected_count >= expected:
+                        print(f"Собраны все пины доски: {collected_count}")
+                        print("Прокрутка завершена")
+                        return
+
+                # Если собрано 0 изображений, продолжаем прокрутку дальше, но с ограничением
+                if collected_count == 0:
+                    no_images_loaded_count += 1
+                    if no_images_loaded_count <= 15:  # Максимум 15 попыток
+                        print(f"Изображения еще не загрузились (попытка {no_images_loaded_count}/15), продолжаю прокрутку...")
+                        continue
+                    else:
+                        print("Изображения не загружаются после 15 попыток, останавливаю прокрутку")
                         break
+                else:
+                    no_images_loaded_count = 0  # Сбрасываем счетчик, если изображения найдены
 
             # Проверяем наличие раздела "Похожие пины" перед прокруткой
             has_similar = self.check_similar_pins_section()
             if has_similar:
                 similar_section_detected_count += 1
 
-                if max_images and max_images > 0:
-                    # Проверяем, собрано ли достаточно изображений
-                    if len(collected_image_data) >= max_images:
-                        print(f"Обнаружен раздел похожих пинов, собрано {len(collected_image_data)}/{max_images} - останавливаю прокрутку")
-                        ignore_similar_section = False  # Отключаем игнорирование
-                        break
+                if limited:
+                    # Если собрано недостаточно, ИГНОРИРУЕМ раздел похожих пинов и продолжаем агрессивно
+                    if collected_count < max_images * 0.5:  # Если собрано меньше половины
+                        ignore_similar_section = True  # Включаем игнорирование фильтрации
+                        print(f"Обнаружен раздел похожих пинов, но собрано только {collected_count}/{max_images} - ИГНОРИРУЮ раздел и продолжаю агрессивную прокрутку")
+                    elif similar_section_detected_count >= 10:  # Увеличено до 10 для большей настойчивости
+                        ignore_similar_section = True
+                        print(f"Раздел похожих пинов обнаружен {similar_section_detected_count} раз подряд, но собрано только {collected_count}/{max_images} - ИГНОРИРУЮ раздел и продолжаю прокрутку")
+                        similar_section_detected_count = 5  # Сбрасываем счетчик, но не полностью
                     else:
-                        # Если собрано недостаточно, ИГНОРИРУЕМ раздел похожих пинов и продолжаем агрессивно
-                        if len(collected_image_data) < max_images * 0.5:  # Если собрано меньше половины
-                            ignore_similar_section = True  # Включаем игнорирование фильтрации
-                            print(f"Обнаружен раздел похожих пинов, но собрано только {len(collected_image_data)}/{max_images} - ИГНОРИРУЮ раздел и продолжаю агрессивную прокрутку")
-                        elif similar_section_detected_count >= 10:  # Увеличено до 10 для большей настойчивости
-                            ignore_similar_section = True
-                            print(f"Раздел похожих пинов обнаружен {similar_section_detected_count} раз подряд, но собрано только {len(collected_image_data)}/{max_images} - ИГНОРИРУЮ раздел и продолжаю прокрутку")
-                            similar_section_detected_count = 5  # Сбрасываем счетчик, но не полностью
-                        else:
-                            ignore_similar_section = True  # Включаем игнорирование при недостатке изображений
-                            print(f"Обнаружен раздел похожих пинов ({similar_section_detected_count}/10), собрано только {len(collected_image_data)}/{max_images} - продолжаю прокрутку (игнорирую фильтрацию)")
+                        ignore_similar_section = True  # Включаем игнорирование при недостатке изображений
+                        print(f"Обнаружен раздел похожих пинов ({similar_section_detected_count}/10), собрано только {collected_count}/{max_images} - продолжаю прокрутку (игнорирую фильтрацию)")
                 else:
                     # Если не указано ограничение, останавливаемся при обнаружении похожих пинов
                     if similar_section_detected_count >= 3:
@@ -419,42 +2074,40 @@ class PinterestParser:
                         print("Обнаружен раздел похожих пинов - продолжаю прокрутку")
             else:
                 similar_section_detected_count = 0  # Сбрасываем счетчик если раздел не обнаружен
-                # Если собрано достаточно изображений, отключаем игнорирование
-                if max_images and max_images > 0 and len(collected_image_data) >= max_images:
-                    ignore_similar_section = False
 
-            # Оптимизированная прокрутка
+            # Оптимизированная прокрутка: ждем новых пинов, прежние паузы - верхние границы ожидания
+            before_scroll = self.get_page_state()
             # Если нужно больше изображений и обнаружен раздел похожих пинов, прокручиваем более агрессивно
-            if ignore_similar_section and max_images and max_images > 0 and len(collected_image_data) < max_images:
+            if ignore_similar_section and limited:
                 # Агрессивная прокрутка: несколько небольших прокруток для лучшей загрузки
                 for _ in range(2):
                     self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(0.5)
-                time.sleep(max(1.5, self.scroll_delay * 0.8))  # Увеличиваем задержку для загрузки
+                    self.wait_until_ready("прокрутка", 0.5, grow_from=before_scroll)
+                self.wait_until_ready("прокрутка", max(1.5, self.scroll_delay * 0.8), grow_from=before_scroll)
             else:
                 self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                # Увеличиваем задержку для лучшей загрузки lazy-loaded изображений
-                time.sleep(max(1.0, self.scroll_delay * 0.8))  # Минимум 1.0 сек для загрузки изображений
+                self.wait_until_ready("прокрутка", max(1.0, self.scroll_delay * 0.8), grow_from=before_scroll)
 
             # Проверяем, загрузился ли новый контент
             new_height = self.driver.execute_script("return document.body.scrollHeight")
             if new_height == last_height:
                 no_new_content_count += 1
                 # Увеличиваем количество попыток перед остановкой, чтобы дать больше времени на загрузку
-                if no_new_content_count >= 3:  # Увеличено с 2 до 3
+                if no_new_content_count >= 3:
                     # Если есть ограничение по количеству и собрано недостаточно, продолжаем еще немного
-                    if max_images and max_images > 0 and len(collected_image_data) < max_images:
+                    if limited:
                         end_of_board_retry_count += 1
                         # Ограничиваем количество попыток при достижении конца доски
                         if end_of_board_retry_count <= 5:  # Максимум 5 дополнительных попыток
-                            print(f"Достигнут конец доски, но собрано только {len(collected_image_data)}/{max_images}, попытка {end_of_board_retry_count}/5...")
+                            print(f"Достигнут конец доски, но собрано только {collected_count}/{max_images}, попытка {end_of_board_retry_count}/5...")
                             no_new_content_count = 1  # Сбрасываем счетчик для дополнительных попыток
                             # Делаем дополнительную прокрутку для загрузки изображений
+                            before_scroll = self.get_page_state()
                             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                            time.sleep(2.0)  # Дополнительная задержка
+                            self.wait_until_ready("прокрутка", 2.0, grow_from=before_scroll)
                             continue
                         else:
-                            print(f"Достигнут конец доски, собрано {len(collected_image_data)}/{max_images} изображений. Больше изображений не найдено.")
+                            print(f"Достигнут конец доски, собрано {collected_count}/{max_images} изображений. Больше изображений не найдено.")
                             break
                     print("Достигнут конец доски (нет нового контента)")
                     break
@@ -464,232 +2117,207 @@ class PinterestParser:
 
             last_height = new_height
             scroll_count += 1
-            if max_images and max_images > 0:
+            if limited:
                 # Показываем количество собранных URL
-                print(f"Прокрутка {scroll_count}/{max_scrolls} | Найдено: {len(collected_image_data)}/{max_images}")
+                print(f"Прокрутка {scroll_count}/{max_scrolls} | Найдено: {collected_count}/{max_images}")
             else:
-                print(f"Прокрутка {scroll_count}/{max_scrolls}")
+                print(f"Прокрутка {scroll_count}/{max_scrolls} | Найдено: {collected_count}")
 
-        # Прокручиваем в начало, чтобы собрать самые новые изображения
-        if max_images and max_images > 0:
-            print("Прокручиваю в начало доски для сбора самых новых изображений...")
+        # Если нужного количества не собрано (и на доске есть еще пины), возвращаемся
+        # в начало доски и дособираем пропущенные
+        board_complete = bool(self.expected_pin_count) and collected_count >= self.expected_pin_count
+        if limited and not board_complete:
+            print("Прокручиваю в начало доски для сбора пропущенных изображений...")
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(3)  # Увеличена задержка для загрузки изображений
+            self.wait_until_ready("повторный проход", 3)
 
             # Прокручиваем постепенно вниз для загрузки lazy-loaded изображений
-            for i in range(5):  # Увеличено количество итераций для лучшей загрузки
+            for i in range(5):
                 scroll_pos = 800 * (i + 1)
                 self.driver.execute_script(f"window.scrollTo(0, {scroll_pos});")
-                time.sleep(1.0)  # Увеличена задержка для загрузки изображений
+                self.wait_until_ready("повторный проход", 1.0)
 
             # Возвращаемся в начало
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(3)  # Увеличена задержка для финальной загрузки
+            self.wait_until_ready("повторный проход", 3)
 
-            # Финальный сбор изображений с позициями
-            # Временно отключаем фильтрацию похожих пинов для финального сбора
-            self._ignore_similar_section = True
-            final_images_data = self.extract_image_urls_with_positions()
-            self._ignore_similar_section = False
-            seen_urls = {url for _, _, url in collected_image_data}
-            for y, x, url in final_images_data:
-                if url not in seen_urls:
-                    collected_image_data.append((y, x, url))
-                    seen_urls.add(url)
-
-            # Сортируем по позиции (сверху вниз, слева направо)
-            collected_image_data.sort(key=lambda item: (item[0], item[1]))
+            # Финальный сбор (с отключенной фильтрацией похожих пинов). Пины повторных
+            # проходов копятся и отдаются вместе в порядке позиции: номера {index} у них
+            # идут после уже отданных пинов, но между собой следуют порядку доски
+            late_images_data = self.collect_new_image_data(seen_urls, ignore_similar_section=True)
 
-            print(f"Всего собрано уникальных URL во время прокрутки: {len(collected_image_data)}")
+            print(f"Всего собрано уникальных URL во время прокрутки: {collected_count + len(late_images_data)}")
 
             # Если собрано недостаточно изображений, делаем дополнительную попытку извлечения
-            if max_images and max_images > 0 and len(collected_image_data) < max_images:
-                print(f"Собрано только {len(collected_image_data)}/{max_images}, делаю дополнительную попытку извлечения...")
-                # Дополнительная прокрутка для загрузки изображений
+            if collected_count + len(late_images_data) < max_images:
+                print(f"Собрано только {collected_count + len(late_images_data)}/{max_images}, делаю дополнительную попытку извлечения...")
                 for i in range(3):
                     scroll_pos = 1000 * (i + 1)
                     self.driver.execute_script(f"window.scrollTo(0, {scroll_pos});")
-                    time.sleep(1.5)
+                    self.wait_until_ready("повторный проход", 1.5)
                 self.driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(2)
-                # Повторный сбор (с отключенной фильтрацией похожих пинов)
-                self._ignore_similar_section = True
-                additional_images_data = self.extract_image_urls_with_positions()
-                self._ignore_similar_section = False
-                seen_urls = {url for _, _, url in collected_image_data}
-                for y, x, url in additional_images_data:
-                    if url not in seen_urls:
-                        collected_image_data.append((y, x, url))
-                        seen_urls.add(url)
-                # Пересортировка
-                collected_image_data.sort(key=lambda item: (item[0], item[1]))
-                print(f"После дополнительной попытки собрано: {len(collected_image_data)} изображений")
-
-            # Сохраняем собранные данные для использования в extract_image_urls
-            self._collected_image_data_during_scroll = collected_image_data
+                self.wait_until_ready("повторный проход", 2)
+                late_images_data.extend(self.collect_new_image_data(seen_urls, ignore_similar_section=True))
+                late_images_data.sort(key=lambda item: (item[0], item[1]))
+
+            for _, _, url in late_images_data[:max_images - collected_count]:
+                yield url
+                collected_count += 1
+            print(f"После повторных проходов собрано: {collected_count} изображений")
 
         print("Прокрутка завершена")
 
-    def extract_image_urls_from_current_view(self):
+    def autoscroll_in_page(self, max_scrolls=DEFAULT_MAX_SCROLLS, max_images=None):
         """
-        Быстрое извлечение URL изображений с текущей видимой области страницы
-        Используется для проверки количества во время прокрутки
+        Прокручивает страницу и собирает пины одним вызовом execute_async_script
+
+        Весь цикл прокрутки выполняется в браузере (AUTOSCROLL_SCRIPT), Python
+        получает готовый список за один ответ. Правила остановки те же, что у
+        iter_scroll_images: нужное количество, раздел похожих пинов (без лимита;
+        с лимитом раздел игнорируется, как при недостатке изображений), конец доски,
+        все пины доски собраны (expected_pin_count).
+
+        Args:
+            max_scrolls: Максимальное количество прокруток до низа страницы
+            max_images: Максимальное количество изображений (None = все)
 
         Returns:
-            Список URL изображений
+            Список URL в порядке доски или None при ошибке скрипта
         """
-        image_urls = set()
-
+        limited = bool(max_images and max_images > 0)
+        grow_timeout = max(1.0, self.scroll_delay * 0.8)
+        print("Прокрутка и сбор пинов в браузере одним скриптом...")
         try:
-            # Используем поиск через пины для более точного результата
-            selectors = [
-                "[data-test-id='pin']",
-                "[data-test-id='pinrep']",
-                "div[data-test-id='pinWrapper']",
-                "div[role='listitem']"
-            ]
-
-            for selector in selectors:
-                try:
-                    pin_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    for pin in pin_elements:
-                        if self.is_in_similar_section(pin):
-                            continue
+            # Верхняя граница: каждая прокрутка ждет рост страницы не дольше grow_timeout
+            self.driver.set_script_timeout(max_scrolls * (grow_timeout + 2) + 30)
+            result = self.driver.execute_async_script(
+                AUTOSCROLL_SCRIPT, PIN_SELECTORS, None if limited else SIMILAR_SEPARATOR_TEXTS,
+                PIN_SKIP_PATTERNS, max_images if limited else (self.expected_pin_count or 0), max_scrolls,
+                int(grow_timeout * 1000))
+        except Exception as e:
+            print(f"Ошибка прокрутки в браузере: {e}")
+            return None
+        if not result:
+            return None
+        if result.get('cutoff'):
+            self._similar_cutoff_cache = result['cutoff']
 
-                        img_elements = pin.find_elements(By.TAG_NAME, "img")
-                        for img in img_elements:
-                            if self.is_in_similar_section(img):
-                                continue
-
-                            src = (img.get_attribute('src') or
-                                  img.get_attribute('data-src') or
-                                  img.get_attribute('data-lazy-src') or
-                                  img.get_attribute('data-pin-media'))
-
-                            if src and 'pinimg.com' in src:
-                                # Используем улучшенную проверку
-                                if not self.is_valid_pin_image(img, src):
-                                    continue
-
-                                full_url = self.get_full_image_url(src, self.image_quality)
-                                if full_url:
-                                    image_urls.add(full_url)
-                except:
-                    continue
+        image_urls = []
+        seen_urls = set()
+        for y, x, src, width, height, pin_id in result.get('records') or []:
+            if not self.is_valid_pin_image(src, width, height):
+                continue
+            full_url = self.get_full_image_url(src, self.image_quality)
+            if full_url and full_url not in seen_urls:
+                seen_urls.add(full_url)
+                if pin_id:
+                    self.pin_id_by_url[full_url] = str(pin_id)
+                image_urls.append(full_url)
+        if limited:
+            image_urls = image_urls[:max_images]
+
+        reasons = {"target": "собрано нужное количество", "similar": "раздел похожих пинов",
+                   "end": "конец доски", "scrolls": "лимит прокруток"}
+        print(f"Прокрутка завершена ({reasons.get(result.get('reason'), result.get('reason'))}): "
+              f"прокруток {result.get('scrolls')}, найдено {len(image_urls)}")
+        return image_urls
 
-            # Также проверяем все изображения напрямую (на случай если пины не найдены)
-            try:
-                all_images = self.driver.find_elements(By.TAG_NAME, "img")
-                for img in all_images:
-                    if self.is_in_similar_section(img):
-                        continue
+    def scroll_and_load_images(self, max_scrolls=None, max_images=None):
+        """
+        Прокручивает страницу для загрузки изображений
+        Останавливается при обнаружении раздела "Похожие пины" или при достижении нужного количества
 
-                    src = (img.get_attribute('src') or
-                          img.get_attribute('data-src') or
-                          img.get_attribute('data-lazy-src') or
-                          img.get_attribute('data-pin-media'))
+        Args:
+            max_scrolls: Максимальное количество прокруток (None = по количеству пинов доски)
+            max_images: Максимальное количество изображений для сбора (None = все)
+        """
+        # Сохраняем собранные данные для использования в extract_image_urls
+        self._collected_image_urls_during_scroll = list(
+            self.iter_scroll_images(max_scrolls=max_scrolls, max_images=max_images))
 
-                    if src and 'pinimg.com' in src:
-                        if not self.is_valid_pin_image(img, src):
-                            continue
+    def run_extraction_pass(self, all_images_first=False):
+        """
+        Один проход извлечения пинов со страницы за один вызов execute_script
 
-                        full_url = self.get_full_image_url(src, self.image_quality)
-                        if full_url:
-                            image_urls.add(full_url)
-            except:
-                pass
-        except:
-            pass
+        Вместо отдельных команд WebDriver для каждого пина и изображения
+        (find_elements, get_attribute, location, size, поиск предков) весь обход DOM
+        выполняется в браузере, а в Python возвращаются компактные записи.
 
-        return list(image_urls)
+        Args:
+            all_images_first: Сначала обходить все <img>, затем пины (порядок старого extract_image_urls)
 
-    def extract_image_urls_with_positions(self):
+        Returns:
+            Список записей [y, x, src, w, h, pin_id]
         """
-        Извлекает URL изображений с их позициями (y, x) для правильной сортировки
-        Используется во время прокрутки для сохранения порядка
+        ignore_similar = getattr(self, '_ignore_similar_section', False)
+        similar_texts = None if ignore_similar else SIMILAR_SEPARATOR_TEXTS
+        try:
+            result = self.driver.execute_script(PIN_EXTRACTION_SCRIPT, PIN_SELECTORS, similar_texts,
+                                                all_images_first, self._similar_cutoff_cache,
+                                                getattr(self, '_harvest_tag', None))
+        except Exception as e:
+            print(f"Ошибка при извлечении пинов: {e}")
+            return []
+        if not result:
+            return []
+        if result.get('cutoff'):
+            self._similar_cutoff_cache = result['cutoff']
+        return result.get('records') or []
+
+    def extract_image_data(self, all_images_first=False):
+        """
+        Извлекает URL изображений с позициями из одного прохода по странице
+
+        Args:
+            all_images_first: Порядок обхода (см. run_extraction_pass)
 
         Returns:
-            Список кортежей (y, x, url)
+            Список кортежей (y, x, url) в порядке обхода (возможны дубликаты URL)
         """
         image_data = []
+        for y, x, src, width, height, pin_id in self.run_extraction_pass(all_images_first):
+            if not self.is_valid_pin_image(src, width, height):
+                continue
+            full_url = self.get_full_image_url(src, self.image_quality)
+            if full_url:
+                if pin_id:
+                    self.pin_id_by_url[full_url] = str(pin_id)
+                image_data.append((y, x, full_url))
+        return image_data
 
-        try:
-            # Используем поиск через пины для более точного результата
-            selectors = [
-                "[data-test-id='pin']",
-                "[data-test-id='pinrep']",
-                "div[data-test-id='pinWrapper']",
-                "div[role='listitem']"
-            ]
-
-            for selector in selectors:
-                try:
-                    pin_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    for pin in pin_elements:
-                        if self.is_in_similar_section(pin):
-                            continue
-
-                        # Получаем позицию пина
-                        try:
-                            pin_location = pin.location
-                            pin_y = pin_location.get('y', 0)
-                            pin_x = pin_location.get('x', 0)
-                        except:
-                            pin_y = 999999
-                            pin_x = 999999
-
-                        img_elements = pin.find_elements(By.TAG_NAME, "img")
-                        for img in img_elements:
-                            if self.is_in_similar_section(img):
-                                continue
-
-                            src = (img.get_attribute('src') or
-                                  img.get_attribute('data-src') or
-                                  img.get_attribute('data-lazy-src') or
-                                  img.get_attribute('data-pin-media'))
-
-                            if src and 'pinimg.com' in src:
-                                # Используем улучшенную проверку
-                                if not self.is_valid_pin_image(img, src):
-                                    continue
-
-                                full_url = self.get_full_image_url(src, self.image_quality)
-                                if full_url:
-                                    image_data.append((pin_y, pin_x, full_url))
-                except:
-                    continue
+    def extract_image_urls_from_current_view(self):
+        """
+        Быстрое извлечение URL изображений с текущей видимой области страницы
+        Используется для проверки количества во время прокрутки
 
-            # Также проверяем все изображения напрямую (на случай если пины не найдены)
-            try:
-                all_images = self.driver.find_elements(By.TAG_NAME, "img")
-                for img in all_images:
-                    if self.is_in_similar_section(img):
-                        continue
+        Returns:
+            Список URL изображений
+        """
+        return list({url for _, _, url in self.extract_image_data()})
 
-                    src = (img.get_attribute('src') or
-                          img.get_attribute('data-src') or
-                          img.get_attribute('data-lazy-src') or
-                          img.get_attribute('data-pin-media'))
+    def extract_image_urls_with_positions(self):
+        """
+        Извлекает URL изображений с их позициями (y, x) для правильной сортировки
+        Используется во время прокрутки для сохранения порядка
 
-                    if src and 'pinimg.com' in src:
-                        if not self.is_valid_pin_image(img, src):
-                            continue
+        Returns:
+            Список кортежей (y, x, url)
+        """
+        return self.extract_image_data()
 
-                        full_url = self.get_full_image_url(src, self.image_quality)
-                        if full_url:
-                            try:
-                                location = img.location
-                                y_pos = location.get('y', 0)
-                                x_pos = location.get('x', 0)
-                                image_data.append((y_pos, x_pos, full_url))
-                            except:
-                                image_data.append((999999, 999999, full_url))
-            except:
-                pass
-        except:
-            pass
+    def get_similar_section_cutoff(self):
+        """
+        Возвращает Y-границу раздела "Похожие пины" (None если раздел не найден)
 
-        return image_data
+        Граница вычисляется один раз и переиспользуется, пока не изменится
+        страница или её высота (document.body.scrollHeight).
+        """
+        try:
+            self._similar_cutoff_cache = self.driver.execute_script(
+                SIMILAR_CUTOFF_SCRIPT, SIMILAR_SEPARATOR_TEXTS, self._similar_cutoff_cache)
+        except Exception:
+            return None
+        return self._similar_cutoff_cache[2] if self._similar_cutoff_cache else None
 
     def is_in_similar_section(self, element):
         """
@@ -706,62 +2334,23 @@ class PinterestParser:
             return False
 
         try:
-            # Ищем элемент с текстом "Показать похожие" или "Похожие пины"
-            similar_texts = [
-                "Показать похожие",
-                "Похожие пины",
-                "Similar ideas",
-                "Show more like this",
-                "More like this",
-                "Similar pins"
-            ]
-
-            # Получаем позицию элемента
-            try:
-                element_y = element.location['y']
-            except:
-                # Если не можем получить позицию, не фильтруем элемент
+            cutoff = self.get_similar_section_cutoff()
+            if cutoff is None:
                 return False
-
-            # Ищем разделитель похожих пинов
-            for text in similar_texts:
-                try:
-                    # Ищем элементы с этим текстом
-                    separators = self.driver.find_elements(By.XPATH, f"//*[contains(text(), '{text}')]")
-                    for separator in separators:
-                        if separator.is_displayed():
-                            try:
-                                separator_y = separator.location['y']
-                                # Увеличиваем порог с 500px до 1000px для менее агрессивной фильтрации
-                                # Это позволяет собирать больше изображений, которые могут быть валидными
-                                if element_y > separator_y + 1000:
-                                    # Дополнительная проверка: проверяем, действительно ли элемент в контейнере похожих пинов
-                                    try:
-                                        # Ищем родительский контейнер с признаками раздела похожих пинов
-                                        parent = element.find_element(By.XPATH, "./ancestor::*[contains(@class, 'similar') or contains(@class, 'related')]")
-                                        if parent:
-                                            return True
-                                    except:
-                                        # Если не нашли контейнер, используем только позиционную проверку
-                                        pass
-                                    return True
-                            except:
-                                continue
-                except:
-                    continue
-
-            return False
+            # Элемент ниже разделителя более чем на 1000px считается похожим пином
+            return element.location['y'] > cutoff
         except:
             # В случае любой ошибки не фильтруем элемент
             return False
 
-    def is_valid_pin_image(self, img_element, src):
+    def is_valid_pin_image(self, src, width=None, height=None):
         """
         Проверяет, является ли изображение валидным пином (не аватарка, не иконка и т.д.)
 
         Args:
-            img_element: WebElement изображения
             src: URL изображения
+            width: Ширина изображения на странице (None = неизвестно)
+            height: Высота изображения на странице (None = неизвестно)
 
         Returns:
             True если это валидное изображение пина, False в противном случае
@@ -771,64 +2360,16 @@ class PinterestParser:
 
         # Проверка по URL - исключаем аватарки, иконки, логотипы
         src_lower = src.lower()
-        skip_patterns = ['avatar', 'logo', 'icon', 'profile', 'user', 'account',
-                        'favicon', 'button', 'badge', 'emoji', 'reaction']
-
-        if any(pattern in src_lower for pattern in skip_patterns):
+        if any(pattern in src_lower for pattern in PIN_SKIP_PATTERNS):
             return False
 
         # Проверка размера изображения на странице
-        try:
-            size = img_element.size
-            width = size.get('width', 0)
-            height = size.get('height', 0)
-
-            # Аватарки обычно маленькие (менее 50x50) - ослабляем проверку
+        # Аватарки обычно маленькие (менее 50x50)
+        if width is not None and height is not None:
             if width < 50 or height < 50:
                 return False
 
-            # Проверка позиции - аватарки обычно вверху страницы
-            # Убираем эту проверку, так как она может отфильтровывать валидные изображения в начале доски
-            # location = img_element.location
-            # y_pos = location.get('y', 0)
-            # if y_pos < 200 and (width < 150 or height < 150):
-            #     return False
-
-        except:
-            pass
-
-        # Проверка по родительским элементам - ищем признаки пина
-        has_pin_parent = False
-        try:
-            parent = img_element.find_element(By.XPATH, "./ancestor::*[contains(@class, 'pin') or contains(@data-test-id, 'pin')]")
-            # Если нашли родителя с признаками пина, это валидно
-            has_pin_parent = True
-        except:
-            pass
-
-        # Если нашли родителя-пина, это точно валидно
-        if has_pin_parent:
-            return True
-
-        # Если не нашли родителя-пина, проверяем другие признаки
-        # Проверяем размеры в URL - пины обычно имеют размеры 564x, 736x, originals
-        pin_sizes = ['/564x/', '/736x/', '/originals/', '/474x/', '/750x/', '/1200x/', '/1400x/', '/236x/']
-        if any(size in src for size in pin_sizes):
-            # Если URL содержит правильный размер, считаем валидным (ослабляем проверку размера)
-            try:
-                size = img_element.size
-                width = size.get('width', 0)
-                height = size.get('height', 0)
-                # Ослабляем проверку - если размер больше 50px или не можем проверить, считаем валидным
-                if width >= 50 or height >= 50:
-                    return True
-                # Если размер меньше 50, но URL правильный, все равно считаем валидным
-                return True
-            except:
-                return True  # Если не можем проверить размер, но URL правильный, считаем валидным
-
         # Если URL содержит pinimg.com и не содержит паттернов для пропуска, считаем валидным
-        # Это более мягкая проверка для случаев, когда другие проверки не сработали
         return True
 
     def extract_image_urls(self, max_images=None):
@@ -843,10 +2384,10 @@ class PinterestParser:
             Список URL изображений в правильном порядке
         """
         # Если есть данные, собранные во время прокрутки, используем их как основной источник
-        if hasattr(self, '_collected_image_data_during_scroll') and self._collected_image_data_during_scroll:
+        if getattr(self, '_collected_image_urls_during_scroll', None):
             print("Использую изображения, собранные во время прокрутки...")
-            # Извлекаем только URL из собранных данных (они уже отсортированы)
-            image_urls = [url for _, _, url in self._collected_image_data_during_scroll]
+            # Собранные URL уже идут в порядке доски
+            image_urls = list(self._collected_image_urls_during_scroll)
             original_count = len(image_urls)
 
             # Ограничиваем до max_images, если указано
@@ -860,14 +2401,12 @@ class PinterestParser:
                 print(f"Найдено {len(image_urls)} уникальных изображений в правильном порядке")
 
             # Очищаем временную переменную
-            delattr(self, '_collected_image_data_during_scroll')
+            delattr(self, '_collected_image_urls_during_scroll')
             return image_urls
 
         # Если данных нет, собираем изображения стандартным способом
-        image_data = []  # Список кортежей (y, x, url) для сортировки
-
         # Ждем загрузки контента
-        time.sleep(3)
+        self.wait_until_ready("прогрев", 3)
 
         print("Извлекаю URL изображений...")
 
@@ -879,126 +2418,36 @@ class PinterestParser:
         for i in range(8):
             scroll_amount = 600 * (i + 1)
             self.driver.execute_script(f"window.scrollTo(0, {scroll_amount});")
-            time.sleep(0.8)
+            self.wait_until_ready("прогрев", 0.8)
             # Небольшой возврат для триггера lazy loading
             if i > 0:
                 self.driver.execute_script(f"window.scrollTo(0, {scroll_amount - 300});")
-                time.sleep(0.5)
+                self.wait_until_ready("прогрев", 0.5)
                 self.driver.execute_script(f"window.scrollTo(0, {scroll_amount});")
-                time.sleep(0.8)
+                self.wait_until_ready("прогрев", 0.8)
 
         # Возвращаемся в начало для правильного порядка
         self.driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(3)  # Увеличиваем задержку для финальной загрузки
+        self.wait_until_ready("прогрев", 3)
 
         # Финальная прокрутка для гарантии загрузки всех изображений в начале
         for i in range(3):
             self.driver.execute_script(f"window.scrollTo(0, {400 * (i + 1)});")
-            time.sleep(1)
+            self.wait_until_ready("прогрев", 1)
 
         self.driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(2)
+        self.wait_until_ready("прогрев", 2)
 
-        # Метод 1: Поиск через Selenium для динамически загруженных элементов
-        # Это более надежный метод для Pinterest
+        # Ждем появления изображений и извлекаем все пины за один проход по странице
+        # (сначала все <img>, затем контейнеры пинов - позиции берутся из первого вхождения)
         try:
-            # Ждем появления пинов на странице
             WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "img"))
             )
-
-            # Получаем все изображения
-            images = self.driver.find_elements(By.TAG_NAME, "img")
-            print(f"Найдено {len(images)} элементов img")
-
-            for img in images:
-                # Проверяем, не находится ли изображение в разделе похожих пинов
-                if self.is_in_similar_section(img):
-                    continue
-
-                # Пробуем разные атрибуты
-                src = (img.get_attribute('src') or
-                      img.get_attribute('data-src') or
-                      img.get_attribute('data-lazy-src') or
-                      img.get_attribute('data-pin-media'))
-
-                if src and 'pinimg.com' in src:
-                    # Проверяем, является ли это валидным пином
-                    if not self.is_valid_pin_image(img, src):
-                        continue
-
-                    full_url = self.get_full_image_url(src, self.image_quality)
-                    if full_url:
-                        # Получаем позицию для сортировки
-                        try:
-                            location = img.location
-                            y_pos = location.get('y', 0)
-                            x_pos = location.get('x', 0)
-                            image_data.append((y_pos, x_pos, full_url))
-                        except:
-                            # Если не удалось получить позицию, добавляем в конец
-                            image_data.append((999999, 999999, full_url))
-                elif src:
-                    # Логируем изображения без pinimg.com для диагностики (только первые несколько)
-                    if len([d for d in image_data if d]) < 5:  # Логируем только если найдено мало изображений
-                        pass  # Можно добавить логирование если нужно
         except Exception as e:
-            print(f"Ошибка при поиске изображений через Selenium: {e}")
+            print(f"Ошибка при ожидании изображений: {e}")
 
-        # Метод 2: Поиск через пины Pinterest (более надежный метод)
-        try:
-            # Различные селекторы для пинов Pinterest
-            selectors = [
-                "[data-test-id='pin']",
-                "[data-test-id='pinrep']",
-                "div[data-test-id='pinWrapper']",
-                "div[role='listitem']"
-            ]
-
-            for selector in selectors:
-                try:
-                    pin_elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    print(f"Найдено {len(pin_elements)} элементов с селектором {selector}")
-
-                    for pin in pin_elements:
-                        # Проверяем, не находится ли пин в разделе похожих
-                        if self.is_in_similar_section(pin):
-                            continue
-
-                        # Получаем позицию пина для сортировки
-                        try:
-                            pin_location = pin.location
-                            pin_y = pin_location.get('y', 0)
-                            pin_x = pin_location.get('x', 0)
-                        except:
-                            pin_y = 999999
-                            pin_x = 999999
-
-                        img_elements = pin.find_elements(By.TAG_NAME, "img")
-                        for img in img_elements:
-                            # Дополнительная проверка для изображения
-                            if self.is_in_similar_section(img):
-                                continue
-
-                            src = (img.get_attribute('src') or
-                                  img.get_attribute('data-src') or
-                                  img.get_attribute('data-lazy-src') or
-                                  img.get_attribute('data-pin-media'))
-
-                            if src and 'pinimg.com' in src:
-                                # Используем улучшенную проверку
-                                if not self.is_valid_pin_image(img, src):
-                                    continue
-
-                                full_url = self.get_full_image_url(src, self.image_quality)
-                                if full_url:
-                                    # Используем позицию пина для сортировки
-                                    image_data.append((pin_y, pin_x, full_url))
-                except Exception as e:
-                    print(f"Ошибка с селектором {selector}: {e}")
-                    continue
-        except Exception as e:
-            print(f"Ошибка при поиске через data-атрибуты: {e}")
+        image_data = self.extract_image_data(all_images_first=True)
 
         # Удаляем дубликаты, сохраняя порядок
         seen_urls = set()
@@ -1017,45 +2466,188 @@ class PinterestParser:
         print(f"Найдено {len(image_urls)} уникальных изображений в правильном порядке")
         return image_urls
 
-    def download_image(self, url, filename, use_session=True):
+    def get_url_family(self, url):
+        """
+        Возвращает семейство URL для стратегии скачивания: хост и первый сегмент пути
+
+        Например, i.pinimg.com/originals и i.pinimg.com/736x - разные семейства,
+        так как оригиналы и уменьшенные копии могут блокироваться по-разному.
+        """
+        parsed = urlparse(url)
+        segments = [segment for segment in parsed.path.split('/') if segment]
+        return f"{parsed.netloc}/{segments[0]}" if segments else parsed.netloc
+
+    def load_download_strategy(self):
+        """Загружает рейтинг методов скачивания из strategy_file (один раз)"""
+        if self.download_strategy is not None:
+            return self.download_strategy
+        self.download_strategy = {"families": {}, "served": {}, "failed": {}}
+        if self.strategy_file and os.path.exists(self.strategy_file):
+            try:
+                with open(self.strategy_file, 'r', encoding='utf-8') as f:
+                    self.download_strategy.update(json.load(f))
+            except Exception as e:
+                print(f"Не удалось прочитать стратегию скачивания: {e}")
+        return self.download_strategy
+
+    def save_download_strategy(self):
+        """Сохраняет рейтинг методов скачивания и счетчики в strategy_file"""
+        if self.download_strategy is None or not self.strategy_file:
+            return
+        try:
+            with self._strategy_lock:
+                data = json.dumps(self.download_strategy, ensure_ascii=False, indent=2)
+            with open(self.strategy_file, 'w', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Ошибка сохранения стратегии скачивания: {e}")
+
+    def order_download_methods(self, url, methods):
+        """
+        Упорядочивает методы скачивания по рейтингу семейства URL
+
+        Первыми идут методы, успешно скачавшие изображения этого семейства (последний
+        успешный - первым), затем еще не опробованные, в конце - пониженные после
+        повторяющихся неудач. Каждое strategy_explore_every-е скачивание использует
+        исходный порядок, чтобы заметить, что более ранний метод снова работает.
+
+        Args:
+            url: URL изображения
+            methods: Список методов в исходном порядке (словари с ключом 'name')
+
+        Returns:
+            Список методов в порядке попыток
+        """
+        strategy = self.load_download_strategy()
+        with self._strategy_lock:
+            state = self._strategy_family(strategy, url)
+            state["downloads"] += 1
+            if self.strategy_explore_every and state["downloads"] % self.strategy_explore_every == 0:
+                return methods
+            rank = {name: position for position, name in enumerate(state["order"])}
+            untried_rank = len(rank)
+            for position, name in enumerate(state["demoted"]):
+                rank[name] = untried_rank + 1 + position
+        return sorted(methods, key=lambda method: rank.get(method['name'], untried_rank))
+
+    def record_download_method(self, url, name, success):
+        """
+        Учитывает результат метода скачивания для семейства URL
+
+        Успешный метод становится первым; метод, не сработавший
+        strategy_demote_after раз подряд, переносится в конец.
+        """
+        strategy = self.load_download_strategy()
+        with self._strategy_lock:
+            state = self._strategy_family(strategy, url)
+            counts = self.download_method_counts.setdefault(name, [0, 0])
+            counts[0 if success else 1] += 1
+            if success:
+                for ranking in (state["order"], state["demoted"]):
+                    if name in ranking:
+                        ranking.remove(name)
+                state["order"].insert(0, name)
+                state["failures"][name] = 0
+                strategy["served"][name] = strategy["served"].get(name, 0) + 1
+                return
+
+            strategy["failed"][name] = strategy["failed"].get(name, 0) + 1
+            state["failures"][name] = state["failures"].get(name, 0) + 1
+            if state["failures"][name] >= self.strategy_demote_after:
+                state["failures"][name] = 0
+                for ranking in (state["order"], state["demoted"]):
+                    if name in ranking:
+                        ranking.remove(name)
+                state["demoted"].append(name)
+
+    def _strategy_family(self, strategy, url):
+        """Состояние рейтинга для семейства URL (создается при первом обращении)"""
+        return strategy["families"].setdefault(self.get_url_family(url), {
+            "order": [], "demoted": [], "failures": {}, "downloads": 0
+        })
+
+    def get_download_method_stats(self, total=False):
+        """
+        Возвращает счетчики методов скачивания
+
+        Args:
+            total: За все запуски (из strategy_file), иначе - за текущий запуск
+
+        Returns:
+            Словарь {метод: (успешных скачиваний, неудачных попыток)}
+        """
+        strategy = self.load_download_strategy()
+        with self._strategy_lock:
+            if not total:
+                return {name: tuple(counts) for name, counts in sorted(self.download_method_counts.items())}
+            names = set(strategy["served"]) | set(strategy["failed"])
+            return {name: (strategy["served"].get(name, 0), strategy["failed"].get(name, 0)) for name in sorted(names)}
+
+    def format_download_method_stats(self):
+        """Строка со счетчиками методов скачивания текущего запуска для лога"""
+        return ", ".join(f"{name}: {served}/{failed}"
+                         for name, (served, failed) in self.get_download_method_stats().items())
+
+    def download_image(self, url, filename, use_session=True, skip_methods=()):
         """
         Скачивает изображение по URL
 
+        Методы скачивания (заголовки, другой размер, urllib, cookies браузера)
+        пробуются в порядке, выученном для семейства URL (см. order_download_methods):
+        если оригиналы доски стабильно отдают 403, следующие изображения сразу
+        скачиваются сработавшим методом, без повторения всей цепочки.
+        Временные ошибки (429, 5xx, таймауты) повторяются тем же методом
+        (fetch_with_retries); если повторы не помогли, изображение откладывается
+        в deferred_downloads до повторного прохода, а не перебирает остальные методы.
+
         Args:
             url: URL изображения
             filename: Имя файла для сохранения
             use_session: Использовать переиспользуемую сессию (по умолчанию True)
+            skip_methods: Названия методов, которые не нужно пробовать (уже не сработали)
 
         Returns:
             True если успешно, False в противном случае
         """
         filepath = os.path.join(self.download_folder, filename)
+        if self.store_folder:
+            return self.download_via_store(url, filename, filepath, use_session, skip_methods)
+        if not self.download_image_to(url, filename, filepath, use_session, skip_methods):
+            return False
+        self.pop_served_url(filepath, url)
+        self.record_manifest(url, filename, self.pop_digest(filepath))
+        return True
+
+    def pop_served_url(self, filepath, default=None):
+        """URL, с которого download_image_to фактически скачал файл (метод мог заменить размер)"""
+        with self._strategy_lock:
+            return self.served_urls.pop(filepath, default)
 
+    def download_image_to(self, url, filename, filepath, use_session=True, skip_methods=()):
+        """
+        Скачивает изображение в файл filepath (методы download_image)
+
+        Args:
+            url: URL изображения
+            filename: Имя файла в папке доски (для лога и отложенных скачиваний)
+            filepath: Путь сохранения (файл доски или файл хранилища)
+            use_session: Использовать переиспользуемую сессию
+            skip_methods: Названия методов, которые не нужно пробовать
+
+        Returns:
+            True если успешно, False в противном случае
+        """
         # Список методов для попытки скачивания
         methods = [
-            # Метод 1: Полные заголовки с правильным Referer
+            # Метод 1: Полные заголовки с правильным Referer (заголовки сессии)
             {
-                'headers': {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Referer': 'https://www.pinterest.com/',
-                    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
-                    'Accept-Encoding': 'gzip, deflate, br',
-                    'Connection': 'keep-alive',
-                    'Sec-Fetch-Dest': 'image',
-                    'Sec-Fetch-Mode': 'no-cors',
-                    'Sec-Fetch-Site': 'cross-site',
-                    'Sec-Ch-Ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-                    'Sec-Ch-Ua-Mobile': '?0',
-                    'Sec-Ch-Ua-Platform': '"Windows"',
-                    'Cache-Control': 'no-cache',
-                    'Pragma': 'no-cache',
-                    'DNT': '1'
-                },
+                'name': 'full_headers',
+                'headers': None,
                 'url': url
             },
             # Метод 2: Попробуем изменить URL - заменить /originals/ на /736x/ или /564x/
             {
+                'name': 'resize_736x',
                 'headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Referer': 'https://www.pinterest.com/',
@@ -1071,6 +2663,7 @@ class PinterestParser:
             },
             # Метод 3: Попробуем другой размер
             {
+                'name': 'resize_564x',
                 'headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Referer': 'https://www.pinterest.com/',
@@ -1086,6 +2679,7 @@ class PinterestParser:
             },
             # Метод 4: Простые заголовки
             {
+                'name': 'simple_headers',
                 'headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Referer': 'https://www.pinterest.com/'
@@ -1094,6 +2688,7 @@ class PinterestParser:
             },
             # Метод 5: Без Referer, но с полным User-Agent
             {
+                'name': 'no_referer',
                 'headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8',
@@ -1103,6 +2698,7 @@ class PinterestParser:
             },
             # Метод 6: Убрать параметры из URL
             {
+                'name': 'no_query',
                 'headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
                     'Referer': 'https://www.pinterest.com/',
@@ -1112,145 +2708,628 @@ class PinterestParser:
             },
             # Метод 7: Использовать urllib вместо requests (обход некоторых блокировок)
             {
+                'name': 'urllib',
                 'method': 'urllib',
                 'url': url
             },
-            # Метод 8: Использовать Selenium для прямого скачивания (последний метод)
+            # Метод 8: Запрос с актуальными cookies из браузера Selenium (последний метод)
             {
+                'name': 'browser_cookies',
                 'method': 'selenium',
+                'headers': {
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                    'Referer': 'https://www.pinterest.com/',
+                    'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8'
+                },
                 'url': url
             }
         ]
 
-        # Пробуем каждый метод по очереди
-        for i, method in enumerate(methods, 1):
+        methods = [method for method in methods if method['name'] not in skip_methods]
+
+        session = self.init_session()
+        if not use_session:
+            session = requests.Session()
+            session.headers.update(self.session.headers)
+        host = urlparse(url).netloc
+
+        # Фильтр разрешения - по началу файла, до скачивания целиком
+        if self.min_width or self.min_height:
+            dimensions, bytes_saved = self.get_image_dimensions(url, session)
+            if dimensions and (dimensions[0] < self.min_width or dimensions[1] < self.min_height):
+                self.record_size_filtered(url, filename, DimensionFilteredError(*dimensions, bytes_saved))
+                return False
+
+        # Пробуем методы в порядке рейтинга для семейства URL
+        for method in self.order_download_methods(url, methods):
+            name = method['name']
+            cookies = None
+            if method.get('method') == 'selenium':
+                # Cookies берутся из браузера в момент запроса (могли обновиться)
+                cookies = self.get_browser_cookies() if self.driver else None
+                if not cookies:
+                    continue
+
             try:
-                # Небольшая задержка между попытками (кроме первой)
-                if i > 1:
-                    time.sleep(0.2)
+                success, transient = self.fetch_with_retries(method, session, filepath, host, cookies)
+            except SizeFilteredError as e:
+                # Изображение получено корректно, но не подходит по размеру - другие методы не нужны
+                self.record_size_filtered(url, filename, e)
+                return False
+            if success:
+                self.record_download_method(url, name, True)
+                self.record_file_dimensions(method['url'], filepath)
+                with self._strategy_lock:
+                    self.deferred_downloads.pop(url, None)
+                    self.served_urls[filepath] = method['url']
+                if name != 'full_headers':  # Логируем только если использован не основной метод
+                    print(f"✓ Успешно скачано методом {name}: {filename}")
+                return True
 
-                if method.get('method') == 'urllib':
-                    # Используем urllib
-                    import urllib.request
-                    import urllib.error
+            self.record_download_method(url, name, False)
+            if transient:
+                # Сервер перегружен или недоступен - другие методы получат тот же ответ,
+                # изображение откладывается до повторного прохода (run_deferred_retries);
+                # в самом повторном проходе - не откладывается снова
+                if not self.deferring:
+                    print(f"✗ Не скачано после повторного прохода ({name}): {filename}")
+                    return False
+                with self._strategy_lock:
+                    self.deferred_downloads[url] = (filename, self.download_folder)
+                print(f"⏳ Отложено после временных ошибок ({name}): {filename}")
+                return False
+            # 403 и другие постоянные ошибки - пробуем следующий метод
 
-                    req = urllib.request.Request(method['url'])
-                    req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-                    req.add_header('Referer', 'https://www.pinterest.com/')
-                    req.add_header('Accept', 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8')
-                    req.add_header('Accept-Language', 'en-US,en;q=0.9')
+        # Если все методы не сработали
+        short_url = url[:80] + "..." if len(url) > 80 else url
+        print(f"✗ Ошибка при скачивании {short_url} (все {len(methods)} методов не сработали)")
+        return False
 
-                    try:
-                        with urllib.request.urlopen(req, timeout=30) as response:
-                            if response.status == 200:
-                                with open(filepath, 'wb') as f:
-                                    f.write(response.read())
-                                print(f"✓ Успешно скачано методом {i} (urllib): {filename}")
-                                return True
-                    except urllib.error.HTTPError as e:
-                        if e.code == 403:
-                            continue
-                        raise
-                elif method.get('method') == 'selenium':
-                    # Используем Selenium для прямого скачивания через JavaScript (последний метод)
-                    if not self.driver:
-                        continue
+    def fetch_with_retries(self, method, session, filepath, host, cookies=None):
+        """
+        Скачивает изображение одним методом, повторяя запрос при временных ошибках
 
-                    try:
-                        # Используем JavaScript для получения изображения как base64
-                        js_code = f"""
-                        var img = new Image();
-                        img.crossOrigin = 'anonymous';
-                        img.src = '{method['url']}';
-                        return new Promise((resolve, reject) => {{
-                            img.onload = function() {{
-                                var canvas = document.createElement('canvas');
-                                canvas.width = img.width;
-                                canvas.height = img.height;
-                                var ctx = canvas.getContext('2d');
-                                ctx.drawImage(img, 0, 0);
-                                try {{
-                                    var dataURL = canvas.toDataURL('image/jpeg');
-                                    resolve(dataURL);
-                                }} catch(e) {{
-                                    reject(e);
-                                }}
-                            }};
-                            img.onerror = reject;
-                            setTimeout(() => reject(new Error('Timeout')), 30000);
-                        }});
-                        """
-
-                        # Пробуем получить изображение через JavaScript
-                        # Но это может не сработать из-за CORS, поэтому используем альтернативный метод
-                        # Скачиваем через requests с cookies из браузера
-                        browser_cookies = self.get_browser_cookies()
-                        if browser_cookies:
-                            session = requests.Session()
-                            session.headers.update({
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                                'Referer': 'https://www.pinterest.com/',
-                                'Accept': 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8'
-                            })
-                            session.cookies.update(browser_cookies)
-                            response = session.get(method['url'], timeout=30, stream=True, allow_redirects=True)
-                            response.raise_for_status()
-
-                            with open(filepath, 'wb') as f:
-                                for chunk in response.iter_content(chunk_size=8192):
-                                    if chunk:
-                                        f.write(chunk)
-                            print(f"✓ Успешно скачано методом {i} (selenium cookies): {filename}")
-                            return True
-                    except:
-                        continue
+        Временные ошибки (429, 5xx, таймауты, обрывы соединения) повторяются до
+        retry_attempts раз с экспоненциальной паузой со случайным разбросом или
+        паузой из Retry-After. Каждая ошибка учитывается автоматом хоста
+        (CircuitBreaker), который приостанавливает все запросы к хосту.
+
+        Returns:
+            Кортеж (успешно, последняя ошибка временная)
+        """
+        for attempt in range(self.retry_attempts + 1):
+            self.circuit_breaker.wait(host)
+            _request_bucket.acquire()
+            try:
+                self.fetch_image(method, session, filepath, cookies)
+            except SizeFilteredError:
+                self.circuit_breaker.record_success(host)
+                raise
+            except Exception as e:
+                status, retry_after = get_error_details(e)
+                transient = is_transient_error(status)
+                self.circuit_breaker.record_failure(host, transient, retry_after)
+                if not transient:
+                    return False, False
+                if attempt < self.retry_attempts:
+                    time.sleep(self.get_retry_delay(attempt, retry_after))
+                continue
+            self.circuit_breaker.record_success(host)
+            return True, False
+        return False, True
+
+    def get_retry_delay(self, attempt, retry_after=None):
+        """Пауза перед повтором: экспоненциальная со случайным разбросом, не меньше Retry-After"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_backoff * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.retry_max_delay))
+        return delay
+
+    def fetch_image(self, method, session, filepath, cookies=None):
+        """
+        Один запрос изображения методом download_image (исключение при ошибке)
+
+        Один пул соединений для всех методов: заголовки метода передаются в запрос,
+        лишние заголовки сессии убираются значением None.
+        """
+        started = time.time()
+        observed = False  # Ответ уже передан регулятору одновременных скачиваний
+        # Незавершенное скачивание продолжается с места остановки, если его начал тот же
+        # URL, и только пока файл на сервере не изменился (If-Range; иначе ответ 200 - сначала)
+        offset = self.get_partial_size(filepath, method['url'])
+        range_headers = {}
+        if offset:
+            range_headers = {'Range': f'bytes={offset}-', 'Accept-Encoding': 'identity'}
+            validator = get_if_range(self.load_part_info(filepath))
+            if validator:
+                range_headers['If-Range'] = validator
+        try:
+            if method.get('method') == 'urllib':
+                # Используем urllib
+                req = urllib.request.Request(method['url'])
+                req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+                req.add_header('Referer', 'https://www.pinterest.com/')
+                req.add_header('Accept', 'image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8')
+                req.add_header('Accept-Language', 'en-US,en;q=0.9')
+                for name, value in range_headers.items():
+                    req.add_header(name, value)
+
+                with urllib.request.urlopen(req, timeout=30) as response:
+                    self.observe_response(response.status, time.time() - started)
+                    observed = True
+                    if response.status not in (200, 206):
+                        raise urllib.error.HTTPError(method['url'], response.status, "", response.headers, None)
+                    position, expected_size = get_expected_body(response.status, response.headers, offset)
+                    self.check_part_response(filepath, method['url'], response.headers, position)
+                    self.check_expected_size(expected_size, position, filepath)
+                    self.write_response(iter(lambda: response.read(65536), b''), filepath, position, expected_size,
+                                        started)
+                return
+
+            headers = method['headers']
+            if headers is not None:
+                headers = dict({name: None for name in session.headers if name not in headers}, **headers)
+            if range_headers:
+                headers = dict(headers or {}, **range_headers)
+            # Используем requests (с cookies браузера для метода browser_cookies)
+            response = session.get(method['url'], headers=headers, cookies=cookies,
+                                   timeout=30, stream=True, allow_redirects=True)
+            self.observe_response(response.status_code, time.time() - started)
+            observed = True
+            if response.status_code >= 400:
+                response.content  # Короткое тело ошибки дочитывается, чтобы соединение вернулось в пул
+            if response.status_code == 416 and offset:
+                # Сохраненная часть не подходит к файлу на сервере - следующая попытка начнет сначала
+                self.remove_partial(filepath)
+                raise IncompleteDownloadError(f"Диапазон докачки отклонен: {os.path.basename(filepath)}")
+            response.raise_for_status()
+            position, expected_size = get_expected_body(response.status_code, response.headers, offset)
+            try:
+                self.check_part_response(filepath, method['url'], response.headers, position)
+                self.check_expected_size(expected_size, position, filepath)
+                self.write_response(response.iter_content(chunk_size=8192), filepath, position, expected_size,
+                                    started)
+            except SizeFilteredError:
+                response.close()  # Остаток тела не скачивается - соединение закрывается
+                raise
+        except Exception as e:
+            if not observed:
+                # urllib сообщает код ответа исключением HTTPError; без кода - ошибка соединения
+                self.observe_response(getattr(e, 'code', None), time.time() - started)
+            raise
+
+    def get_partial_size(self, filepath, url=None):
+        """
+        Размер незавершенного скачивания (filepath + PART_SUFFIX), 0 - начинать сначала
+
+        Args:
+            filepath: Путь готового файла
+            url: URL запроса - часть, начатая другим URL (другой размер или метод
+                скачивания) или без сведений (PART_INFO_SUFFIX), удаляется и не
+                продолжается. None - размер любой части
+        """
+        if not self.resume_partial:
+            return 0
+        try:
+            size = os.path.getsize(filepath + PART_SUFFIX)
+        except OSError:
+            return 0
+        if url is not None:
+            info = self.load_part_info(filepath)
+            if not info or info.get("url") != url:
+                self.remove_partial(filepath)
+                return 0
+        return size
+
+    def load_part_info(self, filepath):
+        """Сведения о незавершенном скачивании (url, etag, last_modified) или None"""
+        try:
+            with open(filepath + PART_INFO_SUFFIX, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return info if isinstance(info, dict) else None
+
+    def check_part_response(self, filepath, url, headers, position):
+        """
+        Связывает временный файл с ответом сервера
+
+        Новый временный файл (позиция 0, в том числе ответ 200 на запрос докачки -
+        файл на сервере изменился) записывается со сведениями об URL, ETag и
+        Last-Modified ответа. Для докачки (206) ETag ответа сверяется с сохраненным.
+
+        Raises:
+            IncompleteDownloadError: ETag ответа на докачку не совпал (часть удаляется)
+        """
+        if not position:
+            info = {"url": url, "etag": headers.get('ETag'), "last_modified": headers.get('Last-Modified')}
+            with open(filepath + PART_INFO_SUFFIX, 'w', encoding='utf-8') as f:
+                json.dump(info, f, ensure_ascii=False)
+            return
+        saved = (self.load_part_info(filepath) or {}).get("etag")
+        etag = headers.get('ETag')
+        if saved and etag and saved != etag:
+            self.remove_partial(filepath)
+            raise IncompleteDownloadError(f"Файл на сервере изменился, докачка отменена: {os.path.basename(filepath)}")
+
+    def remove_partial(self, filepath):
+        """Удаляет временный файл скачивания и сведения о нем"""
+        for path in (filepath + PART_SUFFIX, filepath + PART_INFO_SUFFIX):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def load_store_index(self):
+        """Загружает индекс общего хранилища (один раз)"""
+        if self.store_index is not None:
+            return self.store_index
+        self.store_index = {}
+        index_path = os.path.join(self.store_folder, STORE_INDEX_FILENAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    self.store_index = json.load(f)
+            except Exception as e:
+                print(f"Не удалось прочитать индекс хранилища: {e}")
+        return self.store_index
+
+    def save_store_index(self):
+        """Сохраняет индекс общего хранилища"""
+        if not self.store_folder or self.store_index is None:
+            return
+        try:
+            with self._store_lock:
+                data = json.dumps(self.store_index, ensure_ascii=False, indent=1)
+            with open(os.path.join(self.store_folder, STORE_INDEX_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            print(f"Ошибка сохранения индекса хранилища: {e}")
+
+    def download_via_store(self, url, filename, filepath, use_session=True, skip_methods=()):
+        """
+        Скачивает изображение через общее хранилище и создает ссылку в папке доски
+
+        Файл хранилища определяется ключом варианта изображения (store_key = "image":
+        <store>/<размер>/<ключ[:2]>/<ключ>.jpg) или SHA-256 содержимого (store_key =
+        "sha256": <store>/sha256/<хеш[:2]>/<хеш>.jpg, связь с ключом - в индексе).
+        Изображение, уже сохраненное для другой доски, не скачивается повторно и
+        не занимает места на диске: в папке доски создается ссылка (link_file).
+
+        Returns:
+            True если файл доски создан, False в противном случае
+        """
+        variant_key = self.get_variant_key(url)
+        ext = os.path.splitext(filename)[1] or '.jpg'
+        with self._store_lock:
+            stored_entry = self.load_store_index().get(variant_key)
+        if isinstance(stored_entry, str):
+            stored_entry = {"file": stored_entry}  # Индекс без хешей
+        relative = stored_entry["file"] if stored_entry else None
+        if self.store_key != "sha256":
+            variant, key = variant_key.rsplit('/', 1)
+            relative = os.path.join(variant, key[:2], key + ext)
+        stored = os.path.join(self.store_folder, relative) if relative else None
+
+        if stored and os.path.exists(stored) and is_complete_image_file(stored):
+            # Повтор пина (с другой доски или после удаления файла доски) - без сети;
+            # хеш для манифеста берется из индекса
+            if stored_entry and stored_entry.get("sha256") and stored_entry.get("file") == relative:
+                entry = {"sha256": stored_entry["sha256"], "size": stored_entry["size"], "seconds": 0}
+            else:
+                entry = dict(self.pop_digest(stored), seconds=0)
+            with self._store_lock:
+                self.store_stats["linked"] += 1
+                self.store_stats["bytes_saved"] += entry["size"]
+        elif self.store_key == "sha256":
+            incoming = os.path.join(self.store_folder, "incoming", variant_key.replace('/', '_') + ext)
+            os.makedirs(os.path.dirname(incoming), exist_ok=True)
+            if not self.download_image_to(url, filename, incoming, use_session, skip_methods):
+                return False
+            # Резервный метод мог скачать другой размер - индекс по фактическому варианту
+            variant_key = self.get_variant_key(self.pop_served_url(incoming, url))
+            # Хеш посчитан при записи - файл не перечитывается
+            entry = self.pop_digest(incoming)
+            relative = os.path.join("sha256", entry["sha256"][:2], entry["sha256"] + ext)
+            stored = os.path.join(self.store_folder, relative)
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            with self._store_lock:
+                if os.path.exists(stored):
+                    # То же содержимое под другим ключом - место на диске не расходуется
+                    self.store_stats["duplicates"] += 1
+                    self.store_stats["bytes_saved"] += entry["size"]
+                    os.remove(incoming)
                 else:
-                    # Используем requests
-                    if use_session and i == 1:
-                        # Для первого метода используем переиспользуемую сессию
-                        session = self.init_session()
-                        response = session.get(method['url'], timeout=30, stream=True, allow_redirects=True)
+                    os.replace(incoming, stored)
+                    self.store_stats["stored"] += 1
+        else:
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            if not self.download_image_to(url, filename, stored, use_session, skip_methods):
+                return False
+            entry = self.pop_digest(stored)
+            served_key = self.get_variant_key(self.pop_served_url(stored, url))
+            with self._store_lock:
+                if served_key != variant_key:
+                    # Резервный метод скачал другой размер (например, 736x вместо originals):
+                    # файл хранится под фактическим вариантом, а не под запрошенным
+                    variant_key = served_key
+                    variant, key = served_key.rsplit('/', 1)
+                    relative = os.path.join(variant, key[:2], key + ext)
+                    served = os.path.join(self.store_folder, relative)
+                    os.makedirs(os.path.dirname(served), exist_ok=True)
+                    if os.path.exists(served) and is_complete_image_file(served):
+                        self.store_stats["duplicates"] += 1
+                        self.store_stats["bytes_saved"] += entry["size"]
+                        os.remove(stored)
                     else:
-                        # Для остальных методов создаем новую сессию с нужными заголовками
-                        session = requests.Session()
-                        session.headers.update(method['headers'])
-                        # Пробуем добавить cookies из браузера, если он открыт
-                        try:
-                            browser_cookies = self.get_browser_cookies()
-                            if browser_cookies:
-                                session.cookies.update(browser_cookies)
-                        except:
-                            pass
-                        response = session.get(method['url'], timeout=30, stream=True, allow_redirects=True)
+                        os.replace(stored, served)
+                        self.store_stats["stored"] += 1
+                    stored = served
+                else:
+                    self.store_stats["stored"] += 1
+        with self._store_lock:
+            self.store_index[variant_key] = {"file": relative, "sha256": entry["sha256"], "size": entry["size"]}
+
+        if os.path.lexists(filepath):
+            os.remove(filepath)
+        method = link_file(stored, filepath)
+        with self._store_lock:
+            self.store_stats["links"][method] = self.store_stats["links"].get(method, 0) + 1
+        self.record_manifest(url, filename, entry)
+        return True
 
-                    response.raise_for_status()
+    def get_store_report(self):
+        """
+        Отчет о дедупликации по всему хранилищу
 
-                    with open(filepath, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-
-                    if i > 1:  # Логируем только если использован не первый метод
-                        print(f"✓ Успешно скачано методом {i}: {filename}")
-                    return True
-            except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 403:
-                    # Продолжаем пробовать следующий метод
-                    continue
-                else:
-                    # Другая HTTP ошибка - пробуем следующий метод
+        Returns:
+            Словарь: files (файлов в хранилище), bytes (их размер), links (ссылок
+            из папок досок), bytes_saved (место, не занятое повторами благодаря ссылкам)
+        """
+        report = {"files": 0, "bytes": 0, "links": 0, "bytes_saved": 0}
+        for root, dirs, files in os.walk(self.store_folder):
+            dirs[:] = [name for name in dirs if name != "incoming"]
+            for name in files:
+                if name == STORE_INDEX_FILENAME or name.endswith((PART_SUFFIX, PART_INFO_SUFFIX)):
                     continue
-            except (urllib.error.HTTPError, urllib.error.URLError) as e:
-                # Ошибка urllib - пробуем следующий метод
-                continue
-            except Exception as e:
-                # Любая другая ошибка - пробуем следующий метод
-                continue
+                stat = os.stat(os.path.join(root, name))
+                report["files"] += 1
+                report["bytes"] += stat.st_size
+                report["links"] += stat.st_nlink - 1
+                report["bytes_saved"] += stat.st_size * max(0, stat.st_nlink - 2)
+        return report
+
+    def format_store_stats(self):
+        """Строка со счетчиками хранилища текущего запуска и отчетом по хранилищу для лога"""
+        stats = self.store_stats
+        report = self.get_store_report()
+        links = ", ".join(f"{name} {count}" for name, count in sorted(stats["links"].items()))
+        return (f"из хранилища без сети {stats['linked']}, новых {stats['stored']}, "
+                f"повторов по содержимому {stats['duplicates']}, сэкономлено {stats['bytes_saved'] / 2 ** 20:.1f} МБ"
+                f" (ссылки: {links or 'нет'}); в хранилище {report['files']} файлов, "
+                f"{report['bytes'] / 2 ** 20:.1f} МБ, повторные ссылки экономят {report['bytes_saved'] / 2 ** 20:.1f} МБ")
+
+    def get_variant_key(self, url):
+        """Ключ файла варианта изображения: размер из URL (originals, 736x, ...) и ключ изображения"""
+        segments = [segment for segment in urlparse(url).path.split('/') if segment]
+        return f"{segments[0] if segments else ''}/{self.get_image_key(url)}"
+
+    def get_image_dimensions(self, url, session=None):
+        """
+        Разрешение изображения из состояния доски или по запросу начала файла
 
-        # Если все методы не сработали
-        short_url = url[:80] + "..." if len(url) > 80 else url
-        print(f"✗ Ошибка при скачивании {short_url} (все {len(methods)} методов не сработали)")
-        return False
+        Returns:
+            Кортеж ((ширина, высота) или None, байт, которые не придется скачивать)
+        """
+        key = self.get_variant_key(url)
+        dimensions = self.image_dimensions.get(key)
+        if dimensions:
+            with self._strategy_lock:
+                self.probe_stats["cached"] += 1
+            return tuple(dimensions), 0
+        dimensions, total = self.probe_image_dimensions(url, session)
+        if dimensions:
+            self.image_dimensions[key] = list(dimensions)
+        return dimensions, max(0, total - self.probe_bytes) if total else 0
+
+    def probe_image_dimensions(self, url, session=None):
+        """
+        Определяет разрешение по первым probe_bytes байтам файла (запрос Range)
+
+        Если маркер размеров JPEG не попал в начало (большие EXIF-данные),
+        запрашивается в 8 раз больший фрагмент.
+
+        Returns:
+            Кортеж ((ширина, высота) или None, полный размер файла или None)
+        """
+        session = session or self.init_session()
+        host = urlparse(url).netloc
+        data, total = b'', None
+        for limit in (self.probe_bytes, self.probe_bytes * 8):
+            self.circuit_breaker.wait(host)
+            _request_bucket.acquire()
+            with self._strategy_lock:
+                self.probe_stats["probed"] += 1
+            try:
+                with session.get(url, headers={'Range': f'bytes=0-{limit - 1}', 'Accept-Encoding': 'identity'},
+                                 timeout=30, stream=True) as response:
+                    if response.status_code not in (200, 206):
+                        return None, None
+                    match = re.search(r'/(\d+)$', response.headers.get('Content-Range', ''))
+                    length = response.headers.get('Content-Length', '')
+                    total = int(match.group(1)) if match else int(length) if length.isdigit() else None
+                    data = b''
+                    for chunk in response.iter_content(chunk_size=8192):
+                        data += chunk
+                        if len(data) >= limit:
+                            break
+            except requests.RequestException:
+                return None, None
+            dimensions = parse_image_dimensions(data)
+            if dimensions or len(data) < limit or not data.startswith(b'\xff\xd8'):
+                return dimensions, total
+        return None, total
+
+    def record_file_dimensions(self, url, filepath):
+        """Запоминает разрешение скачанного файла (начало файла уже в кэше ОС)"""
+        key = self.get_variant_key(url)
+        if key in self.image_dimensions:
+            return
+        try:
+            with open(filepath, 'rb') as f:
+                dimensions = parse_image_dimensions(f.read(self.probe_bytes * 8))
+        except OSError:
+            return
+        if dimensions:
+            self.image_dimensions[key] = list(dimensions)
+
+    def size_outside_limits(self, size, complete=True):
+        """
+        Проверяет размер изображения по min_size_mb/max_size_mb
+
+        Args:
+            size: Размер (байт)
+            complete: Полный размер изображения (иначе - уже полученная часть,
+                для нее проверяется только максимум)
+        """
+        if self.max_size_mb and size > self.max_size_mb * 2 ** 20:
+            return True
+        return bool(complete and self.min_size_mb and size < self.min_size_mb * 2 ** 20)
+
+    def check_expected_size(self, expected_size, position, filepath):
+        """
+        Решение фильтра размера по заголовкам ответа - до чтения тела
+
+        Raises:
+            SizeFilteredError: Размер из Content-Length/Content-Range вне пределов
+        """
+        if expected_size is not None and self.size_outside_limits(expected_size):
+            self.remove_partial(filepath)
+            raise SizeFilteredError(expected_size, expected_size - position)
+
+    def write_response(self, chunks, filepath, offset=0, expected_size=None, started=None):
+        """
+        Пишет тело ответа во временный файл и атомарно переименовывает его в filepath
+
+        Тело пишется в filepath + PART_SUFFIX (при докачке - с позиции offset) по
+        частям в пределах общего ограничения байт в секунду. Если размер не совпал
+        с expected_size, временный файл остается для докачки через Range, а
+        готовое имя не занимается обрезанным файлом. SHA-256 считается по
+        записываемым частям и сохраняется в download_digests (см. pop_digest).
+
+        Raises:
+            SizeFilteredError: Тело вне пределов min_size_mb/max_size_mb (прием прерывается
+                сразу после превышения максимума)
+            IncompleteDownloadError: Получено меньше или больше expected_size байт
+        """
+        part_path = filepath + PART_SUFFIX
+        size = offset
+        digest = self.start_digest(part_path, offset)
+        with open(part_path, 'r+b' if offset else 'wb') as f:
+            f.seek(offset)
+            f.truncate()
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                    _bytes_bucket.acquire(len(chunk))
+                    # Размер не был известен заранее - прерываем, как только превышен максимум
+                    if self.size_outside_limits(size, complete=False):
+                        break
+        if self.size_outside_limits(size, complete=size == expected_size or expected_size is None):
+            self.remove_partial(filepath)
+            raise SizeFilteredError(size, expected_size - size if expected_size else 0)
+        if expected_size is not None and size != expected_size:
+            if size > expected_size:
+                self.remove_partial(filepath)
+            raise IncompleteDownloadError(f"Получено {size} из {expected_size} байт: {os.path.basename(filepath)}")
+        os.replace(part_path, filepath)
+        self.remove_partial(filepath)
+        self.finish_digest(filepath, digest, size, started)
+
+    def start_digest(self, part_path, offset=0):
+        """
+        SHA-256 для потоковой записи файла
+
+        При докачке в хеш сначала добавляется уже сохраненная часть (offset байт
+        файла part_path) - перечитывается только она, а не весь файл.
+        """
+        digest = hashlib.sha256()
+        if offset:
+            with open(part_path, 'rb') as f:
+                remaining = offset
+                while remaining:
+                    block = f.read(min(remaining, 1 << 20))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+        return digest
+
+    def finish_digest(self, filepath, digest, size, started=None):
+        """Сохраняет SHA-256, размер и время скачивания готового файла до записи в манифест"""
+        with self._manifest_lock:
+            self.download_digests[filepath] = {
+                "sha256": digest.hexdigest(),
+                "size": size,
+                "seconds": round(time.time() - started, 3) if started else None,
+            }
+
+    def pop_digest(self, filepath):
+        """
+        SHA-256, размер и время скачивания файла, посчитанные при записи
+
+        Если файл записан не через write_response, хеш считается чтением файла.
+        """
+        with self._manifest_lock:
+            entry = self.download_digests.pop(filepath, None)
+        if entry is None:
+            digest = hashlib.sha256()
+            with open(filepath, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+            entry = {"sha256": digest.hexdigest(), "size": os.path.getsize(filepath), "seconds": None}
+        return entry
+
+    def record_manifest(self, url, filename, entry):
+        """
+        Дописывает скачанное изображение в манифест доски (MANIFEST_FILENAME)
+
+        Строка пишется сразу после скачивания, поэтому манифест прерванного
+        запуска содержит все готовые файлы. Проверка и поиск повторов по
+        манифесту не требуют повторного чтения файлов.
+        """
+        entry = dict(entry, key=self.get_image_key(url), file=filename, url=url,
+                     completed=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._manifest_lock:
+                with open(os.path.join(self.download_folder, MANIFEST_FILENAME), 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"Ошибка записи манифеста: {e}")
+        return entry
+
+    def load_manifest(self, folder=None):
+        """
+        Читает манифест доски
+
+        Returns:
+            Словарь: ключ изображения -> последняя запись манифеста
+        """
+        manifest = {}
+        path = os.path.join(folder or self.download_folder, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return manifest
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Строка, оборванная при аварийном завершении
+                manifest[entry.get("key")] = entry
+        return manifest
 
     def get_filename_from_url(self, url, index, filename_template=None):
         """
@@ -1265,6 +3344,8 @@ class PinterestParser:
                 - {index04} - номер с ведущими нулями (0001, 0002, ...)
                 - {hash} - хэш URL (первые 8 символов)
                 - {url_hash} - полный хэш URL
+                - {pin_id} - ID пина (если неизвестен - ключ изображения)
+                - {img_key} - ключ изображения из пути pinimg.com (не зависит от позиции на доске)
 
         Returns:
             Имя файла
@@ -1281,6 +3362,8 @@ class PinterestParser:
             filename = filename.replace('{index04}', f"{index:04d}")
             filename = filename.replace('{hash}', url_hash_short)
             filename = filename.replace('{url_hash}', url_hash)
+            filename = filename.replace('{pin_id}', self.pin_id_by_url.get(url) or self.get_image_key(url))
+            filename = filename.replace('{img_key}', self.get_image_key(url))
 
             # Очищаем имя файла от недопустимых символов для Windows
             filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
@@ -1335,7 +3418,7 @@ class PinterestParser:
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
                 }
 
-                response = requests.get(url, headers=headers, allow_redirects=True, timeout=10)
+                response = create_http_session().get(url, headers=headers, allow_redirects=True, timeout=10)
                 final_url = response.url
 
                 print(f"Полная ссылка: {final_url}")
@@ -1436,27 +3519,416 @@ class PinterestParser:
             pass
         return None
 
-    def parse_pinterest_url(self, url, max_images=None, auto_subfolder=True):
+    def get_board_path_from_url(self, url):
         """
-        Основной метод для парсинга Pinterest URL
+        Извлекает имя пользователя и slug доски из URL
 
         Args:
-            url: URL доски или страницы Pinterest (поддерживает короткие ссылки pin.it)
-            max_images: Максимальное количество изображений для скачивания (None = все)
-            auto_subfolder: Автоматически создавать подпапку по названию доски
+            url: URL доски Pinterest
+
+        Returns:
+            Кортеж (username, slug) или None, если URL не похож на доску
         """
-        # Преобразуем короткую ссылку в полную, если необходимо
-        url = self.expand_short_url(url)
+        parsed = urlparse(url)
+        if 'pinterest.' not in parsed.netloc.lower():
+            return None
 
-        # Автоматическое создание подпапки по названию доски
-        original_folder = self.download_folder
-        if auto_subfolder:
-            board_name = self.get_board_name_from_url(url)
-            if board_name:
-                self.download_folder = os.path.join(original_folder, board_name)
-                self.setup_download_folder()
-                print(f"Создана подпапка: {self.download_folder}")
+        parts = [unquote(part) for part in parsed.path.split('/') if part]
+        if len(parts) < 2:
+            return None
+
+        username, slug = parts[0], parts[1]
+        if username.lower() in ('pin', 'search', 'ideas', 'today', 'resource') or \
+                slug.lower() in ('pin', '_saved', '_created', 'pins', '_tools'):
+            return None
+        return username, slug
+
+    def init_api_session(self):
+        """Инициализирует сессию requests для JSON-ресурсов Pinterest"""
+        if self.api_session is None:
+            self.api_session = create_http_session(self.get_pool_size(), {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'application/json, text/javascript, */*; q=0.01',
+                'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
+                'X-Requested-With': 'XMLHttpRequest',
+                'X-Pinterest-AppState': 'active',
+            })
+        return self.api_session
+
+    def get_resource(self, base_url, resource, options, source_url):
+        """
+        Выполняет запрос к JSON-ресурсу Pinterest (/resource/<Name>/get/)
+
+        Args:
+            base_url: Адрес сайта (https://www.pinterest.com или локальный сервер)
+            resource: Имя ресурса, например BoardFeedResource
+            options: Словарь options запроса
+            source_url: Путь страницы, от имени которой выполняется запрос
+
+        Returns:
+            Словарь resource_response из ответа
+        """
+        session = self.init_api_session()
+        params = {
+            'source_url': source_url,
+            'data': json.dumps({'options': options, 'context': {}}, separators=(',', ':')),
+            '_': str(int(time.time() * 1000)),
+        }
+        response = session.get(f"{base_url}/resource/{resource}/get/", params=params,
+                               headers={'X-Pinterest-Source-Url': source_url}, timeout=30)
+        response.raise_for_status()
+        return response.json().get('resource_response') or {}
+
+    def get_pin_image_url(self, pin):
+        """
+        Возвращает URL изображения нужного качества для пина из JSON-ответа
+
+        Args:
+            pin: Словарь пина из ответа Pinterest
+
+        Returns:
+            URL изображения или None
+        """
+        images = pin.get('images') or {}
+        for key in ('orig', '736x', '564x', '474x', '236x'):
+            image = images.get(key)
+            if image and image.get('url'):
+                return self.get_full_image_url(image['url'], self.image_quality)
+        return None
+
+    def add_feed_pin_urls(self, pins, image_urls, seen_urls):
+        """
+        Добавляет URL изображений пинов из страницы ленты, сохраняя порядок
+
+        Args:
+            pins: Список data из ответа ресурса ленты
+            image_urls: Список собранных URL (дополняется)
+            seen_urls: Множество уже собранных URL (дополняется)
+        """
+        for pin in pins or []:
+            if not isinstance(pin, dict) or pin.get('type', 'pin') != 'pin':
+                continue
+            image_url = self.get_pin_image_url(pin)
+            if image_url and image_url not in seen_urls:
+                if pin.get('id'):
+                    self.pin_id_by_url[image_url] = str(pin['id'])
+                seen_urls.add(image_url)
+                image_urls.append(image_url)
+
+    def parse_initial_state(self, html, url=None):
+        """
+        Разбирает встроенное в страницу доски состояние (JSON в <script type="application/json">)
+
+        Извлекаются только теги script: через lxml (XPath по дереву, построенному
+        на C), а без lxml - BeautifulSoup с SoupStrainer. Первая порция пинов - самый длинный список пинов, предпочтительно из
+        ресурса ленты доски (NETWORK_FEED_RESOURCES), bookmark - из того же объекта.
 
+        Args:
+            html: HTML страницы
+            url: URL доски (для выбора объекта доски, если их несколько)
+
+        Returns:
+            Словарь: pins (список пинов в порядке доски), bookmark, board_id, pin_count
+        """
+        state = {"pins": [], "bookmark": None, "board_id": None, "pin_count": None}
+        board_path = self.get_board_path_from_url(url) if url else None
+        board_url = f"/{board_path[0]}/{board_path[1]}/" if board_path else None
+        in_feed_found = False
+        if HAS_LXML:
+            scripts = lxml.html.fromstring(html).xpath('//script[@type="application/json"]/text()')
+        else:
+            soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("script", type="application/json"))
+            scripts = [script.string or "" for script in soup.find_all("script")]
+        for text in scripts:
+            try:
+                data = json.loads(text)
+            except ValueError:
+                continue
+            stack = [(data, False)]
+            while stack:
+                node, in_feed = stack.pop()
+                if isinstance(node, list):
+                    stack.extend((item, in_feed) for item in node if isinstance(item, (dict, list)))
+                    continue
+                if node.get('type') == 'board' and 'pin_count' in node:
+                    if state["board_id"] is None or (board_url and unquote(node.get('url') or '') == board_url):
+                        state["board_id"], state["pin_count"] = node.get('id'), node.get('pin_count')
+                for key, value in node.items():
+                    if key == 'BoardContentRecommendationResource':
+                        continue  # Раздел похожих пинов
+                    child_in_feed = in_feed or key in NETWORK_FEED_RESOURCES
+                    if (isinstance(value, list) and value and isinstance(value[0], dict) and
+                            value[0].get('type') == 'pin' and value[0].get('images')):
+                        # Список ленты доски важнее любого другого списка пинов
+                        if (child_in_feed, len(value)) > (in_feed_found, len(state["pins"])):
+                            state["pins"] = value
+                            state["bookmark"] = node.get('nextBookmark') or node.get('bookmark')
+                            in_feed_found = child_in_feed
+                    elif isinstance(value, (dict, list)):
+                        stack.append((value, child_in_feed))
+        return state
+
+    def read_initial_state(self, url, seen_urls=None):
+        """
+        Первая порция пинов и количество пинов из встроенного состояния открытой страницы
+
+        Вызывается один раз сразу после driver.get, до ожидания и прокрутки.
+        Количество пинов сохраняется в expected_pin_count, состояние - в initial_state.
+
+        Args:
+            url: URL доски
+            seen_urls: Множество уже собранных URL (дополняется)
+
+        Returns:
+            Кортеж (URL первой порции в порядке доски, порция содержит всю доску)
+        """
+        image_urls = []
+        try:
+            self.initial_state = self.parse_initial_state(self.driver.page_source, url)
+        except Exception as e:
+            print(f"Не удалось разобрать состояние страницы: {e}")
+            self.initial_state = None
+            return image_urls, False
+        state = self.initial_state
+        self.add_feed_pin_urls(state["pins"], image_urls, seen_urls if seen_urls is not None else set())
+        if state["pin_count"]:
+            self.expected_pin_count = state["pin_count"]
+        complete = bool(image_urls) and (state["bookmark"] == '-end-' or
+                                         bool(state["pin_count"] and len(image_urls) >= state["pin_count"]))
+        if image_urls or state["pin_count"]:
+            print(f"Состояние страницы: первая порция {len(image_urls)} пинов" +
+                  (f", на доске {state['pin_count']}" if state["pin_count"] else "") +
+                  (" (вся доска)" if complete else ""))
+        return image_urls, complete
+
+    def iter_board_feed_urls(self, url, max_images=None):
+        """
+        Отдает URL изображений доски без браузера через JSON-ресурсы Pinterest
+
+        Постранично запрашивает BoardFeedResource, следуя bookmark, пока лента
+        не закончится или не будет собрано max_images изображений.
+        Ошибки запросов пробрасываются вызывающему коду. feed_complete
+        устанавливается, если лента прочитана до конца (bookmark "-end-" или
+        собраны все pin_count пинов доски).
+
+        Args:
+            url: URL доски Pinterest
+            max_images: Максимальное количество изображений (None = все)
+
+        Yields:
+            URL изображения в порядке доски
+        """
+        self.feed_complete = False
+        board_path = self.get_board_path_from_url(url)
+        if not board_path:
+            return
+
+        username, slug = board_path
+        parsed = urlparse(url)
+        base_url = (self.api_base_url or f"{parsed.scheme}://{parsed.netloc}").rstrip('/')
+        source_url = f"/{username}/{slug}/"
+
+        print(f"Запрашиваю ленту доски без браузера: {source_url}")
+        board = self.get_resource(base_url, 'BoardResource',
+                                  {'username': username, 'slug': slug, 'field_set_key': 'detailed'},
+                                  source_url).get('data') or {}
+        board_id = board.get('id')
+        if not board_id:
+            print("Не удалось получить id доски")
+            return
+        self.expected_pin_count = board.get('pin_count')
+
+        collected_count = 0
+        seen_urls = set()
+        bookmark = None
+        for page in range(self.api_max_pages):
+            options = {'board_id': board_id, 'board_url': source_url,
+                       'page_size': self.api_page_size, 'field_set_key': 'react_grid_pin'}
+            if bookmark:
+                options['bookmarks'] = [bookmark]
+
+            response = self.get_resource(base_url, 'BoardFeedResource', options, source_url)
+            page_urls = []
+            self.add_feed_pin_urls(response.get('data'), page_urls, seen_urls)
+            for image_url in page_urls:
+                yield image_url
+                collected_count += 1
+                if max_images and max_images > 0 and collected_count >= max_images:
+                    return
+
+            bookmark = response.get('bookmark')
+            if (not bookmark or bookmark == '-end-' or
+                    (self.expected_pin_count and collected_count >= self.expected_pin_count)):
+                self.feed_complete = True
+                break
+            print(f"Страница ленты {page + 1} | Найдено: {collected_count}")
+        else:
+            print(f"Достигнуто ограничение страниц ленты ({self.api_max_pages}), лента прочитана не полностью")
+
+    def fetch_board_feed_urls(self, url, max_images=None):
+        """
+        Получает URL изображений доски без браузера через JSON-ресурсы Pinterest
+
+        Args:
+            url: URL доски Pinterest
+            max_images: Максимальное количество изображений (None = все)
+
+        Returns:
+            Список URL изображений в порядке доски или None, если ресурс недоступен
+        """
+        try:
+            image_urls = list(self.iter_board_feed_urls(url, max_images=max_images))
+        except Exception as e:
+            print(f"Лента доски недоступна без браузера: {e}")
+            return None
+        print(f"Найдено {len(image_urls)} изображений через ленту доски")
+        return image_urls
+
+    def read_network_feed_pages(self):
+        """
+        Читает из журнала производительности Chrome ответы ресурсов ленты пинов
+
+        Тела ответов запрашиваются через CDP (Network.getResponseBody) после
+        завершения загрузки. Журнал при чтении очищается.
+
+        Returns:
+            Список кортежей (pins, bookmark) в порядке завершения запросов
+        """
+        pages = []
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return pages
+
+        for entry in entries:
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                response_url = params.get('response', {}).get('url', '')
+                if any(f"/resource/{name}/get/" in response_url for name in NETWORK_FEED_RESOURCES):
+                    self._pending_feed_requests.add(params.get('requestId'))
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self._pending_feed_requests:
+                request_id = params['requestId']
+                self._pending_feed_requests.discard(request_id)
+                try:
+                    body = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+                    text = body.get('body', '')
+                    if body.get('base64Encoded'):
+                        text = base64.b64decode(text).decode('utf-8')
+                    resource_response = json.loads(text).get('resource_response') or {}
+                    pages.append((resource_response.get('data'), resource_response.get('bookmark')))
+                except Exception:
+                    continue
+            elif method == 'Network.loadingFailed':
+                self._pending_feed_requests.discard(params.get('requestId'))
+
+        return pages
+
+    def iter_network_feed_urls(self, max_images=None, max_scrolls=500):
+        """
+        Отдает пины из сетевых ответов ленты за один проход прокрутки вниз
+
+        Виртуализированная сетка Pinterest удаляет из DOM прокрученные пины, но
+        каждый пин один раз приходит в JSON-ответе ленты. Поэтому повторные проходы
+        сверху вниз не нужны: первая порция берется из DOM, остальные - из ответов.
+        Если ни одного ответа ленты не получено, прокрутка прекращается после первой
+        порции (вызывающий код переключается на сбор из DOM).
+
+        Args:
+            max_images: Максимальное количество изображений (None = все)
+            max_scrolls: Ограничение количества прокруток
+
+        Yields:
+            URL изображения в порядке доски
+        """
+        limited = bool(max_images and max_images > 0)
+        seen_urls = set()
+        collected_count = 0
+
+        # Первая порция пинов встроена в страницу и не проходит через XHR
+        for image_url in self.collect_new_image_urls(seen_urls):
+            yield image_url
+            collected_count += 1
+            if limited and collected_count >= max_images:
+                return
+
+        print(f"Сбор пинов из сетевых ответов ленты (первая порция: {collected_count})...")
+        last_height = self.driver.execute_script("return document.body.scrollHeight")
+        no_new_content_count = 0
+        feed_pages = 0
+        end_of_feed = False
+
+        for scroll_count in range(1, max_scrolls + 1):
+            before_scroll = self.get_page_state()
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            self.wait_until_ready("прокрутка", max(1.0, self.scroll_delay * 0.8), grow_from=before_scroll)
+
+            for pins, bookmark in self.read_network_feed_pages():
+                feed_pages += 1
+                page_urls = []
+                self.add_feed_pin_urls(pins, page_urls, seen_urls)
+                for image_url in page_urls:
+                    yield image_url
+                    collected_count += 1
+                    if limited and collected_count >= max_images:
+                        return
+                if bookmark == '-end-':
+                    end_of_feed = True
+
+            print(f"Прокрутка {scroll_count} | Ответов ленты: {feed_pages} | Найдено: {collected_count}")
+
+            if end_of_feed:
+                print("Достигнут конец ленты доски")
+                break
+
+            new_height = self.driver.execute_script("return document.body.scrollHeight")
+            if new_height == last_height:
+                no_new_content_count += 1
+                if no_new_content_count >= 3:
+                    print("Достигнут конец доски (нет нового контента)")
+                    break
+            else:
+                no_new_content_count = 0
+            last_height = new_height
+
+            # Без ответов ленты дальнейшая прокрутка в этом режиме бесполезна
+            if feed_pages == 0 and scroll_count >= 3:
+                break
+
+        self.network_feed_pages_seen = feed_pages
+        print(f"Найдено {collected_count} изображений из сетевых ответов ленты")
+
+    def scroll_and_capture_network(self, max_images=None, max_scrolls=500):
+        """
+        Собирает пины из сетевых ответов ленты за один проход прокрутки вниз
+
+        Args:
+            max_images: Максимальное количество изображений (None = все)
+            max_scrolls: Ограничение количества прокруток
+
+        Returns:
+            Список URL изображений в порядке доски (пустой, если ответов ленты не было)
+        """
+        self.network_feed_pages_seen = 0
+        image_urls = list(self.iter_network_feed_urls(max_images=max_images, max_scrolls=max_scrolls))
+        return image_urls if self.network_feed_pages_seen else []
+
+    def iter_browser_image_urls(self, url, max_images=None):
+        """
+        Отдает URL изображений через Selenium по мере прокрутки страницы в браузере
+
+        Args:
+            url: URL доски или страницы Pinterest
+            max_images: Максимальное количество изображений (None = все)
+
+        Yields:
+            URL изображения в порядке доски
+        """
         try:
             if not self.driver:
                 self.init_driver()
@@ -1464,6 +3936,10 @@ class PinterestParser:
             print(f"\nКритическая ошибка: {e}")
             return
 
+        # Сбрасываем сетевой журнал предыдущей страницы
+        if self.discovery_mode == "network":
+            self.read_network_feed_pages()
+
         print(f"Открываю страницу: {url}")
         try:
             self.driver.get(url)
@@ -1471,109 +3947,579 @@ class PinterestParser:
             print(f"Ошибка при открытии страницы: {e}")
             return
 
-        # Ждем загрузки страницы
-        time.sleep(5)
+        limited = bool(max_images and max_images > 0)
+        seen_urls = set()  # Обнаруженные URL (в том числе первой порции сверх max_images)
+        yielded = 0  # Отданные URL - по ним проверяется max_images
+        self.wait_stats = {}
+
+        # Первая порция пинов из встроенного состояния - без ожидания и прокрутки
+        self.expected_pin_count = None
+        initial_urls, complete = self.read_initial_state(url, seen_urls)
+        for image_url in initial_urls[:max_images] if limited else initial_urls:
+            yield image_url
+            yielded += 1
+        if complete or (limited and yielded >= max_images):
+            return
+
+        # Ждем первых пинов и затихания сети (не дольше прежних 5 секунд)
+        self.wait_until_ready("загрузка страницы", 5, min_pins=1)
+        # Количество пинов задает бюджет прокруток и условие остановки
+        if self.expected_pin_count is None:
+            self.probe_pin_count()
+
+        # Сбор пинов из сетевых ответов ленты за один проход вниз
+        if self.discovery_mode == "network":
+            self.network_feed_pages_seen = 0
+            for image_url in self.iter_network_feed_urls(max_images=max_images):
+                if image_url in seen_urls:
+                    continue
+                seen_urls.add(image_url)
+                yield image_url
+                yielded += 1
+                if limited and yielded >= max_images:
+                    return
+            if self.network_feed_pages_seen:
+                return
+            print("Сетевые ответы ленты не получены, использую сбор из DOM...")
+
+        # Прокручиваем страницу и отдаем изображения по мере обнаружения
+        for image_url in self.iter_scroll_images(max_images=max_images):
+            if image_url not in seen_urls:
+                seen_urls.add(image_url)
+                yield image_url
+                yielded += 1
+                if limited and yielded >= max_images:
+                    return
+
+        # Если во время прокрутки собрано меньше запрошенного, пробуем еще раз (только
+        # с лимитом и если на доске есть еще пины). Пины этого прохода получают номера
+        # после уже отданных, между собой - в порядке доски
+        # Без найденных при прокрутке пинов - только извлечение со страницы
+        if yielded:
+            if not limited or yielded >= max_images:
+                return
+            if self.expected_pin_count and yielded >= self.expected_pin_count:
+                return
+            print(f"Внимание: найдено только {yielded} изображений из запрошенных {max_images}")
+            print("Попытка собрать больше изображений...")
+            # Пробуем еще раз прокрутить и собрать
+            self.driver.execute_script("window.scrollTo(0, 0);")
+            self.wait_until_ready("повторный проход", 3)
+
+            # Оптимизированная прокрутка для загрузки всех изображений
+            for i in range(5):
+                scroll_pos = 800 * (i + 1)
+                self.driver.execute_script(f"window.scrollTo(0, {scroll_pos});")
+                self.wait_until_ready("повторный проход", 0.8)
+
+            # Возвращаемся в начало
+            self.driver.execute_script("window.scrollTo(0, 0);")
+            self.wait_until_ready("повторный проход", 3)
+
+        # Повторное извлечение (полный проход со стандартной прокруткой)
+        for image_url in self.extract_image_urls(max_images=None):
+            if image_url not in seen_urls:
+                seen_urls.add(image_url)
+                yield image_url
+                yielded += 1
+                if limited and yielded >= max_images:
+                    return
+
+    def discover_image_urls_with_browser(self, url, max_images=None):
+        """
+        Собирает URL изображений через Selenium (прокрутка страницы в браузере)
 
-        # Прокручиваем страницу для загрузки изображений
-        # Если указано ограничение, прокручиваем только до нужного количества
-        self.scroll_and_load_images(max_images=max_images)
+        Args:
+            url: URL доски или страницы Pinterest
+            max_images: Максимальное количество изображений (None = все)
 
-        # Извлекаем URL изображений (с ограничением max_images, если указано)
-        image_urls = self.extract_image_urls(max_images=max_images)
+        Returns:
+            Список URL изображений в правильном порядке (пустой при ошибке)
+        """
+        return list(self.iter_browser_image_urls(url, max_images=max_images))
+
+    def iter_image_urls(self, url, max_images=None):
+        """
+        Отдает URL изображений доски по мере обнаружения выбранным способом поиска
+
+        Сначала (режимы auto и api) используется лента доски без браузера, затем
+        при необходимости - браузер. Дубликаты отбрасываются, порядок сохраняется.
+
+        Args:
+            url: URL доски или страницы Pinterest
+            max_images: Максимальное количество изображений (None = все)
+
+        Yields:
+            URL изображения в порядке доски
+        """
+        limited = bool(max_images and max_images > 0)
+        seen_urls = set()
+
+        # Сначала пробуем получить ленту доски без браузера
+        if self.discovery_mode in ("auto", "api"):
+            try:
+                for image_url in self.iter_board_feed_urls(url, max_images=max_images):
+                    if image_url not in seen_urls:
+                        seen_urls.add(image_url)
+                        yield image_url
+            except Exception as e:
+                self.feed_complete = False
+                print(f"Лента доски недоступна без браузера: {e}")
+
+            if seen_urls:
+                print(f"Найдено {len(seen_urls)} изображений через ленту доски")
+            # Лента закончилась (в том числе на доске меньше max_images пинов) - браузер не нужен
+            if seen_urls and (self.feed_complete or (limited and len(seen_urls) >= max_images)):
+                return
+            if self.discovery_mode == "api":
+                if not seen_urls:
+                    print("Не удалось получить изображения через ленту доски")
+                else:
+                    print(f"Внимание: лента доски прервана, доска собрана не полностью ({len(seen_urls)} изображений)")
+                return
+            if seen_urls:
+                print("Лента доски прервана до конца - дособираю изображения через браузер...")
+
+        # Если не получилось - собираем изображения через браузер
+        for image_url in self.iter_browser_image_urls(url, max_images=max_images):
+            if image_url not in seen_urls:
+                seen_urls.add(image_url)
+                yield image_url
+                if limited and len(seen_urls) >= max_images:
+                    return
+
+    def get_image_key(self, url):
+        """
+        Возвращает ключ изображения из пути pinimg.com
+
+        Ключ - имя файла без расширения (например, 1a2b3c4d...), оно одинаково
+        для всех размеров (236x, 736x, originals) и не зависит от позиции пина.
+        """
+        return os.path.splitext(os.path.basename(urlparse(url).path))[0]
+
+    def get_pin_key(self, url):
+        """
+        Возвращает идентификатор пина для URL изображения
+
+        ID пина известен, если URL получен из DOM или ленты; иначе используется
+        ключ изображения.
+        """
+        return self.pin_id_by_url.get(url) or self.get_image_key(url)
 
-        if not image_urls:
-            print("Не найдено изображений на странице")
+    def load_board_state(self, url):
+        """
+        Загружает состояние доски из BOARD_STATE_FILENAME в папке скачивания
+
+        Args:
+            url: URL доски (ключ состояния)
+
+        Returns:
+            Множество известных пинов доски
+        """
+        state_path = os.path.join(self.download_folder, BOARD_STATE_FILENAME)
+        self.board_state = {"boards": {}}
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    self.board_state = json.load(f)
+            except Exception as e:
+                print(f"Не удалось прочитать состояние доски: {e}")
+        self.board_state.setdefault("boards", {})
+
+        board_path = self.get_board_path_from_url(url)
+        self.board_state_key = "/{}/{}/".format(*board_path) if board_path else urlparse(url).path
+        board = self.board_state["boards"].get(self.board_state_key) or {}
+        self.known_pin_keys = set(board.get("pins") or [])
+        self.downloaded_files = dict(board.get("files") or {})
+        self._file_owners = {filename: key for key, filename in self.downloaded_files.items()}
+        self.previous_board_order = list(board.get("order") or [])
+        self.board_order = []
+        self.image_dimensions = dict(board.get("dimensions") or {})
+        return self.known_pin_keys
+
+    def save_board_state(self):
+        """Сохраняет известные пины текущей доски в BOARD_STATE_FILENAME"""
+        if self.board_state is None or not self.board_state_key:
             return
+        board = self.board_state["boards"].setdefault(self.board_state_key, {})
+        board["pins"] = sorted(self.known_pin_keys)
+        board["files"] = self.downloaded_files
+        board["order"] = self.get_board_order()
+        board["dimensions"] = self.image_dimensions
+        board["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        state_path = os.path.join(self.download_folder, BOARD_STATE_FILENAME)
+        try:
+            with open(state_path, 'w', encoding='utf-8') as f:
+                json.dump(self.board_state, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Ошибка сохранения состояния доски: {e}")
 
-        # Если указано ограничение и собрано меньше, чем нужно, пробуем еще раз
-        if max_images and max_images > 0:
-            if len(image_urls) < max_images:
-                print(f"Внимание: найдено только {len(image_urls)} изображений из запрошенных {max_images}")
-                print("Попытка собрать больше изображений...")
-                # Пробуем еще раз прокрутить и собрать
-                self.driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(3)
+    def get_board_order(self):
+        """
+        Возвращает ключи изображений доски в порядке доски
 
-                # Оптимизированная прокрутка для загрузки всех изображений
-                for i in range(5):  # Уменьшено с 8 до 5 итераций
-                    scroll_pos = 800 * (i + 1)  # Увеличено расстояние для меньшего количества итераций
-                    self.driver.execute_script(f"window.scrollTo(0, {scroll_pos});")
-                    time.sleep(0.8)  # Уменьшена задержка с 1.2 до 0.8
+        Пины текущего запуска идут первыми (новые пины появляются в начале доски),
+        за ними - остальные пины из предыдущих запусков.
+        """
+        current = set(self.board_order)
+        return self.board_order + [key for key in self.previous_board_order if key not in current]
 
-                # Возвращаемся в начало
-                self.driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(3)
-
-                # Повторное извлечение (без ограничения для сбора всех доступных)
-                additional_urls = self.extract_image_urls(max_images=None)
-                # Объединяем и удаляем дубликаты, сохраняя порядок
-                seen = set(image_urls)
-                all_urls = list(image_urls)  # Начинаем с уже собранных
-                for url in additional_urls:
-                    if url not in seen:
-                        seen.add(url)
-                        all_urls.append(url)
-
-                # Ограничиваем до max_images
-                image_urls = all_urls[:max_images] if len(all_urls) >= max_images else all_urls
-                print(f"После повторного сбора: найдено {len(image_urls)} изображений")
-
-        print(f"\nНачинаю скачивание {len(image_urls)} изображений...")
-
-        # Инициализируем сессию для переиспользования
-        self.init_session()
-
-        downloaded = 0
-        failed = 0
-        skipped = 0
-
-        # Подготавливаем список задач для скачивания
-        download_tasks = []
-        for index, img_url in enumerate(image_urls, 1):
-            filename = self.get_filename_from_url(img_url, index)
+    def find_downloaded_file(self, url):
+        """
+        Ищет уже скачанный файл изображения по ключу изображения, а не по имени файла
+
+        Returns:
+            Имя существующего файла или None
+        """
+        filename = self.downloaded_files.get(self.get_image_key(url))
+        if filename and os.path.exists(os.path.join(self.download_folder, filename)):
+            return filename
+        return None
+
+    def record_downloaded_file(self, url, filename):
+        """Запоминает имя файла, под которым скачано изображение"""
+        key = self.get_image_key(url)
+        self.downloaded_files[key] = filename
+        self._file_owners[filename] = key
+
+    def resolve_download_filename(self, url, filename):
+        """
+        Проверяет, скачано ли изображение, и выбирает свободное имя файла
+
+        Изображение считается скачанным, если файл записан для его ключа (даже
+        под другим именем - например, после сдвига номеров на доске). Если имя
+        занято файлом другого изображения, к имени добавляется ключ изображения.
+        Файл без записи в состоянии доски считается скачанным (прежние запуски).
+        Обрезанный файл (is_complete_image_file) скачанным не считается.
+
+        Args:
+            url: URL изображения
+            filename: Имя файла по шаблону
+
+        Returns:
+            Кортеж (имя файла, уже скачано)
+        """
+        existing = self.find_downloaded_file(url)
+        if existing:
+            if is_complete_image_file(os.path.join(self.download_folder, existing)):
+                return existing, True
+            return existing, False
+
+        key = self.get_image_key(url)
+        filepath = os.path.join(self.download_folder, filename)
+        if os.path.exists(filepath):
+            owner = self._file_owners.get(filename)
+            if owner is None or owner == key:
+                return filename, is_complete_image_file(filepath)
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}_{key}{ext}"
             filepath = os.path.join(self.download_folder, filename)
+            return filename, os.path.exists(filepath) and is_complete_image_file(filepath)
+        return filename, False
 
-            # Проверяем, не скачано ли уже это изображение
-            if os.path.exists(filepath):
-                skipped += 1
-                print(f"[{index}/{len(image_urls)}] Пропущено (уже существует): {filename}")
+    def link_sequential_names(self, subfolder="ordered"):
+        """
+        Создает в подпапке ссылки на скачанные файлы с порядковыми именами
+
+        Имена скачанных файлов не зависят от позиции на доске, поэтому порядковые
+        имена (0001_<ключ>.jpg, ...) создаются отдельно по сохраненному порядку
+        доски. Подпапка пересоздается при каждом вызове. Используются жесткие
+        ссылки (или другие способы link_file; в крайнем случае - копии).
+
+        Args:
+            subfolder: Имя подпапки внутри папки доски
+
+        Returns:
+            Количество созданных файлов
+        """
+        target_folder = os.path.join(self.download_folder, subfolder)
+        if os.path.isdir(target_folder):
+            shutil.rmtree(target_folder)
+        os.makedirs(target_folder)
+
+        index = 0
+        for key in self.get_board_order():
+            filename = self.downloaded_files.get(key)
+            source = os.path.join(self.download_folder, filename) if filename else None
+            if not source or not os.path.exists(source):
                 continue
+            index += 1
+            target = os.path.join(target_folder, f"{index:04d}_{key}{os.path.splitext(filename)[1]}")
+            link_file(source, target)
+        print(f"Создано {index} файлов с порядковыми именами: {target_folder}")
+        return index
 
-            download_tasks.append((index, img_url, filename))
+    def mark_pin_known(self, url):
+        """Запоминает пин как скачанный (вызывается после успешного скачивания или пропуска)"""
+        self.known_pin_keys.add(self.get_pin_key(url))
 
-        # Параллельное скачивание с использованием ThreadPoolExecutor
-        if download_tasks:
-            print(f"Скачиваю {len(download_tasks)} изображений параллельно (до {self.max_workers} потоков)...")
+    def filter_known_pins(self, image_urls, max_images=None):
+        """
+        Отдает только новые пины и прекращает поиск на уже известной части доски
 
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Запускаем задачи
-                future_to_task = {
-                    executor.submit(self.download_image, img_url, filename): (index, filename, img_url)
-                    for index, img_url, filename in download_tasks
-                }
+        Новые пины появляются в начале доски, поэтому после sync_known_run
+        известных пинов подряд остаток доски уже скачан. Выход из цикла закрывает
+        исходный генератор, и прокрутка страницы прекращается.
 
-                # Обрабатываем результаты по мере завершения
-                for future in as_completed(future_to_task):
-                    index, filename, img_url = future_to_task[future]
-                    try:
-                        success = future.result()
-                        if success:
-                            downloaded += 1
-                            print(f"[{index}/{len(image_urls)}] ✓ Успешно скачано: {filename}")
-                        else:
-                            failed += 1
-                            print(f"[{index}/{len(image_urls)}] ✗ Ошибка скачивания: {filename}")
-                    except Exception as e:
-                        failed += 1
-                        print(f"[{index}/{len(image_urls)}] ✗ Исключение при скачивании {filename}: {e}")
+        Args:
+            image_urls: Итератор URL изображений в порядке доски
+            max_images: Максимальное количество новых изображений (None = все)
+
+        Yields:
+            URL нового изображения
+        """
+        known_run = 0
+        new_count = 0
+        for image_url in image_urls:
+            if self.get_pin_key(image_url) in self.known_pin_keys:
+                known_run += 1
+                if known_run >= self.sync_known_run:
+                    print(f"Найдено {known_run} известных пинов подряд - новых пинов больше нет")
+                    break
+                continue
+
+            known_run = 0
+            yield image_url
+            new_count += 1
+            if max_images and max_images > 0 and new_count >= max_images:
+                break
+        print(f"Новых пинов: {new_count}")
+
+    def record_size_filtered(self, url, filename, error):
+        """Учитывает изображение, пропущенное по размеру (SizeFilteredError)"""
+        with self._strategy_lock:
+            self.size_filtered[url] = error
+            self.size_filter_stats["skipped"] += 1
+            self.size_filter_stats["bytes_saved"] += error.bytes_saved
+        print(f"⏭ Пропущено ({error}): {filename}")
+
+    def pop_size_filtered(self, url):
+        """SizeFilteredError, если download_image пропустил изображение по размеру или разрешению, иначе None"""
+        with self._strategy_lock:
+            return self.size_filtered.pop(url, None)
+
+    def format_size_filter_stats(self):
+        """Строка со счетчиками фильтра размера для лога"""
+        stats = self.size_filter_stats
+        return f"пропущено {stats['skipped']}, не скачано {stats['bytes_saved'] / 2 ** 20:.1f} МБ"
+
+    def run_deferred_retries(self, task):
+        """
+        Повторный проход для изображений, отложенных после временных ошибок
+
+        Выполняется после основного прохода в deferred_retry_workers потоках
+        (пауза автомата хоста к этому времени обычно уже закончилась).
+        Повторяются только изображения текущей папки доски; не скачанные при
+        повторе больше не откладываются.
+
+        Args:
+            task: Функция task(url, filename) скачивания одного изображения
+
+        Returns:
+            Количество повторенных изображений
+        """
+        with self._strategy_lock:
+            deferred = [(url, filename) for url, (filename, folder) in self.deferred_downloads.items()
+                        if folder == self.download_folder]
+            self.deferred_downloads.clear()
+        if not deferred or not self.deferred_retry:
+            return 0
+        print(f"Повторный проход: {len(deferred)} изображений после временных ошибок "
+              f"({self.deferred_retry_workers} потока)...")
+        self.deferring = False
+        try:
+            with ThreadPoolExecutor(max_workers=self.deferred_retry_workers) as executor:
+                list(executor.map(lambda item: task(*item), deferred))
+        finally:
+            self.deferring = True
+        return len(deferred)
+
+    def download_stream(self, image_urls):
+        """
+        Скачивает изображения по мере их поступления из итератора URL
+
+        Скачивание начинается сразу, пока продолжается прокрутка: URL передаются
+        в пул потоков (или AsyncDownloadEngine при download_backend = "async")
+        через ограниченную очередь (download_queue_size). Количество одновременных
+        скачиваний подбирает ConcurrencyController (adaptive_concurrency). Номер
+        в имени файла соответствует порядку доски (порядку поступления URL).
+
+        Args:
+            image_urls: Итератор URL изображений в порядке доски
+
+        Returns:
+            Словарь статистики: total, downloaded, failed, skipped
+            (и concurrency - метрики ConcurrencyController, если он включен)
+        """
+        stats = {"total": 0, "downloaded": 0, "failed": 0, "skipped": 0}
+        stats_lock = threading.Lock()
+
+        # Инициализируем сессию для переиспользования (пул соединений - по числу потоков);
+        # скачивание еще не началось, поэтому сессию можно переключить на больший пул
+        mount_http_adapter(self.init_session(), self.get_pool_size())
+        self.apply_download_rate()
+        self.size_filter_stats = {"skipped": 0, "bytes_saved": 0}
+        self.probe_stats = {"probed": 0, "cached": 0}
+        self.store_stats = {"linked": 0, "stored": 0, "duplicates": 0, "bytes_saved": 0, "links": {}}
+        self.deferred_downloads = {}  # Отложенные изображения предыдущей доски не повторяются
+
+        if self.download_backend == "async" and HAS_HTTPX:
+            workers = self.async_max_in_flight
+            controller = self.start_concurrency_controller(max_limit=workers)
+            executor = AsyncDownloadEngine(self, workers)
+            submit = executor.submit
+            print(f"Скачиваю изображения асинхронно по мере обнаружения (до {workers} запросов, HTTP/2: {HAS_H2})...")
+        else:
+            if self.download_backend == "async":
+                print("httpx не установлен (pip install httpx[http2]) - использую пул потоков")
+            workers = self.get_download_workers()
+            controller = self.start_concurrency_controller(max_limit=workers)
+            executor = ThreadPoolExecutor(max_workers=workers)
+            submit = lambda url, filename: executor.submit(self.run_download, self.download_image, url, filename)
+            print(f"Скачиваю изображения параллельно по мере обнаружения (до {workers} потоков)...")
+        if controller is not None:
+            print(f"Адаптивная параллельность: начинаю с {controller.limit}, "
+                  f"границы {controller.min_limit}-{controller.max_limit}")
+        print(f"Ограничение скорости: {format_rate_limit_stats()}")
+
+        # Ограничивает количество поставленных в очередь и выполняющихся задач
+        slots = threading.BoundedSemaphore(workers + self.download_queue_size)
+
+        def on_done(future, index, filename, img_url):
+            try:
+                success = future.result()
+                size_filtered = not success and self.pop_size_filtered(img_url) is not None
+                with stats_lock:
+                    stats["downloaded" if success else "skipped" if size_filtered else "failed"] += 1
+                if success:
+                    self.mark_pin_known(img_url)
+                    self.record_downloaded_file(img_url, filename)
+                    print(f"[{index}] ✓ Успешно скачано: {filename}")
+                elif size_filtered:
+                    self.mark_pin_known(img_url)
+                else:
+                    print(f"[{index}] ✗ Ошибка скачивания: {filename}")
+            except Exception as e:
+                with stats_lock:
+                    stats["failed"] += 1
+                print(f"[{index}] ✗ Исключение при скачивании {filename}: {e}")
+            finally:
+                slots.release()
+
+        with executor:
+            for index, img_url in enumerate(image_urls, 1):
+                stats["total"] = index
+                self.board_order.append(self.get_image_key(img_url))
+                filename = self.get_filename_from_url(img_url, index, self.filename_template)
+
+                # Проверяем, не скачано ли уже это изображение (по ключу изображения)
+                filename, already_downloaded = self.resolve_download_filename(img_url, filename)
+                if already_downloaded:
+                    with stats_lock:
+                        stats["skipped"] += 1
+                    self.mark_pin_known(img_url)
+                    self.record_downloaded_file(img_url, filename)
+                    print(f"[{index}] Пропущено (уже существует): {filename}")
+                    continue
+
+                # Ждем свободного места в очереди скачивания
+                slots.acquire()
+                future = submit(img_url, filename)
+                future.add_done_callback(lambda f, i=index, n=filename, u=img_url: on_done(f, i, n, u))
+
+        def retry(img_url, filename):
+            if self.download_image(img_url, filename):
+                with stats_lock:
+                    stats["failed"] -= 1
+                    stats["downloaded"] += 1
+                self.mark_pin_known(img_url)
+                self.record_downloaded_file(img_url, filename)
+                print(f"✓ Скачано при повторе: {filename}")
+            elif self.pop_size_filtered(img_url) is not None:
+                with stats_lock:
+                    stats["failed"] -= 1
+                    stats["skipped"] += 1
+                self.mark_pin_known(img_url)
+
+        self.run_deferred_retries(retry)
+        self.save_download_strategy()
+        self.save_store_index()
+        if controller is not None:
+            stats["concurrency"] = controller.get_stats()
+        return stats
+
+    def parse_pinterest_url(self, url, max_images=None, auto_subfolder=True):
+        """
+        Основной метод для парсинга Pinterest URL
+
+        Поиск изображений и скачивание выполняются одновременно: каждое найденное
+        изображение сразу ставится в очередь скачивания.
+
+        Args:
+            url: URL доски или страницы Pinterest (поддерживает короткие ссылки pin.it)
+            max_images: Максимальное количество изображений для скачивания (None = все)
+            auto_subfolder: Автоматически создавать подпапку по названию доски
+        """
+        # Преобразуем короткую ссылку в полную, если необходимо
+        url = self.expand_short_url(url)
+
+        # Автоматическое создание подпапки по названию доски
+        original_folder = self.download_folder
+        if auto_subfolder:
+            board_name = self.get_board_name_from_url(url)
+            if board_name:
+                self.download_folder = os.path.join(original_folder, board_name)
+                self.setup_download_folder()
+                print(f"Создана подпапка: {self.download_folder}")
+
+        start_time = time.time()
+        self.load_board_state(url)
+        if self.incremental_sync and self.known_pin_keys:
+            # Лимит применяется к новым пинам, а не к просмотренным
+            print(f"Инкрементальная синхронизация: известно {len(self.known_pin_keys)} пинов доски")
+            image_urls = self.filter_known_pins(self.iter_image_urls(url), max_images=max_images)
+        else:
+            image_urls = self.iter_image_urls(url, max_images=max_images)
+        try:
+            stats = self.download_stream(image_urls)
+        finally:
+            self.save_board_state()
+
+        if self.link_sequential:
+            self.link_sequential_names()
+
+        if not stats["total"]:
+            if self.incremental_sync and self.known_pin_keys:
+                print(f"Новых изображений нет ({time.time() - start_time:.1f} сек)")
+            else:
+                print("Не найдено изображений на странице")
+            return
 
         print(f"\n{'='*50}")
         print(f"Скачивание завершено!")
-        print(f"Успешно: {downloaded}")
-        print(f"Ошибок: {failed}")
-        print(f"Пропущено: {skipped}")
-        print(f"Всего: {len(image_urls)}")
+        print(f"Успешно: {stats['downloaded']}")
+        print(f"Ошибок: {stats['failed']}")
+        print(f"Пропущено: {stats['skipped']}")
+        print(f"Всего: {stats['total']}")
+        print(f"Время: {time.time() - start_time:.1f} сек")
         print(f"Папка: {os.path.abspath(self.download_folder)}")
+        if self.download_method_counts:
+            print(f"Методы скачивания (успешно/неудачно): {self.format_download_method_stats()}")
+        print(f"Соединения: {format_connection_stats()}")
+        if self.concurrency is not None:
+            print(f"Параллельность: {self.concurrency.format_stats()}")
+        print(f"Скорость: {format_rate_limit_stats()}")
+        if self.size_filter_stats["skipped"]:
+            print(f"Фильтр размера: {self.format_size_filter_stats()}")
+        if self.probe_stats["probed"] or self.probe_stats["cached"]:
+            print(f"Разрешение: запросов начала файла {self.probe_stats['probed']}, "
+                  f"из состояния доски {self.probe_stats['cached']}")
+        if self.store_folder:
+            print(f"Хранилище: {self.format_store_stats()}")
+        if self.wait_stats:
+            print(f"Ожидание страницы: {self.format_wait_stats()}")
+        if self.circuit_breaker.paused_seconds:
+            print(f"Приостановка запросов после временных ошибок: {self.circuit_breaker.paused_seconds:.0f} сек")
         print(f"{'='*50}")
 
     def close(self):
@@ -1582,10 +4528,9 @@ class PinterestParser:
             self.driver.quit()
             print("Браузер закрыт")
 
-        # Закрываем сессию requests
-        if self.session:
-            self.session.close()
-            self.session = None
+        # Сессии используют общий пул соединений, поэтому не закрываются, а только освобождаются
+        self.session = None
+        self.api_session = None
 
 
 def main():